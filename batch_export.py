@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Export of quakes from the DB into files without GUI.
+
+Quakes are streamed from the DB query through grouping into storages
+chosen by extensions of the files, as in the GUI. Usage:
+python batch_export.py --from "2021-01-01 00:00:00" \\
+    --to "2021-02-01 00:00:00" -o catalog.xlsx -o bulletin.txt
+"""
+import argparse
+import logging.config
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+import config
+from exceptions import ConnectDatabaseError, FormatToStrError
+from instrumentation import trace, profiled
+from quake_storages import get_storage, get_storage_extensions, \
+    export_quakes, QuakesStorage
+from quake_structures import Quake
+from quakes_from_db import iter_found_quakes, get_quake_batch, \
+    QueryParams, SearchProgress
+
+
+log = logging.getLogger('db_logger')
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = _get_parser().parse_args(argv)
+    logging.config.dictConfig(config.LOG_CONFIG)
+    params = get_query_params(args)
+    storages = _get_storages(args.output)
+    log.info(f'Start export of quakes. {params}')
+    start = time.perf_counter()
+    progress = SearchProgress()
+    exported = [0]
+    try:
+        with profiled(), trace('export') as exporting:
+            quakes: Iterable[Quake]
+            if args.sorted:
+                quakes = get_quake_batch(params, progress)
+            else:
+                quakes = iter_found_quakes(params, progress)
+            export_quakes(_count(quakes, exported), storages,
+                          threaded=args.threads)
+            exporting.count(records=progress.records, quakes=exported[0])
+    except (ConnectDatabaseError, FormatToStrError, OSError) as exc:
+        log.exception(exc)
+        print(f'Error: {exc}', file=sys.stderr)
+        return 1
+    seconds = time.perf_counter() - start
+    log.info(f'Export is completed: {progress.records} records, '
+             f'{exported[0]} quakes, {seconds:.2f} s')
+    print(f'Fetched records: {progress.records}, '
+          f'grouped quakes: {progress.quakes}, '
+          f'exported quakes: {exported[0]}, '
+          f'files: {len(storages)}, time: {seconds:.2f} s')
+    if summary := exporting.summary():
+        print(summary)
+    return 0
+
+
+def _get_parser() -> argparse.ArgumentParser:
+    extensions = ', '.join(get_storage_extensions())
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    add_search_arguments(parser)
+    parser.add_argument('-o', '--output', action='append', required=True,
+                        type=Path, help=f'file to save quakes, the format '
+                                        f'is chosen by ext: {extensions}')
+    parser.add_argument('--sorted', action='store_true',
+                        help='sort quakes by the time of the first phase '
+                             'as GUI does, all quakes are kept in memory '
+                             'in columns of numpy arrays')
+    parser.add_argument('--threads', action='store_true',
+                        help='write every file in a separate thread')
+    return parser
+
+
+def add_search_arguments(parser: argparse.ArgumentParser) -> None:
+    """Arguments of a search read by get_query_params()"""
+    parser.add_argument('--from', dest='from_dt', required=True,
+                        type=_check_dt, help='YYYY-MM-DD HH:MM:SS')
+    parser.add_argument('--to', dest='to_dt', required=True,
+                        type=_check_dt, help='YYYY-MM-DD HH:MM:SS')
+    parser.add_argument('--sta', nargs='+', default=['ALL'],
+                        help='names of stations of every quake, ALL by '
+                             'default')
+    parser.add_argument('--mag', nargs=2, default=('0.0', '9.0'),
+                        type=_check_mag, metavar=('FROM', 'TO'),
+                        help='range of magnitudes, 0.0 9.0 by default')
+    parser.add_argument('--comment', nargs='+', default=[],
+                        help='keywords of the comment')
+
+
+def get_query_params(args: argparse.Namespace) -> QueryParams:
+    return QueryParams(from_dt=args.from_dt, to_dt=args.to_dt,
+                       sta=' '.join(args.sta), from_mag=args.mag[0],
+                       to_mag=args.mag[1], comment=' '.join(args.comment))
+
+
+def _get_storages(files: List[Path]) -> List[QuakesStorage]:
+    storages = []
+    for file in files:
+        extensions = get_storage_extensions()
+        if file.suffix not in extensions:
+            raise SystemExit(f'Unknown format of {file}, ext must be one '
+                             f'of: {", ".join(extensions)}')
+        storages.append(get_storage(file.suffix)(file))
+    return storages
+
+
+def _check_dt(value: str) -> str:
+    try:
+        datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{value!r} is not '
+                                         f'YYYY-MM-DD HH:MM:SS')
+    return value
+
+
+def _check_mag(value: str) -> str:
+    try:
+        return f'{float(value)}'
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{value!r} is not a magnitude')
+
+
+def _count(quakes: Iterable[Quake], counter: List[int]) -> Iterator[Quake]:
+    for quake in quakes:
+        counter[0] += 1
+        yield quake
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the assembly of quakes from synthetic records by one
+process against quake_assembly with pools of several processes. The
+serial assembly is _group_quakes() and _filter_quakes() of get_quakes(),
+pools assemble records kept in memory as get_quakes() does and records
+coming as a stream as iter_found_quakes() does. Results of pools are
+checked to be the same quakes. A pool pays off only with several CPUs
+and enough records: PARALLEL_ASSEMBLY['min_records'] is the least amount
+of records which pools assemble faster.
+
+Usage: python -m benchmarks.bench_assembly [amounts of arrivals]
+    [--workers 2 4 8] [--repeat N]
+"""
+import argparse
+import os
+import time
+from typing import Callable, List
+
+import config
+from benchmarks.bench_suite import PARAMS
+from benchmarks.synthetic import iter_records
+from quake_assembly import assemble_quakes, iter_assembled_quakes
+from quake_structures import Quake
+from quakes_from_db import SearchProgress, _group_quakes, _filter_quakes, \
+    sort_quakes
+
+
+def run(records: List[tuple], workers: List[int], repeat: int) -> None:
+    serial_seconds, serial = _time(
+        lambda: _filter_quakes(_group_quakes(records), PARAMS), repeat)
+    print(f'{len(records)} records, {len(serial)} quakes, '
+          f'{os.cpu_count()} CPUs')
+    print(f'{"serial":>10}: {serial_seconds:8.3f} s')
+    for amount in workers:
+        seconds, quakes = _time(
+            lambda: assemble_quakes(records, PARAMS, amount), repeat)
+        _print(f'{amount:>2} workers', seconds, serial_seconds,
+               quakes == serial)
+        seconds, quakes = _time(
+            lambda: sort_quakes(iter_assembled_quakes(
+                records, PARAMS, amount, SearchProgress())), repeat)
+        _print(f'{"stream":>10}', seconds, serial_seconds, quakes == serial)
+
+
+def _print(name: str, seconds: float, serial_seconds: float,
+           same: bool) -> None:
+    print(f'{name}: {seconds:8.3f} s, x{serial_seconds / seconds:.2f}, '
+          f'{"same" if same else "DIFFERENT"} quakes')
+
+
+def _time(function: Callable[[], List[Quake]],
+          repeat: int) -> tuple[float, List[Quake]]:
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        quakes = function()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), quakes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('arrivals', nargs='*', type=int,
+                        default=[100_000, 300_000, 1_000_000])
+    parser.add_argument('--workers', nargs='+', type=int,
+                        default=[2, 4, 8, 16])
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+    # the stream is assembled by pools from its first record
+    config.PARALLEL_ASSEMBLY['min_records'] = 0
+    for arrivals in args.arrivals:
+        run(list(iter_records(arrivals)), args.workers, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
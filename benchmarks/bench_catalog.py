@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the streaming CatalogStorage against the previous one,
+which loaded the whole workbook and formatted every cell on each save.
+A catalog is saved in two parts, the second one is appended to the file
+made by the first one. Every case runs in a separate process to measure
+the peak memory added by the saves to the memory of the quakes.
+
+Usage: python -m benchmarks.bench_catalog [amounts of quakes]
+"""
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import openpyxl
+from openpyxl.styles import Alignment
+
+import config
+from benchmarks.synthetic import iter_records
+from catalog_storage import CatalogStorage
+from quake_storages import FormattedQuake, _format_common_attrs
+from quake_structures import Quake
+from quakes_from_db import _group_quakes
+
+
+class LoadWorkbookCatalogStorage:
+    """CatalogStorage before the streaming writer"""
+
+    def __init__(self, file: Path):
+        self._file = file
+        if not self._file.exists():
+            openpyxl.Workbook().save(self._file)
+        self.wb = openpyxl.load_workbook(self._file)
+        if 'Sheet' in self.wb.sheetnames and \
+                self.wb['Sheet'].dimensions == 'A1:A1':
+            del self.wb['Sheet']
+
+    def save(self, quakes: Iterable[Quake]) -> None:
+        for quake in quakes:
+            if quake.lat is None or quake.lon is None:
+                continue
+            month_num = quake.origin_dt.month - 1
+            sheet_name = config.MONTHS[month_num]
+            if sheet_name not in self.wb.sheetnames:
+                sheet = self.wb.create_sheet(sheet_name, month_num)
+                sheet.append(config.CATALOG_HEADER)
+            else:
+                sheet = self.wb[sheet_name]
+            sheet.append(CatalogStorage._get_row(FormattedQuake(quake)))
+        for sheet in self.wb.worksheets:
+            for row in sheet[sheet.dimensions]:
+                for cell in row:
+                    if cell.column in (3, 4, 5):
+                        cell.number_format = '0.00'
+                    elif cell.column in (7, 8):
+                        cell.number_format = '0.0'
+                    cell.alignment = Alignment(horizontal='center',
+                                               vertical='center')
+        self.wb.save(self._file)
+
+
+STORAGES = {'load_workbook': LoadWorkbookCatalogStorage,
+            'write-only': CatalogStorage}
+
+
+def get_quakes(amount: int) -> List[Quake]:
+    located = (quake for quake in _group_quakes(iter_records(amount * 20))
+               if quake.lat is not None and quake.lon is not None and
+               _format_common_attrs(quake)[0] != '-')
+    return list(islice(located, amount))
+
+
+def run_case(storage_name: str, amount: int) -> Tuple[float, float]:
+    """Return seconds of two saves and the peak memory they add in MB"""
+    quakes = get_quakes(amount)
+    storage = STORAGES[storage_name]
+    quakes_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file = Path(tmp_dir).joinpath('catalog.xlsx')
+        start = time.perf_counter()
+        storage(file).save(quakes[:amount // 2])
+        storage(file).save(quakes[amount // 2:])
+        seconds = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return seconds, (peak_kb - quakes_kb) / 1024
+
+
+def main() -> None:
+    amounts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    for amount in amounts:
+        for storage_name in STORAGES:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                seconds, peak_mb = executor.submit(
+                    run_case, storage_name, amount).result()
+            print(f'{amount} quakes, {storage_name:>13}: {seconds:8.2f} s,'
+                  f' added peak memory {peak_mb:7.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the join fetch against the two-phase fetch of records
+on the source of config or on a sqlite file made by import_dump.py.
+Quakes of the window are got by get_quakes() without caches. Received
+bytes are estimated as the MySQL text protocol sends rows: a header
+of a row and every value as a string with its length. Sent bytes are
+texts of queries and their arguments.
+
+Usage: python -m benchmarks.bench_fetch --from "2021-01-01 00:00:00"
+    --to "2021-02-01 00:00:00" [--sqlite getquakes.sqlite] [--repeat N]
+"""
+import argparse
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Sequence
+
+import config
+import quakes_from_db
+from batch_export import add_search_arguments, get_query_params
+from quake_sources import QuakeSource, SQLiteSource, get_source
+
+STRATEGIES = {'join': False, 'two_phase': True}
+
+_ROW_HEADER_BYTES = 4
+
+
+class _CountingSource:
+    """Source counting rows and bytes of their values, queries of shards
+    run in parallel threads"""
+
+    def __init__(self, source: QuakeSource):
+        self._source = source
+        self.local = source.local
+        self.param = source.param
+        self.key = source.key
+        self.rows = 0
+        self.bytes = 0
+        self.sent_bytes = 0
+        self._lock = threading.Lock()
+
+    def iter_batches(self, sql: str, args: Sequence[Any],
+                     progress: Any) -> Iterator[List[tuple]]:
+        sent_bytes = len(sql) + sum(len(str(arg)) for arg in args)
+        with self._lock:
+            self.sent_bytes += sent_bytes
+        for rows in self._source.iter_batches(sql, args, progress):
+            rows_bytes = sum(map(_get_row_bytes, rows))
+            with self._lock:
+                self.rows += len(rows)
+                self.bytes += rows_bytes
+            yield rows
+
+    def has_fulltext_index(self, table: str, column: str,
+                           progress: Any) -> bool:
+        return self._source.has_fulltext_index(table, column, progress)
+
+    def floor(self, expression: str) -> str:
+        return self._source.floor(expression)
+
+
+def run(params: quakes_from_db.QueryParams, source: QuakeSource,
+        two_phase: bool, repeat: int) -> Dict[str, Any]:
+    """Return the least seconds of repeated searches, quakes, rows
+    and bytes of one search"""
+    config.FETCH_STRATEGY['two_phase'] = two_phase
+    seconds = []
+    for _ in range(repeat):
+        counting = _CountingSource(source)
+        start = time.perf_counter()
+        quakes = quakes_from_db.get_quakes(params, counting)
+        seconds.append(time.perf_counter() - start)
+    return {'seconds': min(seconds), 'quakes': len(quakes),
+            'rows': counting.rows, 'bytes': counting.bytes,
+            'sent_bytes': counting.sent_bytes}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    add_search_arguments(parser)
+    parser.add_argument('--sqlite', help='sqlite file of the local source')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    params = get_query_params(args)
+    source = SQLiteSource(args.sqlite) if args.sqlite else get_source()
+    config.QUAKES_MEMO['enabled'] = False
+    config.QUERY_CACHE['enabled'] = False
+    config.INSTRUMENTATION['enabled'] = False
+    print(f'{source.key}, {config.FETCH_STRATEGY["ids_per_query"]} '
+          f'EVENTIDs per query of arrivals')
+    results = {name: run(params, source, two_phase, args.repeat)
+               for name, two_phase in STRATEGIES.items()}
+    for name, result in results.items():
+        print(f'{name:>10}: {result["seconds"]:8.3f} s, '
+              f'{result["quakes"]} quakes, {result["rows"]} rows, '
+              f'received {result["bytes"] / 2 ** 20:.2f} MB, '
+              f'sent {result["sent_bytes"] / 2 ** 10:.1f} KB')
+    join, two_phase = results['join'], results['two_phase']
+    if join['bytes']:
+        print(f'two-phase: x{two_phase["bytes"] / join["bytes"]:.2f} bytes, '
+              f'x{two_phase["seconds"] / join["seconds"]:.2f} time')
+
+
+def _get_row_bytes(row: tuple) -> int:
+    return _ROW_HEADER_BYTES + sum(1 + len(str(value))
+                                   if value is not None else 1
+                                   for value in row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Report of start time of the app by subsystems. Modules of the GUI and
+of the batch exporter are imported in new processes with -X importtime,
+self times of imported modules are summed by subsystems. The exit code
+is 1 if the import of the GUI takes more than the budget.
+
+Usage: python -m benchmarks.bench_startup [budget in ms] [amount of runs]
+"""
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+SUBSYSTEMS = {'Qt': ('PySide6', 'shiboken6', 'shibokensupport', 'ui'),
+              'Excel': ('openpyxl', 'lxml', 'et_xmlfile'),
+              'MySQL': ('mysql',),
+              'numpy': ('numpy',),
+              'app': tuple(file.stem for file in ROOT.glob('*.py'))}
+
+ENTRY_MODULES = ('gui', 'batch_export')
+
+_IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)')
+
+
+def measure(module: str) -> Tuple[Dict[str, float], float]:
+    """Return ms of the import of the module by subsystems
+    and ms of the whole process"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True,
+                            check=True)
+    process_ms = (time.perf_counter() - start) * 1000
+    subsystems_ms: Dict[str, float] = Counter()
+    for match in _IMPORT_TIME.finditer(result.stderr):
+        self_us, name = int(match[1]), match[2]
+        subsystems_ms[_get_subsystem(name)] += self_us / 1000
+    return subsystems_ms, process_ms
+
+
+def report(module: str, runs: int) -> float:
+    """Print medians of runs, return ms of the import"""
+    measures = [measure(module) for _ in range(runs)]
+    names = sorted({name for subsystems_ms, _ in measures
+                    for name in subsystems_ms})
+    medians = {name: statistics.median(subsystems_ms.get(name, 0.0)
+                                       for subsystems_ms, _ in measures)
+               for name in names}
+    import_ms = statistics.median(sum(subsystems_ms.values())
+                                  for subsystems_ms, _ in measures)
+    process_ms = statistics.median(ms for _, ms in measures)
+    print(f'import {module}:')
+    for name, ms in sorted(medians.items(), key=lambda item: -item[1]):
+        print(f'  {name:>18}: {ms:8.1f} ms')
+    print(f'  {"total":>18}: {import_ms:8.1f} ms, '
+          f'process with interpreter {process_ms:.1f} ms')
+    return import_ms
+
+
+def main() -> None:
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 600.0
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    imports_ms: List[float] = [report(module, runs)
+                               for module in ENTRY_MODULES]
+    gui_ms = imports_ms[0]
+    print(f'GUI import {gui_ms:.1f} ms, budget {budget_ms:.1f} ms')
+    if gui_ms > budget_ms:
+        sys.exit(1)
+
+
+def _get_subsystem(module: str) -> str:
+    package = module.split('.')[0]
+    for name, packages in SUBSYSTEMS.items():
+        if package in packages:
+            return name
+    return 'stdlib and others'
+
+
+if __name__ == '__main__':
+    main()
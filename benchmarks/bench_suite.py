@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks of stages of a search and export of quakes on synthetic
+records in the shape of get_data(). The stages are:
+- generate: making of records, subtracted from the grouping
+- group: grouping of records streamed into Quake as get_quakes() does,
+  including _filter_stations()
+- filter_stations: _filter_stations() alone, timed inside of the grouping
+- filter_quakes: _filter_quakes() of the grouped quakes
+- save<ext>: save() of every storage
+- table: population and a sort of the table of GUI
+
+Results are written into a JSON file, a file of another version given
+by --compare is printed side by side with them. With --repeat the least
+time of every stage is kept.
+
+Usage: python -m benchmarks.bench_suite [amounts of arrivals]
+    [-o results.json] [--compare old.json] [--repeat N]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+from PySide6.QtCore import Qt
+
+import quakes_from_db
+from benchmarks.synthetic import iter_records
+from quake_storages import get_storage, get_storage_extensions
+from quake_structures import Quake
+from quakes_from_db import QueryParams, _group_quakes, _filter_quakes
+from quakes_table import QuakesTableModel, QuakesSortProxy
+
+PARAMS = QueryParams(from_dt='2020-09-13 00:00:00',
+                     to_dt='2021-09-13 00:00:00',
+                     sta='ALL', from_mag='1.0', to_mag='5.0', comment='')
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def run(n_arrivals: int, repeat: int = 1) -> Dict[str, Any]:
+    """Return the least seconds of stages of repeated runs"""
+    runs = [_run_once(n_arrivals) for _ in range(repeat)]
+    stages = {stage: min(one_run['stages'][stage] for one_run in runs)
+              for stage in runs[0]['stages']}
+    return {'arrivals': n_arrivals, 'quakes': runs[0]['quakes'],
+            'repeat': repeat, 'stages': stages}
+
+
+def _run_once(n_arrivals: int) -> Dict[str, Any]:
+    stages: Dict[str, float] = {}
+    stages['generate'] = _time(lambda: deque(iter_records(n_arrivals),
+                                             maxlen=0))
+    with _timed_filter_stations() as filter_stations_time:
+        start = time.perf_counter()
+        quakes = list(_group_quakes(iter_records(n_arrivals)))
+        group_time = time.perf_counter() - start
+    stages['group'] = max(group_time - stages['generate'], 0.0)
+    stages['filter_stations'] = filter_stations_time[0]
+    start = time.perf_counter()
+    quakes = _filter_quakes(quakes, PARAMS)
+    stages['filter_quakes'] = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as out_dir:
+        for ext in get_storage_extensions():
+            storage = get_storage(ext)(Path(out_dir).joinpath(f'quakes{ext}'))
+            stages[f'save{ext}'] = _time(lambda: storage.save(quakes))
+    stages['table'] = _time(lambda: _populate_table(quakes))
+    return {'arrivals': n_arrivals, 'quakes': len(quakes), 'stages': stages}
+
+
+def compare(results: Dict[str, Any], old_results: Dict[str, Any]) -> None:
+    old_runs = {old_run['arrivals']: old_run
+                for old_run in old_results['runs']}
+    print(f'compared with {old_results["version"]} '
+          f'of {old_results["created"]}')
+    for new_run in results['runs']:
+        old_run = old_runs.get(new_run['arrivals'])
+        if old_run is None:
+            continue
+        print(f'{new_run["arrivals"]} arrivals:')
+        for stage, seconds in new_run['stages'].items():
+            old_seconds = old_run['stages'].get(stage)
+            if old_seconds is None:
+                print(f'  {stage:>16}: {seconds:9.3f} s')
+                continue
+            ratio = seconds / old_seconds if old_seconds else float('inf')
+            print(f'  {stage:>16}: {seconds:9.3f} s, '
+                  f'was {old_seconds:9.3f} s, x{ratio:.2f}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('amounts', nargs='*', type=int,
+                        default=[1_000, 100_000],
+                        help='amounts of arrivals, up to 10M')
+    parser.add_argument('-o', '--output', type=Path,
+                        default=Path('bench_results.json'))
+    parser.add_argument('--compare', type=Path,
+                        help='JSON file of results of another version')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs of every amount of arrivals')
+    args = parser.parse_args()
+    results = {'version': _get_version(),
+               'created': datetime.now().isoformat(timespec='seconds'),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'runs': []}
+    for n_arrivals in args.amounts:
+        results['runs'].append(run(n_arrivals, args.repeat))
+        print(json.dumps(results['runs'][-1]))
+    args.output.write_text(json.dumps(results, indent=2), encoding='utf8')
+    print(f'results are written into {args.output}')
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text(encoding='utf8')))
+
+
+@contextmanager
+def _timed_filter_stations() -> Iterator[List[float]]:
+    """Sum seconds of _filter_stations() called by the grouping"""
+    filter_stations = quakes_from_db._filter_stations
+    seconds = [0.0]
+
+    def timed(stations):
+        start = time.perf_counter()
+        try:
+            return filter_stations(stations)
+        finally:
+            seconds[0] += time.perf_counter() - start
+
+    quakes_from_db._filter_stations = timed
+    try:
+        yield seconds
+    finally:
+        quakes_from_db._filter_stations = filter_stations
+
+
+def _populate_table(quakes: List[Quake]) -> None:
+    """Fill the model of the table, sort it by time and read cells
+    of the first screen as the view does"""
+    model = QuakesTableModel()
+    proxy = QuakesSortProxy()
+    proxy.setSourceModel(model)
+    model.set_quakes(quakes)
+    proxy.sort(1, Qt.AscendingOrder)
+    for row in range(min(50, proxy.rowCount())):
+        for column in range(proxy.columnCount()):
+            proxy.data(proxy.index(row, column))
+
+
+def _time(function: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def _get_version() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'],
+                              cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+if __name__ == '__main__':
+    main()
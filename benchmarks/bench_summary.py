@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of search plus export of quakes with summaries computed
+once against summaries computed on every access.
+
+Usage: python -m benchmarks.bench_summary [amount of arrivals]
+"""
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List
+
+from benchmarks.synthetic import generate_records
+from quake_storages import get_storage, save_quakes
+from quake_structures import Quake, _summarize
+from quakes_from_db import QueryParams, _group_quakes, _filter_quakes
+
+
+PARAMS = QueryParams(from_dt='2020-09-13 00:00:00',
+                     to_dt='2021-09-13 00:00:00',
+                     sta='ALL', from_mag='1.0', to_mag='5.0', comment='')
+
+
+@contextmanager
+def recomputed_summary() -> Iterator[None]:
+    """Make Quake compute its summary on every access"""
+    summary_slot = Quake.__dict__['_summary']
+    Quake._summary = property(lambda quake: _summarize(quake.stations),
+                              lambda quake, value: None)
+    try:
+        yield
+    finally:
+        Quake._summary = summary_slot
+
+
+def search_and_export(records: List[tuple], out_dir: Path) -> float:
+    start = time.perf_counter()
+    quakes = _filter_quakes(_group_quakes(records), PARAMS)
+    for quake in quakes:
+        # values of the table of GUI
+        quake.magnitude.ML, quake.magnitude.MPSP
+    for ext in ('.txt', '.xlsx', '.bltn', '.GIS'):
+        storage = get_storage(ext)
+        save_quakes(quakes, storage(out_dir.joinpath(f'quakes{ext}')))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    n_arrivals = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    records = generate_records(n_arrivals)
+    with tempfile.TemporaryDirectory() as cached_dir:
+        cached = search_and_export(records, Path(cached_dir))
+    with tempfile.TemporaryDirectory() as recomputed_dir:
+        with recomputed_summary():
+            recomputed = search_and_export(records, Path(recomputed_dir))
+    print(f'{len(records)} records')
+    print(f'summary computed on every access: {recomputed:.3f} s')
+    print(f'summary computed once:            {cached:.3f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Synthetic records of quakes in the shape of quakes_from_db.get_data()"""
+import random
+from decimal import Decimal
+from typing import Iterator, List
+
+import config
+
+STATIONS = tuple(config.STA_RENAME) + (
+    'BOD', 'IRK', 'TLY', 'MOY', 'UUD', 'KRS', 'NIZ', 'ZAK', 'KIR', 'ORL',
+    'BYR', 'HRM', 'TRG', 'SRD', 'KMN', 'MXM', 'CRS', 'DLY', 'NLN', 'ELT')
+
+PHASES = ('P', 'S', 'Pn', 'Sn', 'Pg', 'Sg', 'Lg')
+
+ENTRIES = ('IP', 'E', 'ES', 'IPC', 'ED', '')
+
+
+def iter_records(n_arrivals: int, seed: int = 0,
+                 start_ts: float = 1_600_000_000.0) -> Iterator[tuple]:
+    """Yield about n_arrivals records ordered by EVENTID. Stations have
+    several phases, some arrivals repeat a phase with other amplitude or
+    magnitude, distances are partly None as in the DB. Quakes without
+    origin time are not located"""
+    rnd = random.Random(seed)
+    event_id = 100000
+    origin_ts = start_ts
+    arrivals = 0
+    while arrivals < n_arrivals:
+        event_id += 1
+        origin_ts += rnd.expovariate(1 / 600)
+        is_located = rnd.random() > 0.02
+        origin = (str(event_id),
+                  origin_ts if is_located else None,
+                  round(rnd.uniform(41.0, 56.0), 2) if is_located else None,
+                  round(rnd.uniform(87.0, 120.0), 2) if is_located else None,
+                  rnd.choice((None, 5.0, 10.0, round(rnd.uniform(0, 30), 2))),
+                  f'Region {rnd.randint(1, 40)}')
+        mag = rnd.uniform(0.5, 5.5)
+        for sta in rnd.sample(STATIONS, rnd.randint(1, 12)):
+            dist = round(rnd.uniform(5.0, 1500.0), 2)
+            travel_time = dist / 8.0
+            for phase in rnd.sample(PHASES, rnd.randint(1, 3)):
+                itime = origin_ts + travel_time * rnd.uniform(1.0, 1.8)
+                for _ in range(1 if rnd.random() > 0.1 else 2):
+                    yield origin + _get_arrival(rnd, itime, sta, dist,
+                                                phase, mag)
+                    arrivals += 1
+
+
+def generate_records(n_arrivals: int, seed: int = 0) -> List[tuple]:
+    return list(iter_records(n_arrivals, seed))
+
+
+def _get_arrival(rnd: random.Random, itime: float, sta: str, dist: float,
+                 phase: str, mag: float) -> tuple:
+    has_ml = rnd.random() > 0.3
+    return (round(itime, 3), sta,
+            dist if rnd.random() > 0.2 else None,
+            round(rnd.uniform(0.0, 360.0), 2)
+            if rnd.random() > 0.3 else None,
+            phase, rnd.choice(ENTRIES),
+            Decimal(f'{rnd.uniform(0.001, 50.0):.4f}')
+            if rnd.random() > 0.4 else None,
+            round(rnd.uniform(0.1, 2.0), 2) if rnd.random() > 0.4 else None,
+            round(mag + rnd.gauss(0, 0.3), 1) if has_ml else None,
+            round(mag + rnd.gauss(0, 0.4), 1)
+            if rnd.random() > 0.5 else None)
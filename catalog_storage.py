@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import os
+from itertools import chain, islice
+from pathlib import Path
+from typing import Sequence, List, Dict
+
+import openpyxl
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, NamedStyle
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+
+import config
+from quake_storages import QuakesStorage, FormattedQuake
+from quake_structures import Quake
+
+
+class CatalogStorage(QuakesStorage):
+    """Store some quakes info as a catalog in an Excel file. Rows are
+    streamed into sheets of months by openpyxl in write-only mode, rows
+    of an existing file are read in read-only mode and written first"""
+
+    def __init__(self, file: Path):
+        self._file = file
+        self.wb: Workbook
+        self._sheets: Dict[str, _CatalogSheet]
+
+    def open(self) -> None:
+        self.wb = Workbook(write_only=True)
+        for style in _get_catalog_styles():
+            self.wb.add_named_style(style)
+        self._sheets = {}
+        if self._file.exists():
+            self._copy_existing_sheets()
+
+    def write(self, formatted: FormattedQuake) -> None:
+        quake = formatted.quake
+        if quake.lat is None or quake.lon is None:
+            return
+        self._get_sheet(quake).append(self._get_row(formatted))
+
+    def close(self) -> None:
+        if not self._sheets:
+            self.wb.create_sheet('Sheet')
+        tmp_file = self._file.with_name(self._file.name + '.tmp')
+        try:
+            self.wb.save(tmp_file)
+            os.replace(tmp_file, self._file)
+        finally:
+            tmp_file.unlink(missing_ok=True)
+
+    def abort(self) -> None:
+        for sheet in self._sheets.values():
+            sheet.discard()
+        self._sheets = {}
+
+    def _copy_existing_sheets(self) -> None:
+        existing_wb = openpyxl.load_workbook(self._file, read_only=True)
+        try:
+            for existing_sheet in existing_wb.worksheets:
+                rows = existing_sheet.iter_rows(values_only=True)
+                # sheets written in write-only mode have no dimension
+                first_rows = list(islice(rows, 2))
+                if existing_sheet.title == 'Sheet' and \
+                        _is_blank(first_rows):
+                    continue
+                sheet = self._add_sheet(existing_sheet.title)
+                for row in chain(first_rows, rows):
+                    sheet.append(row)
+        finally:
+            existing_wb.close()
+
+    def _get_sheet(self, quake: Quake) -> '_CatalogSheet':
+        month_num = quake.origin_dt.month - 1
+        sheet_name = config.MONTHS[month_num]
+        if sheet_name not in self._sheets:
+            self._add_sheet(sheet_name, month_num).append(
+                config.CATALOG_HEADER)
+        return self._sheets[sheet_name]
+
+    def _add_sheet(self, title: str,
+                   index: int | None = None) -> '_CatalogSheet':
+        sheet = _CatalogSheet(self.wb.create_sheet(title, index))
+        self._sheets[title] = sheet
+        return sheet
+
+    @staticmethod
+    def _get_row(formatted: FormattedQuake) -> tuple:
+        quake = formatted.quake
+        origin_d, origin_t = formatted.origin_dt.split()
+        lat = quake.lat if quake.lat else '-'
+        lon = quake.lon if quake.lon else '-'
+        mag = quake.magnitude
+        avg_ml = mag.ML if mag.ML != 0.0 else '-'
+        avg_mpsp = mag.MPSP if mag.MPSP != 0.0 else '-'
+        depth = quake.depth if quake.depth else '-'
+        stations_name = ', '.join(quake.stations_name)
+        return (origin_d, origin_t, lat, lon, depth,
+                quake.reg, avg_ml, avg_mpsp, stations_name)
+
+
+class _CatalogSheet:
+    """Write-only sheet of the catalog with styled cells. A row is
+    written at once, so the same cells are reused for all rows"""
+
+    def __init__(self, sheet: WriteOnlyWorksheet):
+        self.sheet = sheet
+        self._cells: List[WriteOnlyCell] = []
+
+    def append(self, row: Sequence) -> None:
+        while len(self._cells) < len(row):
+            cell = WriteOnlyCell(self.sheet)
+            cell.style = _get_catalog_style_name(len(self._cells) + 1)
+            self._cells.append(cell)
+        for cell, value in zip(self._cells, row):
+            cell.value = value
+        self.sheet.append(self._cells[:len(row)])
+
+    def discard(self) -> None:
+        """Close the sheet and remove its temporary file. openpyxl has
+        no public call for it, without the private one of its writer
+        the file is removed by openpyxl at exit"""
+        self.sheet.close()
+        writer = getattr(self.sheet, '_writer', None)
+        cleanup = getattr(writer, 'cleanup', None)
+        if cleanup is not None:
+            cleanup()
+
+
+def _is_blank(rows: List[tuple]) -> bool:
+    """The default sheet of a workbook: not more than one row and
+    no values"""
+    return len(rows) <= 1 and \
+        all(value is None for row in rows for value in row)
+
+
+def _get_catalog_styles() -> List[NamedStyle]:
+    alignment = Alignment(horizontal='center', vertical='center')
+    return [NamedStyle('catalog', alignment=alignment),
+            NamedStyle('catalog 0.00', number_format='0.00',
+                       alignment=alignment),
+            NamedStyle('catalog 0.0', number_format='0.0',
+                       alignment=alignment)]
+
+
+def _get_catalog_style_name(column: int) -> str:
+    if column in (3, 4, 5):
+        # digital format for lat, lon, depth
+        return 'catalog 0.00'
+    if column in (7, 8):
+        return 'catalog 0.0'
+    return 'catalog'
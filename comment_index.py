@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Local inverted index of words of comments of origins.
+
+Words of COMMENTS are kept in lower case by EVENTID of their origins in a
+sqlite file for every DB. A keyword matched by LIKE '%keyword%' is a part
+of one word of a comment, so origins with the keyword are found among
+postings of the words containing it. The index is refreshed by origins
+with EVENTID greater than the indexed ones, changes of comments of older
+origins are not seen until the index is cleared. Usage:
+python comment_index.py clear|refresh
+"""
+import argparse
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Dict, Iterable, List, Set, TYPE_CHECKING
+
+import config
+
+if TYPE_CHECKING:
+    from quake_sources import QuakeSource
+    from quakes_from_db import SearchProgress
+
+WORD = re.compile(r'\w+')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS words (
+    id INTEGER PRIMARY KEY, word TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS postings (
+    db TEXT, word_id INTEGER, eventid);
+CREATE TABLE IF NOT EXISTS indexed (
+    db TEXT PRIMARY KEY, last_eventid, refreshed_at REAL);
+CREATE INDEX IF NOT EXISTS postings_db_word ON postings (db, word_id);
+"""
+
+# refreshes of searches running in parallel threads
+_refresh_lock = threading.Lock()
+
+
+def can_find(key_words: List[str]) -> bool:
+    """Every keyword is found by the index as LIKE finds it: the keyword
+    is one word without the wildcard '_' of LIKE"""
+    return all(WORD.fullmatch(word) and '_' not in word
+               for word in key_words)
+
+
+def find_events(source: 'QuakeSource', key_words: List[str],
+                progress: 'SearchProgress') -> Set[Any] | None:
+    """Return EVENTIDs of origins whose comment contains any of keywords,
+    None if there are more than config.COMMENT_INDEX['max_events']"""
+    max_events = config.COMMENT_INDEX['max_events']
+    with closing(_connect()) as conn:
+        _refresh(conn, source, progress)
+        contains = ' OR '.join(['instr(w.word, ?) > 0'] * len(key_words))
+        rows = conn.execute(
+            f'SELECT DISTINCT p.eventid FROM words w '
+            f'JOIN postings p ON p.db = ? AND p.word_id = w.id '
+            f'WHERE {contains} LIMIT ?',
+            (source.key, *(word.lower() for word in key_words),
+             max_events + 1)).fetchall()
+    if len(rows) > max_events:
+        return None
+    return {row[0] for row in rows}
+
+
+def refresh(source: 'QuakeSource', progress: 'SearchProgress') -> int:
+    """Add origins newer than the indexed ones, return their amount"""
+    with closing(_connect()) as conn:
+        return _refresh(conn, source, progress, force=True)
+
+
+def clear() -> None:
+    """Remove the index of all DBs"""
+    with closing(_connect()) as conn:
+        with conn:
+            for table in ('postings', 'words', 'indexed'):
+                conn.execute(f'DELETE FROM {table}')
+        conn.execute('VACUUM')
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(config.COMMENT_INDEX['file'])
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _refresh(conn: sqlite3.Connection, source: 'QuakeSource',
+             progress: 'SearchProgress', force: bool = False) -> int:
+    """Index origins newer than the indexed ones unless the index was
+    refreshed less than config.COMMENT_INDEX['refresh_seconds'] ago"""
+    with _refresh_lock:
+        row = conn.execute('SELECT last_eventid, refreshed_at FROM indexed '
+                           'WHERE db = ?', (source.key,)).fetchone()
+        last_eventid, refreshed_at = row if row else (None, 0.0)
+        if not force and time.time() - refreshed_at < \
+                config.COMMENT_INDEX['refresh_seconds']:
+            return 0
+        sql = 'SELECT o.EVENTID, o.COMMENTS FROM origin o'
+        args: tuple = ()
+        if last_eventid is not None:
+            sql += f' WHERE o.EVENTID > {source.param}'
+            args = (last_eventid,)
+        sql += ' ORDER BY o.EVENTID'
+        word_ids = dict(conn.execute('SELECT word, id FROM words'))
+        added = 0
+        with conn:
+            for rows in source.iter_batches(sql, args, progress):
+                _add(conn, source.key, rows, word_ids)
+                last_eventid = rows[-1][0]
+                added += len(rows)
+            conn.execute('INSERT OR REPLACE INTO indexed VALUES (?, ?, ?)',
+                         (source.key, last_eventid, time.time()))
+        return added
+
+
+def _add(conn: sqlite3.Connection, db: str, rows: Iterable[tuple],
+         word_ids: Dict[str, int]) -> None:
+    postings = []
+    for eventid, comments in rows:
+        if comments is None:
+            continue
+        for word in set(WORD.findall(comments.lower())):
+            word_id = word_ids.get(word)
+            if word_id is None:
+                word_id = word_ids[word] = conn.execute(
+                    'INSERT INTO words (word) VALUES (?)', (word,)).lastrowid
+            postings.append((db, word_id, eventid))
+    conn.executemany('INSERT INTO postings VALUES (?, ?, ?)', postings)
+
+
+def main() -> None:
+    from quake_sources import get_source
+    from quakes_from_db import SearchProgress
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('command', choices=('clear', 'refresh'))
+    args = parser.parse_args()
+    if args.command == 'clear':
+        clear()
+        print(f"Index {config.COMMENT_INDEX['file']} is cleared")
+        return
+    source = get_source()
+    added = refresh(source, SearchProgress())
+    print(f'{added} origins of {source.key} are added into the index')
+
+
+if __name__ == '__main__':
+    main()
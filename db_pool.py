@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Iterator, List, NamedTuple, Tuple, Any
+
+import config
+
+
+log = logging.getLogger('db_logger')
+
+
+class PoolStats(NamedTuple):
+    """Totals of the pool: new connections and time of their handshakes,
+    reused connections and time of queries made on all connections"""
+    handshakes: int
+    handshake_time: float
+    reuses: int
+    query_time: float
+
+
+class ConnectionPool:
+    """Keep opened connections to the DB for reuse between queries"""
+
+    def __init__(self, size: int, idle_timeout: float, ping_after: float):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self._idle: List[Tuple[Any, float]] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._db_config = dict(config.DB)
+        self._generation = 0
+        self._handshakes = 0
+        self._handshake_time = 0.0
+        self._reuses = 0
+        self._query_time = 0.0
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Give a connection from the pool, open a new one if there is
+        no idle connection. At most `size` connections are given at once"""
+        with self._slots:
+            start = time.perf_counter()
+            conn, generation, is_new = self._acquire()
+            handshake_time = time.perf_counter() - start
+            try:
+                yield conn
+            except BaseException:
+                _close(conn)
+                raise
+            finally:
+                query_time = time.perf_counter() - start - handshake_time
+                self._add_query_time(query_time)
+                log.info(f'DB connection '
+                         f'{"opened" if is_new else "reused"} '
+                         f'in {handshake_time:.3f} s, '
+                         f'query took {query_time:.3f} s')
+            self._release(conn, generation)
+
+    def invalidate(self) -> None:
+        """Close idle connections, connections in use are closed
+        when they are returned into the pool"""
+        with self._lock:
+            self._invalidate()
+
+    def stats(self) -> PoolStats:
+        with self._lock:
+            return PoolStats(self._handshakes, self._handshake_time,
+                             self._reuses, self._query_time)
+
+    def _acquire(self) -> Tuple[Any, int, bool]:
+        with self._lock:
+            if config.DB != self._db_config:
+                self._invalidate()
+            self._evict_idle()
+            conn, released_at = self._idle.pop() if self._idle \
+                else (None, 0.0)
+            generation = self._generation
+        if conn is not None and self._is_alive(conn, released_at):
+            with self._lock:
+                self._reuses += 1
+            return conn, generation, False
+        start = time.perf_counter()
+        conn = _connector().connect(**config.DB, connection_timeout=2,
+                                    consume_results=True)
+        with self._lock:
+            self._handshakes += 1
+            self._handshake_time += time.perf_counter() - start
+        return conn, generation, True
+
+    def _release(self, conn: Any, generation: int) -> None:
+        with self._lock:
+            if generation == self._generation:
+                self._idle.append((conn, time.monotonic()))
+                return
+        _close(conn)
+
+    def _is_alive(self, conn: Any, released_at: float) -> bool:
+        if time.monotonic() - released_at < self.ping_after:
+            return True
+        try:
+            conn.ping(reconnect=True, attempts=1)
+        except _connector().Error:
+            _close(conn)
+            return False
+        return True
+
+    def _evict_idle(self) -> None:
+        now = time.monotonic()
+        idle = []
+        for conn, released_at in self._idle:
+            if now - released_at > self.idle_timeout:
+                _close(conn)
+            else:
+                idle.append((conn, released_at))
+        self._idle = idle
+
+    def _invalidate(self) -> None:
+        for conn, _ in self._idle:
+            _close(conn)
+        self._idle.clear()
+        self._generation += 1
+        self._db_config = dict(config.DB)
+
+    def _add_query_time(self, query_time: float) -> None:
+        with self._lock:
+            self._query_time += query_time
+
+
+def _close(conn: Any) -> None:
+    try:
+        conn.close()
+    except _connector().Error:
+        pass
+
+
+def _connector() -> ModuleType:
+    """mysql.connector is imported at the first connection, since it
+    takes a noticeable part of start of the app"""
+    import mysql.connector  # type: ignore
+    return mysql.connector
+
+
+def __getattr__(name: str) -> Any:
+    """Error of mysql.connector as db_pool.Error, imported on demand"""
+    if name == 'Error':
+        return _connector().Error
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+pool = ConnectionPool(**config.DB_POOL)
+
+
+def invalidate() -> None:
+    """Drop connections made with previous config.DB"""
+    pool.invalidate()
+
+
+def kill_query(connection_id: int) -> None:
+    """Abort the statement running on the connection. A separate
+    connection is opened since all connections of the pool may be busy"""
+    conn = _connector().connect(**config.DB, connection_timeout=2)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'KILL QUERY {int(connection_id)}')
+    finally:
+        _close(conn)
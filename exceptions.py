@@ -10,3 +10,7 @@ class ConnectDatabaseError(Exception):
 
 class FormatToStrError(Exception):
     """Program can't format sequence to string"""
+
+
+class SearchCancelledError(Exception):
+    """Search of quakes was cancelled by user"""
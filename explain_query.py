@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Diagnostics of the query of a search by EXPLAIN of the source chosen
+in config. Steps of the plan reading a whole table are reported together
+with DDL of the indexes a search needs, the exit code is 1 then. Usage:
+python explain_query.py --from "2021-01-01 00:00:00" \\
+    --to "2021-02-01 00:00:00" [--comment Baikal] [--ddl]
+"""
+import argparse
+import sys
+from typing import List
+
+import config
+from batch_export import add_search_arguments, get_query_params
+from exceptions import ConnectDatabaseError
+from quake_sources import INDEXES, FULLTEXT_INDEX, get_index_ddl, \
+    get_source
+from quakes_from_db import explain_query
+
+# aliases of tables in queries of quakes_from_db
+TABLE_ALIASES = {'o': 'origin', 'a': 'arrival', 'f': 'arrival'}
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    add_search_arguments(parser)
+    parser.add_argument('--ddl', action='store_true',
+                        help='print DDL of all indexes a search needs')
+    args = parser.parse_args(argv)
+    source = get_source()
+    try:
+        plan = explain_query(get_query_params(args), source)
+    except ConnectDatabaseError as exc:
+        print(f'Error: {exc}', file=sys.stderr)
+        return 1
+    print(f'Plan of the query on {source.key}:')
+    for step in plan:
+        print(f'  {step.table}: {step.detail}')
+    scanned = sorted({TABLE_ALIASES.get(step.table, step.table)
+                      for step in plan if step.full_scan})
+    for table in scanned:
+        print(f'Warning: full scan of {table}', file=sys.stderr)
+    indexes = [index for index in INDEXES
+               if args.ddl or index.table in scanned]
+    comment_scanned = args.comment and 'origin' in scanned
+    if comment_scanned:
+        print('Note: keywords of the comment matched by LIKE %...% cannot '
+              'use an index, they are resolved by the local index '
+              'if config.COMMENT_INDEX is enabled or matched by the '
+              'FULLTEXT index with its \'fulltext\'', file=sys.stderr)
+    # sqlite files have no FULLTEXT indexes
+    if (args.ddl or comment_scanned) and not source.local and \
+            config.COMMENT_INDEX['fulltext']:
+        indexes.append(FULLTEXT_INDEX)
+    if indexes:
+        print('Indexes a search needs, create them if they are missing:')
+        for index in indexes:
+            print(f'  {get_index_ddl(index)};')
+    return 1 if scanned else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
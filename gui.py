@@ -1,17 +1,27 @@
 # -*- coding: utf-8 -*-
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
 from typing import Generator, List
 
+from PySide6.QtCore import QObject, QThread, Signal, Slot
 from PySide6.QtWidgets import (QDialog, QMainWindow, QMessageBox,
-                               QFileDialog, QTableWidgetItem)
+                               QFileDialog)
 
 from exceptions import NoSelectedQuakesError, ConnectDatabaseError, \
-    FormatToStrError
-from quake_storages import save_quakes, get_storage
+    FormatToStrError, SearchCancelledError
+from instrumentation import Span, span, trace, attached, profiled, \
+    start_trace, finish_trace
+from quake_storages import save_quakes, get_storage, get_files_filters
+from quakes_table import QuakesTableModel, QuakesSortProxy
+from quake_catalog import QuakeCatalog
 from ui.main_window_ui import Ui_MainWindow  # type: ignore
 from ui.db_conn_ui import Ui_Dialog  # type: ignore
 import config
-from quakes_from_db import get_quakes, QueryParams
+from quakes_from_db import iter_found_quakes, sort_quakes, QueryParams, \
+    SearchProgress, QuakeFollower, FollowUpdate
+import db_pool
 import logging.config
 
 
@@ -19,50 +29,297 @@ logging.config.dictConfig(config.LOG_CONFIG)
 log = logging.getLogger('gui_logger')
 
 
+class SearchWorker(QObject):
+    """Search of quakes made in a separate thread. Found quakes are
+    sent by portions while the search goes on"""
+    quakes_found = Signal(object)
+    progress = Signal(int, int)
+    finished = Signal(object)
+    failed = Signal(object)
+    cancelled = Signal()
+    stopped = Signal()
+
+    emit_interval = 0.2
+
+    def __init__(self, params: QueryParams, trace_span: Span | None = None):
+        super().__init__()
+        self.params = params
+        self.search = SearchProgress()
+        self.trace_span = trace_span
+
+    @Slot()
+    def run(self) -> None:
+        with profiled(), attached(self.trace_span):
+            self._run()
+
+    def _run(self) -> None:
+        quakes = []
+        portion = []
+        emitted_at = time.monotonic()
+        try:
+            with span('find') as find:
+                for quake in iter_found_quakes(self.params, self.search):
+                    quakes.append(quake)
+                    portion.append(quake)
+                    if time.monotonic() - emitted_at > self.emit_interval:
+                        self._emit_portion(portion)
+                        portion = []
+                        emitted_at = time.monotonic()
+                self._emit_portion(portion)
+                find.count(records=self.search.records, quakes=len(quakes))
+            with span('sort'):
+                quakes = sort_quakes(quakes)
+            self.finished.emit(quakes)
+        except SearchCancelledError:
+            self.cancelled.emit()
+        except ConnectDatabaseError as exc:
+            self.failed.emit(exc)
+        finally:
+            self.stopped.emit()
+
+    def cancel(self) -> None:
+        """Called from the GUI thread while run() goes on"""
+        self.search.cancel()
+
+    def _emit_portion(self, portion: List) -> None:
+        self.progress.emit(self.search.records, self.search.quakes)
+        if portion:
+            self.quakes_found.emit(portion)
+
+
+class FollowWorker(QObject):
+    """Polls of new arrivals of a search made in a separate thread every
+    config.FOLLOW['poll_seconds'] until the worker is cancelled"""
+    updated = Signal(object)
+    failed = Signal(object)
+    stopped = Signal()
+
+    def __init__(self, params: QueryParams):
+        super().__init__()
+        self.follower = QuakeFollower(params)
+        self.search = SearchProgress()
+        self._cancelled = threading.Event()
+
+    @Slot()
+    def run(self) -> None:
+        try:
+            while not self._cancelled.is_set():
+                self.updated.emit(self.follower.poll(self.search))
+                self._cancelled.wait(config.FOLLOW['poll_seconds'])
+        except SearchCancelledError:
+            pass
+        except ConnectDatabaseError as exc:
+            self.failed.emit(exc)
+        finally:
+            self.stopped.emit()
+
+    def cancel(self) -> None:
+        """Called from the GUI thread while run() goes on"""
+        self._cancelled.set()
+        self.search.cancel()
+
+
 class Window(QMainWindow, Ui_MainWindow):
     """Main window of application"""
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setupUi(self)
+        self.quakes_model = QuakesTableModel(self)
+        self.quakes_proxy = QuakesSortProxy(self)
+        self.quakes_proxy.setSourceModel(self.quakes_model)
+        self.tableView.setModel(self.quakes_proxy)
+        self.catalog: QuakeCatalog | None = None
         self._connect_signals_slots()
-        self.file_filter = ';;'.join(config.FILES_FILTERS.values())
-        self.quakes = None
+        self.search_thread: QThread | None = None
+        self.search_worker: SearchWorker | None = None
+        self.search_trace: Span | None = None
+        self.follow_thread: QThread | None = None
+        self.follow_worker: FollowWorker | None = None
         self.statusBar().showMessage('Ready')
 
     def search_quakes(self) -> None:
-        self.progressBar.setValue(5)
-        try:
-            log.info(f'Start search for records. '
-                     f'DB connection config: {config.DB}.')
-            query_params = self._get_query_params()
-            log.info(f'{query_params}')
-            self.quakes = get_quakes(query_params)
-            self._set_data_into_table()
-            self.statusBar().showMessage(f'Searched quakes: '
-                                         f'{self.tableWidget.rowCount()}')
-            self.progressBar.setValue(100)
-        except ConnectDatabaseError as exc:
-            self.statusBar().showMessage('Error: cannot connect to Database!')
-            log.exception(exc)
-            self._show_error_dialog(message=f'{exc.args[0]}\n\n'
-                                            f'Check connection settings '
-                                            f'(File->Settings->Connection) '
-                                            f'and try again!')
+        if self.search_thread is not None or self.follow_thread is not None:
+            return
+        log.info(f'Start search for records. '
+                 f'DB connection config: {config.DB}.')
+        query_params = self._get_query_params()
+        log.info(f'{query_params}')
+        self.catalog = None
+        self.quakes_proxy.set_rows(None)
+        self.quakes_model.set_quakes([])
+        self.progressBar.setRange(0, 0)
+        self.search_events_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.statusBar().showMessage('Searching...')
+
+        self.search_trace = start_trace('search')
+        self.search_thread = QThread(self)
+        self.search_worker = SearchWorker(query_params, self.search_trace)
+        self.search_worker.moveToThread(self.search_thread)
+        self.search_thread.started.connect(self.search_worker.run)
+        self.search_worker.quakes_found.connect(self._add_found_quakes)
+        self.search_worker.progress.connect(self._show_search_progress)
+        self.search_worker.finished.connect(self._finish_search)
+        self.search_worker.failed.connect(self._fail_search)
+        self.search_worker.cancelled.connect(self._cancel_search_done)
+        self.search_worker.stopped.connect(self._stop_search_thread)
+        self.search_thread.start()
+
+    def cancel_search(self) -> None:
+        if self.search_worker is None:
+            return
+        log.info('Cancel the search')
+        self.cancel_button.setEnabled(False)
+        self.statusBar().showMessage('Cancelling the search...')
+        self.search_worker.cancel()
+
+    def follow_quakes(self, checked: bool) -> None:
+        """Search the window and then keep the found quakes up to date
+        by polls of new arrivals while the button is checked"""
+        if not checked:
+            if self.follow_worker is not None:
+                log.info('Stop following the search')
+                self.follow_worker.cancel()
+            return
+        if self.search_thread is not None or self.follow_thread is not None:
+            self.follow_button.setChecked(False)
+            return
+        query_params = self._get_query_params()
+        log.info(f'Follow the search {query_params}')
+        self.catalog = None
+        self.quakes_proxy.set_rows(None)
+        self.quakes_model.set_quakes([])
+        self.progressBar.setRange(0, 0)
+        self.search_events_button.setEnabled(False)
+        self.statusBar().showMessage('Searching...')
+
+        self.follow_thread = QThread(self)
+        self.follow_worker = FollowWorker(query_params)
+        self.follow_worker.moveToThread(self.follow_thread)
+        self.follow_thread.started.connect(self.follow_worker.run)
+        self.follow_worker.updated.connect(self._apply_follow_update)
+        self.follow_worker.failed.connect(self._fail_search)
+        self.follow_worker.stopped.connect(self._stop_follow_thread)
+        self.follow_thread.start()
+
+    def closeEvent(self, event) -> None:
+        if self.search_thread is not None:
+            self.search_worker.cancel()
+            self.search_thread.quit()
+            self.search_thread.wait()
+        if self.follow_thread is not None:
+            self.follow_worker.cancel()
+            self.follow_thread.quit()
+            self.follow_thread.wait()
+        super().closeEvent(event)
+
+    def _add_found_quakes(self, quakes: List) -> None:
+        with attached(self.search_trace), span('table'):
+            self.quakes_model.add_quakes(quakes)
+
+    def _show_search_progress(self, records: int, quakes: int) -> None:
+        self.statusBar().showMessage(
+            f'Fetched records: {records}, grouped quakes: {quakes}, '
+            f'shown quakes: {self.quakes_model.rowCount()}')
+
+    def _finish_search(self, quakes: List) -> None:
+        with attached(self.search_trace):
+            with span('catalog'):
+                self.catalog = QuakeCatalog(quakes)
+            with span('table'):
+                self.quakes_model.set_quakes(self.catalog.quakes)
+                self.refilter_quakes()
+        log.info(f'{db_pool.pool.stats()}')
+        self.statusBar().showMessage(f'Searched quakes: '
+                                     f'{self.quakes_model.rowCount()}')
+        self.progressBar.setValue(100)
+
+    def _fail_search(self, exc: Exception) -> None:
+        self.statusBar().showMessage('Error: cannot connect to Database!')
+        log.exception(exc)
+        self._show_error_dialog(message=f'{exc.args[0]}\n\n'
+                                        f'Check connection settings '
+                                        f'(File->Settings->Connection) '
+                                        f'and try again!')
+
+    def _cancel_search_done(self) -> None:
+        self.catalog = QuakeCatalog(self.quakes_model.quakes)
+        self.statusBar().showMessage(f'Search is cancelled, shown quakes: '
+                                     f'{self.quakes_model.rowCount()}')
+
+    def _stop_search_thread(self) -> None:
+        self.search_thread.quit()
+        self.search_thread.wait()
+        self.search_worker.deleteLater()
+        self.search_thread.deleteLater()
+        self.search_thread = None
+        self.search_worker = None
+        summary = finish_trace(self.search_trace)
+        self.search_trace = None
+        if summary:
+            self.statusBar().showMessage(
+                f'{self.statusBar().currentMessage()} ({summary})')
+        self.progressBar.setRange(0, 100)
+        self.search_events_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+
+    def _apply_follow_update(self, update: FollowUpdate) -> None:
+        self.quakes_model.update_quakes(update.updated)
+        self.quakes_model.add_quakes(update.added)
+        if update.added or update.updated:
+            # the catalog is made again by refilter_quakes() if needed
+            self.catalog = None
+        self.progressBar.setRange(0, 100)
+        self.statusBar().showMessage(
+            f'Following: {self.quakes_model.rowCount()} quakes, '
+            f'new {len(update.added)}, updated {len(update.updated)} '
+            f'at {datetime.now():%H:%M:%S}')
+
+    def _stop_follow_thread(self) -> None:
+        self.follow_thread.quit()
+        self.follow_thread.wait()
+        self.follow_worker.deleteLater()
+        self.follow_thread.deleteLater()
+        self.follow_thread = None
+        self.follow_worker = None
+        self.catalog = QuakeCatalog(self.quakes_model.quakes)
+        self.follow_button.setChecked(False)
+        self.progressBar.setRange(0, 100)
+        self.search_events_button.setEnabled(True)
+
+    def refilter_quakes(self) -> None:
+        """Show found quakes fitting the current time window, magnitudes
+        and stations, a wider window or range needs a new search"""
+        if self.catalog is None and self.follow_thread is not None:
+            self.catalog = QuakeCatalog(self.quakes_model.quakes)
+        if self.catalog is None:
+            return
+        params = self._get_query_params()
+        sta_names = params.sta.split() if params.sta.lower() != 'all' \
+            else None
+        rows = self.catalog.select(
+            from_dt=datetime.strptime(params.from_dt, '%Y-%m-%d %H:%M:%S'),
+            to_dt=datetime.strptime(params.to_dt, '%Y-%m-%d %H:%M:%S'),
+            from_mag=float(params.from_mag), to_mag=float(params.to_mag),
+            sta_names=sta_names)
+        self.quakes_proxy.set_rows(
+            rows if len(rows) < len(self.catalog) else None)
+        self.statusBar().showMessage(f'Shown quakes: {len(rows)} '
+                                     f'of {len(self.catalog)}')
 
     def get_selected_quakes(self) -> Generator:
         """Obtain tuple of Quake() according to selected quakes
         from the table of GUI"""
-        selected_id = self._get_selected_quakes_id()
-        return (quake for quake in self.quakes
-                if quake.id in selected_id)
+        return (self.quakes_model.quake(row)
+                for row in self._get_selected_rows())
 
     def save_file(self) -> None:
         """Save function depending on ext of file."""
         self.progressBar.setValue(10)
         dialog = QFileDialog(self)
         file = dialog.getSaveFileName(self, dir='untitled.txt',
-                                      filter=self.file_filter)[0]
+                                      filter=';;'.join(get_files_filters()))[0]
         if not file:
             return self._show_error_dialog('File is not selected! '
                                            'Select a file and try again, '
@@ -71,11 +328,13 @@ class Window(QMainWindow, Ui_MainWindow):
         log.info(f'file to save the quakes: {file}')
         ext = file.suffix
         try:
-            quakes = self.get_selected_quakes()
-            storage = get_storage(ext)
-            save_quakes(quakes, storage(file))
-            self.statusBar().showMessage('Writing into the file '
-                                         'completed successfully.')
+            with trace('export') as exporting:
+                quakes = self.get_selected_quakes()
+                storage = get_storage(ext)
+                save_quakes(quakes, storage(file))
+            self.statusBar().showMessage(f'Writing into the file completed '
+                                         f'successfully. '
+                                         f'{exporting.summary()}')
             log.info(f'Writing into the file completed successfully.')
             self.progressBar.setValue(100)
         except (NoSelectedQuakesError, FormatToStrError,
@@ -101,40 +360,28 @@ class Window(QMainWindow, Ui_MainWindow):
         self.actionConnection.triggered.connect(self._show_connection_dialog)
         self.actionAbout.triggered.connect(self.about)
         self.search_events_button.clicked.connect(self.search_quakes)
+        self.cancel_button.clicked.connect(self.cancel_search)
+        self.follow_button.toggled.connect(self.follow_quakes)
+        self.from_dateTime.dateTimeChanged.connect(self.refilter_quakes)
+        self.to_dateTime.dateTimeChanged.connect(self.refilter_quakes)
+        self.from_Mag.valueChanged.connect(self.refilter_quakes)
+        self.to_Mag.valueChanged.connect(self.refilter_quakes)
+        self.sta_line.textChanged.connect(self.refilter_quakes)
 
     def _show_connection_dialog(self) -> None:
         conn_dialog = ConnectionDialog(self)
         conn_dialog.exec()
 
-    def _set_data_into_table(self) -> None:
-        self.tableWidget.setRowCount(0)
-        for quake in self.quakes:
-            row = self.tableWidget.rowCount()
-            self.tableWidget.insertRow(row)
-            quake_vals = (quake.id, quake.origin_dt, quake.lat, quake.lon,
-                          quake.depth, quake.magnitude.ML,
-                          quake.magnitude.MPSP, quake.reg)
-            for column, val in enumerate(quake_vals):
-                self.tableWidget.setItem(
-                    row, column, QTableWidgetItem(f'{val}'))
-            sta_ph_time = []
-            for sta in quake.stations:
-                sta_ph_time.append(
-                    ' '.join(
-                        (sta.name, sta.phase, f'{sta.phase_dt}')) + '\n')
-            self.tableWidget.setItem(
-                row, 8, QTableWidgetItem('\n'.join(sta_ph_time)))
-
-    def _get_selected_quakes_id(self) -> List[str]:
-        selected_items_amnt = len(self.tableWidget.selectedItems())
-        log.info(f'selected items amount: {selected_items_amnt}')
-        col_count = self.tableWidget.columnCount()
-        if selected_items_amnt == 0 or selected_items_amnt % col_count != 0:
+    def _get_selected_rows(self) -> List[int]:
+        """Return rows of the model in its order, not in the order
+        the table is sorted"""
+        rows = self.quakes_proxy.source_rows(
+            self.tableView.selectionModel().selection())
+        log.info(f'selected quakes amount: {len(rows)}')
+        if not rows:
             raise NoSelectedQuakesError('Nothing is selected! At least one row'
                                         ' from the table must be selected!')
-        log.info(f'selected quakes amount: {selected_items_amnt / col_count}')
-        return [self.tableWidget.selectedItems()[i].text()
-                for i in range(selected_items_amnt) if i % col_count == 0]
+        return rows
 
     def _get_query_params(self) -> QueryParams:
         return QueryParams(from_dt=self.from_dateTime.text(),
@@ -191,4 +438,5 @@ class ConnectionDialog(QDialog, Ui_Dialog):
             config_file.writelines(content_lst[4:])
         self.close()
         config.DB = db_conf
+        db_pool.invalidate()
         log.info(f'db connection config is changed to {db_conf}')
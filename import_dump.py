@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Import of the origin and arrival tables from a dump of the MySQL server
+made by mysqldump into a sqlite file of the local source of quakes.
+
+Only columns used by searches are kept, other tables of the dump are
+skipped. Usage: python import_dump.py dump.sql[.gz] [-o getquakes.sqlite]
+"""
+import argparse
+import gzip
+import re
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import config
+from quake_sources import create_sqlite_tables, create_sqlite_indexes
+
+COLUMNS = {'origin': ('EVENTID', 'ORIGINTIME', 'LAT', 'LON', 'DEPTH',
+                      'COMMENTS'),
+           'arrival': ('EVENTID', 'ITIME', 'STA', 'DIST', 'AZIMUTH',
+                       'IPHASE', 'IM_EM', 'FM', 'AMPL', 'PER', 'ML', 'MPSP')}
+
+INSERT_BATCH_SIZE = 10_000
+
+_CREATE_TABLE = re.compile(r'CREATE TABLE\s+`?(\w+)`?', re.IGNORECASE)
+_COLUMN = re.compile(r'\s*`(\w+)`')
+_INSERT = re.compile(r'INSERT\s+(?:IGNORE\s+)?INTO\s+`?(\w+)`?\s*'
+                     r'(?:\(([^)]*)\)\s*)?VALUES\s*', re.IGNORECASE)
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<open>\() | (?P<close>\)) | (?P<comma>,) |
+    '(?P<string>(?:[^'\\]|\\.|'')*)' |
+    (?P<null>NULL\b) |
+    (?P<number>[-+0-9.eE]+) |
+    (?P<end>;)
+)""", re.VERBOSE | re.DOTALL | re.IGNORECASE)
+_ESCAPE = re.compile(r"\\(.)|''", re.DOTALL)
+_ESCAPES = {'0': '\0', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a',
+            'b': '\b'}
+
+
+def import_dump(dump: Path, file: Path) -> Dict[str, int]:
+    """Fill the tables of the sqlite file by rows of the dump,
+    return amounts of imported rows by tables"""
+    counts = dict.fromkeys(COLUMNS, 0)
+    with closing(sqlite3.connect(file)) as conn:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        create_sqlite_tables(conn)
+        with conn:
+            for table in COLUMNS:
+                conn.execute(f'DELETE FROM {table}')
+        insert_sqls = {
+            table: f"INSERT INTO {table} ({', '.join(columns)}) "
+                   f"VALUES ({', '.join('?' * len(columns))})"
+            for table, columns in COLUMNS.items()}
+        for table, rows in _iter_table_rows(_iter_statements(dump)):
+            with conn:
+                conn.executemany(insert_sqls[table], rows)
+            counts[table] += len(rows)
+        create_sqlite_indexes(conn)
+        conn.execute('ANALYZE')
+    return counts
+
+
+def _iter_statements(dump: Path) -> Iterator[str]:
+    """Yield statements of the dump, mysqldump writes every INSERT
+    in one line with line breaks of strings escaped"""
+    opener = gzip.open if dump.suffix == '.gz' else open
+    with opener(dump, 'rt', encoding='utf8', errors='replace') as lines:
+        statement: List[str] = []
+        for line in lines:
+            if not statement and (line.startswith('--') or
+                                  line.startswith('/*') or not line.strip()):
+                continue
+            statement.append(line)
+            if line.rstrip().endswith(';'):
+                yield ''.join(statement)
+                statement = []
+
+
+def _iter_table_rows(statements: Iterable[str]
+                     ) -> Iterator[Tuple[str, List[tuple]]]:
+    """Yield batches of rows of the kept tables with kept columns"""
+    dump_columns: Dict[str, List[str]] = {}
+    for statement in statements:
+        if match := _CREATE_TABLE.match(statement):
+            dump_columns[match[1]] = [
+                column_match[1] for line in statement.splitlines()[1:]
+                if (column_match := _COLUMN.match(line))]
+            continue
+        match = _INSERT.match(statement)
+        if match is None or match[1] not in COLUMNS:
+            continue
+        table = match[1]
+        columns = [column.strip().strip('`')
+                   for column in match[2].split(',')] if match[2] \
+            else dump_columns[table]
+        indexes = [columns.index(column) for column in COLUMNS[table]]
+        rows = []
+        for values in _iter_values(statement, match.end()):
+            row = [values[index] for index in indexes]
+            if row[0] is not None:
+                row[0] = str(row[0])
+            rows.append(tuple(row))
+            if len(rows) == INSERT_BATCH_SIZE:
+                yield table, rows
+                rows = []
+        if rows:
+            yield table, rows
+
+
+def _iter_values(statement: str, pos: int) -> Iterator[list]:
+    """Yield values of tuples of VALUES (...),(...);"""
+    values: list = []
+    for match in _TOKEN.finditer(statement, pos):
+        kind = match.lastgroup
+        if kind == 'open':
+            values = []
+        elif kind == 'close':
+            yield values
+        elif kind == 'string':
+            values.append(_ESCAPE.sub(_unescape, match['string']))
+        elif kind == 'null':
+            values.append(None)
+        elif kind == 'number':
+            values.append(_to_number(match['number']))
+        elif kind == 'end':
+            return
+
+
+def _unescape(match: re.Match) -> str:
+    if match[1] is None:
+        return "'"
+    return _ESCAPES.get(match[1], match[1])
+
+
+def _to_number(value: str) -> int | float:
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('dump', type=Path,
+                        help='file of mysqldump, may be gzipped')
+    parser.add_argument('-o', '--output', type=Path,
+                        default=Path(config.QUAKE_SOURCE['sqlite_file']),
+                        help='sqlite file of the local source')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    counts = import_dump(args.dump, args.output)
+    print(f"{args.output}: {counts['origin']} origins, "
+          f"{counts['arrival']} arrivals are imported "
+          f"in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
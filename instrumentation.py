@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""Timing of stages of searches and exports.
+
+A trace of an operation is a tree of spans. Spans of the same name under
+one parent are summed up, so a stage entered for every batch of records
+is one span with the amount of its calls. Spans are kept only inside
+of a trace, outside of it span() does nothing. A stage entered for every
+quake is timed by a Stopwatch, which adds its time to the span once,
+so the loop does not pay for a span per quake.
+
+Peak memory of spans is taken by tracemalloc when
+config.INSTRUMENTATION['memory'] is set. It is the memory of the whole
+process, so spans running in other threads at the same time are counted
+too. A finished trace is written into the log and appended as a line of
+JSON into config.INSTRUMENTATION['trace_file'] if it is set. A whole
+search is profiled by cProfile into the file named by the environment
+variable GETQUAKES_PROFILE.
+"""
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+import config
+
+PROFILE_ENV = 'GETQUAKES_PROFILE'
+
+log = logging.getLogger('db_logger')
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+class Span:
+    """Wall time, amount of calls, counters and peak memory of a stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.counts: Dict[str, int] = {}
+        self.peak_kb: float | None = None
+        self.children: Dict[str, Span] = {}
+        self.started_at = datetime.now()
+        self._start = 0.0
+        self._memory = False
+        self._own_tracing = False
+        self._base = 0
+        self._inner_peak = 0
+
+    def count(self, **counts: int) -> None:
+        with _lock:
+            for name, amount in counts.items():
+                self.counts[name] = self.counts.get(name, 0) + amount
+
+    def child(self, name: str) -> 'Span':
+        with _lock:
+            child = self.children.get(name)
+            if child is None:
+                child = self.children[name] = Span(name)
+                child._memory = self._memory
+            return child
+
+    @property
+    def self_seconds(self) -> float:
+        """Time not spent in child spans"""
+        return self.seconds - sum(child.seconds
+                                  for child in self.children.values())
+
+    def summary(self) -> str:
+        """One line of the span and of its children for the status bar"""
+        stages = ', '.join(f'{child.name} {child.seconds:.2f} s'
+                           for child in self.children.values())
+        line = f'{self.name} {self.seconds:.2f} s'
+        if stages:
+            line += f': {stages}'
+        if self.peak_kb is not None:
+            line += f', peak {self.peak_kb / 1024:.1f} MB'
+        return line
+
+    def lines(self, depth: int = 0) -> List[str]:
+        """Lines of the tree of spans for the log"""
+        counts = ''.join(f', {name} {amount}'
+                         for name, amount in self.counts.items())
+        peak = f', peak {self.peak_kb / 1024:.1f} MB' \
+            if self.peak_kb is not None else ''
+        calls = f' in {self.calls} calls' if self.calls > 1 else ''
+        # children running in parallel threads may take more than the span
+        own = f' (self {self.self_seconds:.3f} s)' \
+            if self.children and self.self_seconds >= 0 else ''
+        lines = [f'{"  " * depth}{self.name}: {self.seconds:.3f} s'
+                 f'{own}{calls}{counts}{peak}']
+        for child in self.children.values():
+            lines.extend(child.lines(depth + 1))
+        return lines
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'seconds': round(self.seconds, 6),
+                'calls': self.calls, 'counts': self.counts,
+                'peak_kb': self.peak_kb,
+                'children': [child.to_dict()
+                             for child in self.children.values()]}
+
+
+class _Entry:
+    """One run of a span in the current thread. Peak memory of an outer
+    run includes peaks of inner ones, which reset the peak of tracemalloc"""
+    __slots__ = ('span', '_outer', '_start', '_base', '_outer_peak',
+                 'inner_peak')
+
+    def __init__(self, span: Span):
+        self.span = span
+        self.inner_peak = 0
+
+    def __enter__(self) -> Span:
+        self._outer = getattr(_local, 'entry', None)
+        _local.entry = self
+        self._base = None
+        if self.span._memory and tracemalloc.is_tracing():
+            self._base, self._outer_peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc_info) -> None:
+        seconds = time.perf_counter() - self._start
+        _local.entry = self._outer
+        span = self.span
+        with _lock:
+            span.seconds += seconds
+            span.calls += 1
+        if self._base is not None and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], self.inner_peak)
+            peak_kb = (peak - self._base) / 1024
+            with _lock:
+                span.peak_kb = max(span.peak_kb or 0.0, peak_kb)
+            if self._outer is not None:
+                self._outer.inner_peak = max(self._outer.inner_peak,
+                                             self._outer_peak, peak)
+
+
+class _NoSpan:
+    """Span outside of a trace"""
+
+    def __enter__(self) -> '_NoSpan':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+    def count(self, **counts: int) -> None:
+        pass
+
+    def summary(self) -> str:
+        return ''
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str) -> _Entry | _NoSpan:
+    """Context manager of a stage, a child of the current span"""
+    parent = current_span()
+    if parent is None:
+        return _NO_SPAN
+    return _Entry(parent.child(name))
+
+
+class Stopwatch:
+    """Time of a stage run for every item of a loop, a child of the
+    current span. The time is summed up here and added to the span with
+    counters by close(). Peak memory of such stages is not taken"""
+    __slots__ = ('_span', 'seconds', 'calls', '_start')
+
+    def __init__(self, name: str):
+        parent = current_span()
+        self._span = parent.child(name) if parent is not None else None
+        self.seconds = 0.0
+        self.calls = 0
+        self._start = 0.0
+
+    def __enter__(self) -> 'Stopwatch':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.seconds += time.perf_counter() - self._start
+        self.calls += 1
+
+    def close(self, **counts: int) -> None:
+        span = self._span
+        if span is None or not self.calls:
+            return
+        with _lock:
+            span.seconds += self.seconds
+            span.calls += self.calls
+        if counts:
+            span.count(**counts)
+        self.seconds = 0.0
+        self.calls = 0
+
+
+def current_span() -> Span | None:
+    entry = getattr(_local, 'entry', None)
+    return entry.span if entry is not None else None
+
+
+@contextmanager
+def attached(parent: Span | None) -> Iterator[None]:
+    """Make spans of another thread children of the parent, the time
+    of the parent is not counted here"""
+    outer = getattr(_local, 'entry', None)
+    _local.entry = _Attached(parent) if parent is not None else None
+    try:
+        yield
+    finally:
+        _local.entry = outer
+
+
+class _Attached:
+    """Span entered in another thread, peaks of inner runs are kept
+    by the span"""
+    __slots__ = ('span',)
+
+    def __init__(self, span: Span):
+        self.span = span
+
+    @property
+    def inner_peak(self) -> int:
+        return self.span._inner_peak
+
+    @inner_peak.setter
+    def inner_peak(self, peak: int) -> None:
+        with _lock:
+            self.span._inner_peak = max(self.span._inner_peak, peak)
+
+
+def start_trace(name: str) -> Span | None:
+    """Start a trace of an operation finished by finish_trace(), None
+    if traces are disabled"""
+    if not config.INSTRUMENTATION['enabled']:
+        return None
+    root = Span(name)
+    root._memory = config.INSTRUMENTATION['memory']
+    if root._memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            root._own_tracing = True
+        root._base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    root._start = time.perf_counter()
+    return root
+
+
+def finish_trace(root: Span | None) -> str:
+    """Write the trace into the log and the trace file, return its
+    summary"""
+    if root is None:
+        return ''
+    root.seconds = time.perf_counter() - root._start
+    root.calls = 1
+    if root._memory and tracemalloc.is_tracing():
+        peak = max(tracemalloc.get_traced_memory()[1], root._inner_peak)
+        root.peak_kb = (peak - root._base) / 1024
+        if root._own_tracing:
+            tracemalloc.stop()
+    log.info('Trace of ' + '\n'.join(root.lines()))
+    trace_file = config.INSTRUMENTATION['trace_file']
+    if trace_file:
+        record = root.to_dict()
+        record['started'] = root.started_at.isoformat(timespec='seconds')
+        with open(trace_file, 'a', encoding='utf8') as f:
+            f.write(json.dumps(record) + '\n')
+    return root.summary()
+
+
+@contextmanager
+def trace(name: str) -> Iterator[Span | _NoSpan]:
+    """Trace of an operation, inside of another trace it is a span"""
+    if current_span() is not None:
+        with span(name) as inner:
+            yield inner
+        return
+    root = start_trace(name)
+    if root is None:
+        yield _NO_SPAN
+        return
+    try:
+        with attached(root):
+            yield root
+    finally:
+        finish_trace(root)
+
+
+@contextmanager
+def profiled() -> Iterator[None]:
+    """Profile the current thread by cProfile into the file
+    of GETQUAKES_PROFILE if the variable is set"""
+    file = os.environ.get(PROFILE_ENV)
+    if not file:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(file)
+        log.info(f'Profile of the search is written into {file}')
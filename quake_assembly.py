@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""Assembly of quakes from records of a search by a pool of processes.
+
+Records ordered by EVENTID are split into parts by ranges of EVENTID.
+Every part is grouped into quakes and filtered in a process of the pool.
+Quakes come back as columns of their values, since unpickling of Quake
+and Sta objects takes longer than building them. Sta and Quake objects
+are built in the calling process.
+
+assemble_quakes() takes records kept in memory, processes started by
+fork inherit them. iter_assembled_quakes() takes records as they are
+fetched, parts of them are pickled to processes, which are not forked
+from the process fetching records by several threads.
+"""
+import gc
+import heapq
+import multiprocessing
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Deque, Iterable, Iterator, List, NamedTuple, Sequence
+
+import config
+from quake_structures import Quake, Sta
+from quakes_from_db import QueryParams, SearchProgress, _group_quakes, \
+    _filter_quakes, _get_quake_filter
+
+# fields of Sta after phase_dt
+STA_FIELDS = ('name', 'dist', 'azimuth', 'phase', 'entry', 'ampl', 'period',
+              'mag_ML', 'mag_MPSP')
+
+# parts of records per process, so processes finish at about one time
+_PARTS_PER_WORKER = 4
+
+# records of a part of iter_assembled_quakes(), the rest of a quake
+# is added to them
+_STREAM_PART_RECORDS = 20_000
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# records of a running assembly inherited by forked processes
+_records: Sequence[tuple] = ()
+
+
+class PackedQuakes(NamedTuple):
+    """Quakes as columns. Origins are tuples of id, origin_dt, lat, lon,
+    depth, reg and the amount of stations, stations of quakes follow each
+    other with the phase time in microseconds since the epoch. grouped
+    is the amount of quakes before the filter"""
+    origins: List[tuple]
+    phase_us: array
+    sta_columns: List[list]
+    grouped: int
+
+
+def assemble_quakes(records: Sequence[tuple], params: QueryParams,
+                    workers: int) -> List[Quake]:
+    """Return the quakes of _filter_quakes(_group_quakes(records), params)
+    in the same order, records are ordered by EVENTID"""
+    global _records
+    bounds = _split(records, workers * _PARTS_PER_WORKER)
+    fork = 'fork' in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if fork else None)
+    _records = records if fork else ()
+    try:
+        with ProcessPoolExecutor(workers, mp_context=context) as executor:
+            futures = [
+                executor.submit(_assemble_part, start, end, params,
+                                None if fork else records[start:end])
+                for start, end in zip(bounds, bounds[1:])]
+            with _no_gc():
+                parts = [_unpack(future.result()) for future in futures]
+    finally:
+        _records = ()
+    # parts are in order of EVENTID, so the merge is the stable sort
+    # of sort_quakes()
+    return list(heapq.merge(*parts, key=lambda quake: quake.first_phase_dt))
+
+
+def iter_assembled_quakes(records: Iterable[tuple], params: QueryParams,
+                          workers: int,
+                          progress: SearchProgress) -> Iterator[Quake]:
+    """Yield the quakes of _group_quakes(records) passing the filter of
+    params in order of EVENTID as iter_found_quakes() does. Quakes of the
+    first config.PARALLEL_ASSEMBLY['min_records'] records are assembled
+    by this process, parts of next records by the pool while records
+    are fetched"""
+    parts = _iter_parts(records)
+    assembled = 0
+    for part in parts:
+        yield from _assemble_here(part, params, progress)
+        assembled += len(part)
+        if assembled >= config.PARALLEL_ASSEMBLY['min_records']:
+            break
+    else:
+        return
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        'forkserver' if 'forkserver' in methods else 'spawn')
+    pending: Deque[Future] = deque()
+    with ProcessPoolExecutor(workers, mp_context=context) as executor:
+        try:
+            for part in parts:
+                pending.append(executor.submit(_assemble_records, part,
+                                               params))
+                # not more parts than processes take are kept in memory
+                while len(pending) > workers * _PARTS_PER_WORKER or \
+                        pending and pending[0].done():
+                    yield from _take(pending.popleft(), progress)
+            while pending:
+                yield from _take(pending.popleft(), progress)
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _iter_parts(records: Iterable[tuple]) -> Iterator[List[tuple]]:
+    """Yield parts of about _STREAM_PART_RECORDS records, records
+    of a quake are in one part"""
+    part: List[tuple] = []
+    for record in records:
+        if len(part) >= _STREAM_PART_RECORDS and record[0] != part[-1][0]:
+            yield part
+            part = []
+        part.append(record)
+    if part:
+        yield part
+
+
+def _assemble_here(part: List[tuple], params: QueryParams,
+                   progress: SearchProgress) -> Iterator[Quake]:
+    quake_fits = _get_quake_filter(params)
+    for quake in _group_quakes(part):
+        progress.check()
+        progress.quakes += 1
+        if quake_fits(quake):
+            yield quake
+
+
+def _take(future: Future, progress: SearchProgress) -> List[Quake]:
+    packed = future.result()
+    progress.check()
+    progress.quakes += packed.grouped
+    with _no_gc():
+        return _unpack(packed)
+
+
+def _split(records: Sequence[tuple], parts: int) -> List[int]:
+    """Return bounds of parts of about the same amount of records,
+    records of a quake are in one part"""
+    size = max(1, -(-len(records) // parts))
+    bounds = [0]
+    while bounds[-1] < len(records):
+        bound = min(bounds[-1] + size, len(records))
+        while bound < len(records) and \
+                records[bound][0] == records[bound - 1][0]:
+            bound += 1
+        bounds.append(bound)
+    return bounds
+
+
+def _assemble_part(start: int, end: int, params: QueryParams,
+                   records: Sequence[tuple] | None) -> PackedQuakes:
+    if records is None:
+        records = _records[start:end]
+    with _no_gc():
+        quakes = list(_group_quakes(records))
+        return _pack(_filter_quakes(quakes, params), len(quakes))
+
+
+def _assemble_records(records: List[tuple],
+                      params: QueryParams) -> PackedQuakes:
+    """Quakes of records unsorted, as they are grouped"""
+    quake_fits = _get_quake_filter(params)
+    with _no_gc():
+        quakes = list(_group_quakes(records))
+        return _pack([quake for quake in quakes if quake_fits(quake)],
+                      len(quakes))
+
+
+@contextmanager
+def _no_gc() -> Iterator[None]:
+    """Quakes have no reference cycles, collections of garbage while
+    they are made would only scan them again and again"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _pack(quakes: List[Quake], grouped: int) -> PackedQuakes:
+    stations = [sta for quake in quakes for sta in quake.stations]
+    origins = [(quake.id, quake.origin_dt, quake.lat, quake.lon, quake.depth,
+                quake.reg, len(quake.stations)) for quake in quakes]
+    phase_us = array('q', [(sta.phase_dt - _EPOCH) // _MICROSECOND
+                           for sta in stations])
+    sta_columns = [[getattr(sta, field) for sta in stations]
+                   for field in STA_FIELDS]
+    return PackedQuakes(origins, phase_us, sta_columns, grouped)
+
+
+def _unpack(packed: PackedQuakes) -> List[Quake]:
+    # exact, microseconds of timestamps are far within 53 bits
+    phase_dts = [datetime.utcfromtimestamp(us / 1e6)
+                 for us in packed.phase_us]
+    stations = list(map(Sta, phase_dts, *packed.sta_columns))
+    quakes = []
+    position = 0
+    for *origin, count in packed.origins:
+        quakes.append(Quake(*origin,
+                            tuple(stations[position:position + count])))
+        position += count
+    return quakes
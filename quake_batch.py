@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""Columnar representation of quakes built with numpy.
+
+Arrivals of all quakes are kept in one structured array ordered by quake
+with offsets of quakes in it, station names, phases and entries are
+interned. Columns are filled from batches of rows of the cursor, records
+of quakes are not made. Grouping of rows, the station merge of
+_filter_stations(), magnitudes and filters of _filter_quakes() run
+vectorized, Quake and Sta objects are built only when a quake is got
+from the batch.
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Set, Sequence, \
+    Tuple
+
+import numpy as np
+
+import config
+from quake_structures import Quake, Sta, Magnitude
+from quakes_from_db import _get_region, _concat
+
+
+ARRIVAL_DTYPE = np.dtype([('time_us', 'i8'), ('sta', 'i4'), ('dist', 'f8'),
+                          ('azimuth', 'f8'), ('phase', 'i4'),
+                          ('entry', 'i4'), ('ampl', 'f8'), ('period', 'f8'),
+                          ('ml', 'f8'), ('mpsp', 'f8')])
+
+EVENT_DTYPE = np.dtype([('origin_us', 'i8'), ('lat', 'f8'), ('lon', 'f8'),
+                        ('depth', 'f8'), ('ml', 'f8'), ('mpsp', 'f8')])
+
+# rows of the query of quakes_from_db._get_sql_query()
+ROW_DTYPE = np.dtype([('eventid', 'O'), ('origintime', 'f8'), ('lat', 'f8'),
+                      ('lon', 'f8'), ('depth', 'f8'), ('comments', 'O'),
+                      ('itime', 'f8'), ('sta', 'O'), ('dist', 'f8'),
+                      ('azimuth', 'f8'), ('iphase', 'O'), ('im_em', 'O'),
+                      ('fm', 'O'), ('ampl', 'f8'), ('period', 'f8'),
+                      ('ml', 'f8'), ('mpsp', 'f8')])
+
+# origin time of a quake without it, the view gives datetime.min
+NO_TIME = np.iinfo(np.int64).min
+
+_MICROSECONDS = np.dtype('datetime64[us]')
+
+# quakes built at once by iteration of a batch
+_VIEWS_BLOCK = 1000
+
+# fields merged by _add_sta() from the last record having a value
+_MERGED_FIELDS = ('azimuth', 'ampl', 'period', 'ml', 'mpsp')
+
+
+class QuakeBatch(Sequence[Quake]):
+    """Quakes with arrivals kept in numpy arrays"""
+
+    def __init__(self, ids: np.ndarray, regions: np.ndarray,
+                 events: np.ndarray, arrivals: np.ndarray,
+                 offsets: np.ndarray, stations: np.ndarray,
+                 phases: np.ndarray, entries: np.ndarray,
+                 decimal_ampl: bool = False):
+        self.ids = ids
+        self.regions = regions
+        self.events = events
+        self.arrivals = arrivals
+        self.offsets = offsets
+        self.stations = stations
+        self.phases = phases
+        self.entries = entries
+        # amplitudes are given as Decimal as the DB gave them
+        self.decimal_ampl = decimal_ampl
+
+    @classmethod
+    def from_rows(cls, batches: Iterable[Sequence[tuple]]) -> 'QuakeBatch':
+        """Build the batch from batches of rows of the query of
+        quakes_from_db._get_sql_query() as they come from the cursor.
+        Every batch is turned into typed columns at once and is not kept.
+        Rows of a quake may come in any batches, quakes of the batch
+        are ordered by EVENTID as records of the query"""
+        columns = _Columns()
+        for rows in batches:
+            columns.add(rows)
+        return columns.to_batch()
+
+    def select(self, from_mag: float, to_mag: float,
+               sta_names: Set[str] | None) -> 'QuakeBatch':
+        """Return quakes passing filters of _filter_quakes() sorted
+        by time of the first phase. sta_names None means all stations"""
+        mag = np.where(self.events['ml'] != 0.0, self.events['ml'],
+                       self.events['mpsp'])
+        fits = (from_mag <= mag) & (mag <= to_mag)
+        event_of_arrival = np.repeat(np.arange(len(self)),
+                                     np.diff(self.offsets))
+        for sta_name in sta_names or ():
+            sta_code = np.searchsorted(self.stations, sta_name)
+            has_sta = np.zeros(len(self), dtype=bool)
+            if sta_code < len(self.stations) and \
+                    self.stations[sta_code] == sta_name:
+                has_sta[event_of_arrival[
+                    self.arrivals['sta'] == sta_code]] = True
+            fits &= has_sta
+        selected = np.flatnonzero(fits)
+        first_phase = self.arrivals['time_us'][self.offsets[selected]]
+        return self.take(selected[np.argsort(first_phase, kind='stable')])
+
+    def take(self, indices: np.ndarray) -> 'QuakeBatch':
+        """Return the batch of quakes with indices in their order"""
+        counts = np.diff(self.offsets)[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        arrival_indices = np.repeat(self.offsets[indices] - offsets[:-1],
+                                    counts) + np.arange(offsets[-1])
+        return QuakeBatch(self.ids[indices], self.regions[indices],
+                          self.events[indices],
+                          self.arrivals[arrival_indices], offsets,
+                          self.stations, self.phases, self.entries,
+                          self.decimal_ampl)
+
+    def magnitude(self, index: int) -> Magnitude:
+        event = self.events[index]
+        return Magnitude(float(event['ml']), float(event['mpsp']))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(np.arange(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('quake index out of range')
+        return next(self._iter_quakes(index, index + 1))
+
+    def __iter__(self) -> Iterator[Quake]:
+        for start in range(0, len(self), _VIEWS_BLOCK):
+            yield from self._iter_quakes(
+                start, min(start + _VIEWS_BLOCK, len(self)))
+
+    def _iter_quakes(self, start: int, stop: int) -> Iterator[Quake]:
+        """Build quakes from start to stop, values of their arrays
+        are got as Python objects at once by tolist()"""
+        offsets = self.offsets[start:stop + 1].tolist()
+        arrivals = self.arrivals[offsets[0]:offsets[-1]]
+        ampls = _to_list(arrivals['ampl'])
+        if self.decimal_ampl:
+            ampls = [Decimal(repr(ampl)) if ampl is not None else None
+                     for ampl in ampls]
+        stations = list(map(
+            Sta, arrivals['time_us'].astype(_MICROSECONDS).tolist(),
+            self.stations[arrivals['sta']].tolist(),
+            _to_list(arrivals['dist']), _to_list(arrivals['azimuth']),
+            self.phases[arrivals['phase']].tolist(),
+            self.entries[arrivals['entry']].tolist(), ampls,
+            _to_list(arrivals['period']), _to_list(arrivals['ml']),
+            _to_list(arrivals['mpsp'])))
+        events = self.events[start:stop]
+        # NO_TIME is NaT of numpy, it is got as None
+        origin_dts = events['origin_us'].astype(_MICROSECONDS).tolist()
+        for index, origin_dt, lat, lon, depth in zip(
+                range(start, stop), origin_dts, _to_list(events['lat']),
+                _to_list(events['lon']), _to_list(events['depth'])):
+            first = offsets[index - start] - offsets[0]
+            last = offsets[index - start + 1] - offsets[0]
+            yield Quake(self.ids[index],
+                        origin_dt if origin_dt is not None else datetime.min,
+                        lat, lon, depth, self.regions[index],
+                        tuple(stations[first:last]))
+
+
+def _merge_stations(arrivals: np.ndarray, event_codes: np.ndarray,
+                    events_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge arrivals of each quake by the rules of _filter_stations()
+    and _add_sta(), return merged arrivals ordered by quake and offsets
+    of quakes"""
+    order = np.lexsort((np.arange(len(arrivals)), arrivals['time_us'],
+                        arrivals['sta'], event_codes))
+    arrivals, event_codes = arrivals[order], event_codes[order]
+    positions = np.arange(len(arrivals))
+    # run: arrivals of a quake at one station sorted by time,
+    # group: arrivals of a run with the same time merged into one station
+    run_starts = np.ones(len(arrivals), dtype=bool)
+    run_starts[1:] = (event_codes[1:] != event_codes[:-1]) | \
+        (arrivals['sta'][1:] != arrivals['sta'][:-1])
+    group_starts = run_starts.copy()
+    group_starts[1:] |= arrivals['time_us'][1:] != arrivals['time_us'][:-1]
+    group_first = np.flatnonzero(group_starts)
+    group_last = np.append(group_first[1:] - 1, len(arrivals) - 1)
+    merged = arrivals[group_first]
+    group_of_arrival = np.cumsum(group_starts) - 1
+    run_start_of_arrival = np.maximum.accumulate(
+        np.where(run_starts, positions, 0))
+    for field in _MERGED_FIELDS:
+        last_valid = _last_valid(arrivals[field], positions,
+                                 positions[group_first][group_of_arrival])
+        merged[field] = _take_valid(arrivals[field], last_valid[group_last])
+    # the distance is carried between stations of a run: a station gets
+    # the last distance before the next station of the run
+    last_valid = _last_valid(arrivals['dist'], positions,
+                             run_start_of_arrival)
+    next_first = np.append(group_first[1:], len(arrivals))
+    next_in_run = next_first < len(arrivals)
+    next_in_run[next_in_run] = ~run_starts[next_first[next_in_run]]
+    dist_at = np.where(next_in_run, np.minimum(next_first, len(arrivals) - 1),
+                       group_last)
+    merged['dist'] = _take_valid(arrivals['dist'], last_valid[dist_at])
+    merged_events = event_codes[group_first]
+    dist_key = np.nan_to_num(merged['dist'], nan=0.0)
+    order = np.lexsort((np.arange(len(merged)), dist_key, merged_events))
+    offsets = np.zeros(events_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(merged_events, minlength=events_count),
+              out=offsets[1:])
+    return merged[order], offsets
+
+
+def _last_valid(values: np.ndarray, positions: np.ndarray,
+                starts: np.ndarray) -> np.ndarray:
+    """Return position of the last not NaN value up to each position
+    since its start, -1 if there is no such value"""
+    last_valid = np.maximum.accumulate(
+        np.where(np.isnan(values), -1, positions))
+    return np.where(last_valid >= starts, last_valid, -1)
+
+
+def _take_valid(values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    return np.where(positions >= 0, values[positions], np.nan)
+
+
+def _average(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Average of not zero values of each quake rounded
+    as in Quake.magnitude"""
+    events_count = len(offsets) - 1
+    event_of_value = np.repeat(np.arange(events_count), np.diff(offsets))
+    present = ~np.isnan(values) & (values != 0.0)
+    sums = np.bincount(event_of_value[present], weights=values[present],
+                       minlength=events_count)
+    counts = np.bincount(event_of_value[present], minlength=events_count)
+    averages = np.divide(sums, counts, out=np.zeros(events_count),
+                         where=counts != 0)
+    return np.array([round(average, 1) for average in averages.tolist()])
+
+
+class _Codes:
+    """Numbers of values of a column in order of their first appearance"""
+
+    def __init__(self):
+        self.values: list = []
+        self._codes: Dict[Any, int] = {}
+
+    def encode(self, column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return codes of values of the column and positions of values
+        met for the first time in order of their codes. The dict
+        of codes is looked up only by distinct values of the column"""
+        uniques, first, inverse = _unique(column)
+        known = len(self.values)
+        codes = np.fromiter((self._get_code(value) for value in uniques),
+                            dtype=np.int64, count=len(uniques))
+        return codes[inverse], first[codes >= known]
+
+    def _get_code(self, value: Any) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class _Columns:
+    """Typed columns of batches of rows of ROW_DTYPE, strings are kept
+    by codes. Values of an origin are taken from the first row
+    of its quake"""
+
+    def __init__(self):
+        self.ids = _Codes()
+        self.stations = _Codes()
+        self.phases = _Codes()
+        self.im_em = _Codes()
+        self.fm = _Codes()
+        self.event_codes: List[np.ndarray] = []
+        self.arrivals: List[np.ndarray] = []
+        self.fm_codes: List[np.ndarray] = []
+        self.events: List[np.ndarray] = []
+        self.regions: List[str | None] = []
+        self.decimal_ampl = False
+
+    def add(self, rows: Sequence[tuple]) -> None:
+        if not rows:
+            return
+        # numpy converts rows to the typed columns, None of a number is NaN
+        row_array = np.array(rows, dtype=ROW_DTYPE)
+        event_codes, first_rows = self.ids.encode(row_array['eventid'])
+        arrivals = np.empty(len(row_array), dtype=ARRIVAL_DTYPE)
+        arrivals['time_us'] = _to_microseconds(row_array['itime'])
+        arrivals['sta'] = self.stations.encode(row_array['sta'])[0]
+        arrivals['phase'] = self.phases.encode(row_array['iphase'])[0]
+        # the entry is a code of IM_EM here, it is joined with FM
+        # by to_batch()
+        arrivals['entry'] = self.im_em.encode(row_array['im_em'])[0]
+        for field in ('dist', 'azimuth', 'ampl', 'period', 'ml', 'mpsp'):
+            arrivals[field] = row_array[field]
+        self.decimal_ampl = self.decimal_ampl or isinstance(
+            next(filter(None, (row[13] for row in rows)), None), Decimal)
+        origins = row_array[first_rows]
+        events = np.empty(len(origins), dtype=EVENT_DTYPE)
+        events['origin_us'] = np.where(
+            np.isnan(origins['origintime']), NO_TIME,
+            _to_microseconds(np.nan_to_num(origins['origintime'])))
+        for field in ('lat', 'lon', 'depth'):
+            events[field] = origins[field]
+        self.regions.extend(map(_get_region, origins['comments'].tolist()))
+        self.event_codes.append(event_codes)
+        self.arrivals.append(arrivals)
+        self.fm_codes.append(self.fm.encode(row_array['fm'])[0])
+        self.events.append(events)
+
+    def to_batch(self) -> QuakeBatch:
+        if not self.arrivals:
+            return _empty_batch()
+        # codes of quakes are ranks of their EVENTID
+        order = np.argsort(np.array(self.ids.values), kind='stable')
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(len(order))
+        event_codes = ranks[np.concatenate(self.event_codes)]
+        arrivals = np.concatenate(self.arrivals)
+        names = [name + 'R' if name in config.STA_RENAME else name
+                 for name in self.stations.values]
+        stations, renamed_codes = np.unique(np.array(names, dtype=object),
+                                            return_inverse=True)
+        arrivals['sta'] = renamed_codes[arrivals['sta']]
+        fm_count = len(self.fm.values)
+        pairs, entry_codes = np.unique(
+            arrivals['entry'].astype(np.int64) * fm_count +
+            np.concatenate(self.fm_codes), return_inverse=True)
+        arrivals['entry'] = entry_codes
+        entries = _to_objects([
+            _concat(self.im_em.values[pair // fm_count],
+                    self.fm.values[pair % fm_count])
+            for pair in pairs.tolist()])
+        arrivals, offsets = _merge_stations(arrivals, event_codes,
+                                            len(order))
+        events = np.concatenate(self.events)[order]
+        events['ml'] = _average(arrivals['ml'], offsets)
+        events['mpsp'] = _average(arrivals['mpsp'], offsets)
+        return QuakeBatch(_to_objects(self.ids.values)[order],
+                          _to_objects(self.regions)[order], events,
+                          arrivals, offsets, stations,
+                          _to_objects(self.phases.values), entries,
+                          self.decimal_ampl)
+
+
+def _unique(array: np.ndarray) -> Tuple[list, np.ndarray, np.ndarray]:
+    """Return distinct values of the column of objects, positions of their
+    first appearance and indices of values of the column in them. Values
+    are sorted by numpy in a typed array, None is a value of its own"""
+    missing = np.equal(array, None)
+    present = np.flatnonzero(~missing)
+    uniques, first, inverse = np.unique(np.array(array[present].tolist()),
+                                        return_index=True,
+                                        return_inverse=True)
+    values = uniques.tolist()
+    indices = np.full(len(array), len(values), dtype=np.int64)
+    indices[present] = inverse.ravel()
+    first = present[first]
+    if len(present) < len(array):
+        values.append(None)
+        first = np.append(first, np.argmax(missing))
+    return values, first, indices
+
+
+def _to_objects(values: Sequence) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _to_list(values: np.ndarray) -> List[float | None]:
+    """Values of the array as Python floats, NaN is None"""
+    objects = values.astype(object)
+    objects[np.isnan(values)] = None
+    return objects.tolist()
+
+
+def _to_microseconds(timestamps: np.ndarray) -> np.ndarray:
+    """Round timestamps to microseconds as datetime.utcfromtimestamp()"""
+    fraction, seconds = np.modf(timestamps)
+    microseconds = np.round(fraction * 1e6)
+    seconds = np.where(microseconds >= 1e6, seconds + 1, seconds)
+    microseconds = np.where(microseconds >= 1e6, microseconds - 1e6,
+                            microseconds)
+    seconds = np.where(microseconds < 0, seconds - 1, seconds)
+    microseconds = np.where(microseconds < 0, microseconds + 1e6,
+                            microseconds)
+    return seconds.astype(np.int64) * 1_000_000 + \
+        microseconds.astype(np.int64)
+
+
+def _empty_batch() -> QuakeBatch:
+    empty = np.array([], dtype=object)
+    return QuakeBatch(empty, empty, np.empty(0, dtype=EVENT_DTYPE),
+                      np.empty(0, dtype=ARRIVAL_DTYPE),
+                      np.zeros(1, dtype=np.int64), empty, empty, empty)
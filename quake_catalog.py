@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Any
+
+from quake_structures import Quake
+
+
+class QuakeCatalog:
+    """Quakes of a search with indexes by id, time of the first phase,
+    preferred magnitude and stations. Quakes are selected by positions
+    in the catalog without a new query to DB"""
+
+    def __init__(self, quakes: Iterable[Quake]):
+        self.quakes: List[Quake] = list(quakes)
+        self._positions: Dict[str, int] = {
+            quake.id: position for position, quake in enumerate(self.quakes)}
+        self._time_order, self._times = self._sort_by(_get_time)
+        self._mag_order, self._mags = self._sort_by(_get_mag)
+        self._stations: Dict[str, List[int]] = defaultdict(list)
+        for position, quake in enumerate(self.quakes):
+            for sta_name in quake.stations_name:
+                self._stations[sta_name].append(position)
+
+    def __len__(self) -> int:
+        return len(self.quakes)
+
+    def __getitem__(self, position: int) -> Quake:
+        return self.quakes[position]
+
+    def __iter__(self) -> Iterator[Quake]:
+        return iter(self.quakes)
+
+    def get(self, quake_id: str) -> Quake | None:
+        position = self._positions.get(quake_id)
+        return self.quakes[position] if position is not None else None
+
+    def position(self, quake_id: str) -> int | None:
+        return self._positions.get(quake_id)
+
+    def select(self, from_dt: datetime | None = None,
+               to_dt: datetime | None = None,
+               from_mag: float = float('-inf'), to_mag: float = float('inf'),
+               sta_names: Iterable[str] | None = None) -> List[int]:
+        """Return sorted positions of quakes with the first phase in
+        [from_dt, to_dt], the preferred magnitude in [from_mag, to_mag]
+        and all of sta_names among stations. The smallest candidates
+        set of the indexes is checked by the other conditions"""
+        sta_names = frozenset(sta_names or ())
+        candidates: List[Sequence[int]] = []
+        if from_dt is not None or to_dt is not None:
+            candidates.append(_get_range(self._time_order, self._times,
+                                         from_dt, to_dt))
+        if from_mag != float('-inf') or to_mag != float('inf'):
+            candidates.append(_get_range(self._mag_order, self._mags,
+                                         from_mag, to_mag))
+        for sta_name in sta_names:
+            candidates.append(self._stations.get(sta_name, []))
+        if not candidates:
+            return list(range(len(self.quakes)))
+        from_dt = from_dt or datetime.min
+        to_dt = to_dt or datetime.max
+        positions = []
+        for position in min(candidates, key=len):
+            quake = self.quakes[position]
+            if from_dt <= _get_time(quake) <= to_dt \
+                    and from_mag <= quake.preferred_mag <= to_mag \
+                    and sta_names.issubset(quake.stations_name):
+                positions.append(position)
+        return sorted(positions)
+
+    def _sort_by(self, key: Any) -> Tuple[List[int], List[Any]]:
+        keys = [key(quake) for quake in self.quakes]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        return order, [keys[position] for position in order]
+
+
+def _get_time(quake: Quake) -> datetime:
+    return quake.first_phase_dt or datetime.min
+
+
+def _get_mag(quake: Quake) -> float:
+    return quake.preferred_mag
+
+
+def _get_range(order: List[int], keys: List[Any], from_key: Any,
+               to_key: Any) -> List[int]:
+    lo = bisect_left(keys, from_key) if from_key is not None else 0
+    hi = bisect_right(keys, to_key) if to_key is not None else len(keys)
+    return order[lo:hi]
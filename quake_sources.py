@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""Backends holding the origin and arrival tables of quakes.
+
+Queries are built by quakes_from_db, a backend runs them and gives
+the parts of SQL differing between databases.
+"""
+import logging
+import sqlite3
+from contextlib import closing, ExitStack
+from functools import partial
+from pathlib import Path
+from typing import Protocol, Iterator, List, Dict, Callable, NamedTuple, \
+    Sequence, Tuple, Any, TYPE_CHECKING
+
+import config
+import db_pool
+from db_pool import pool, kill_query
+from exceptions import ConnectDatabaseError
+from instrumentation import span
+
+if TYPE_CHECKING:
+    from quakes_from_db import SearchProgress
+
+
+log = logging.getLogger('db_logger')
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS origin (
+    EVENTID TEXT, ORIGINTIME REAL, LAT REAL, LON REAL, DEPTH REAL,
+    COMMENTS TEXT);
+CREATE TABLE IF NOT EXISTS arrival (
+    EVENTID TEXT, ITIME REAL, STA TEXT, DIST REAL, AZIMUTH REAL,
+    IPHASE TEXT, IM_EM TEXT, FM TEXT, AMPL REAL, PER REAL, ML REAL,
+    MPSP REAL);
+"""
+
+
+class Index(NamedTuple):
+    name: str
+    table: str
+    columns: Tuple[str, ...]
+    kind: str = ''
+
+
+# indexes used by the range of ITIME and the join of a search
+INDEXES = (Index('arrival_itime', 'arrival', ('ITIME',)),
+           Index('arrival_eventid', 'arrival', ('EVENTID',)),
+           Index('origin_eventid', 'origin', ('EVENTID',)))
+
+# index of keywords of the comment on the MySQL server
+FULLTEXT_INDEX = Index('origin_comments', 'origin', ('COMMENTS',),
+                       'FULLTEXT')
+
+
+class PlanStep(NamedTuple):
+    """Access to a table in the plan of a query, the table is named
+    by its alias in the query"""
+    table: str
+    detail: str
+    full_scan: bool
+
+
+class QuakeSource(Protocol):
+    """Database with the origin and arrival tables. A local source
+    is not cached by query_cache. Arguments of queries are bound
+    by the placeholder of param"""
+    local: bool
+    param: str
+
+    @property
+    def key(self) -> str:
+        """Identity of the database for caches of records"""
+        ...
+
+    def iter_batches(self, sql: str, args: Sequence[Any],
+                     progress: 'SearchProgress') -> Iterator[List[tuple]]:
+        """Yield rows of the query by batches of config.FETCH_BATCH_SIZE,
+        the query is aborted by cancel of progress. Errors of the
+        database are raised as ConnectDatabaseError"""
+        ...
+
+    def explain(self, sql: str, args: Sequence[Any]) -> List[PlanStep]:
+        """Return the plan of the query made by the database"""
+        ...
+
+    def has_fulltext_index(self, table: str, column: str,
+                           progress: 'SearchProgress') -> bool:
+        """The column can be searched by MATCH ... AGAINST"""
+        ...
+
+    def floor(self, expression: str) -> str:
+        """SQL of the expression rounded down to an integer"""
+        ...
+
+
+class MySQLSource(QuakeSource):
+    """Central MySQL server of config.DB used through the pool
+    of connections"""
+    local = False
+    param = '%s'
+
+    @property
+    def key(self) -> str:
+        db = config.DB
+        return f"{db['host']}:{db['port']}/{db['database']}"
+
+    def iter_batches(self, sql: str, args: Sequence[Any],
+                     progress: 'SearchProgress') -> Iterator[List[tuple]]:
+        try:
+            with ExitStack() as stack:
+                with span('connect'):
+                    conn = stack.enter_context(pool.connection())
+                stack.enter_context(progress.statement(
+                    partial(_kill_query, conn.connection_id)))
+                with conn.cursor() as cursor:
+                    with span('execute'):
+                        cursor.execute(sql, tuple(args))
+                    yield from _iter_fetched(cursor)
+        except db_pool.Error as exc:
+            raise ConnectDatabaseError(exc.msg)
+
+    def explain(self, sql: str, args: Sequence[Any]) -> List[PlanStep]:
+        try:
+            with pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN {sql}', tuple(args))
+                    names = [column[0] for column in cursor.description]
+                    rows = [dict(zip(names, row))
+                            for row in cursor.fetchall()]
+        except db_pool.Error as exc:
+            raise ConnectDatabaseError(exc.msg)
+        # 'ALL' reads the whole table, 'index' the whole index
+        return [PlanStep(f"{row['table']}",
+                         f"type={row['type']}, key={row['key']}, "
+                         f"rows={row['rows']}, {row['Extra']}",
+                         row['type'] in ('ALL', 'index'))
+                for row in rows]
+
+    def has_fulltext_index(self, table: str, column: str,
+                           progress: 'SearchProgress') -> bool:
+        # indexes are looked up once for the DB
+        key = (self.key, table, column)
+        if key not in _fulltext_indexes:
+            sql = "SELECT COUNT(*) FROM information_schema.STATISTICS " \
+                  "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s " \
+                  "AND COLUMN_NAME = %s AND INDEX_TYPE = 'FULLTEXT'"
+            rows = [row for rows in self.iter_batches(sql, (table, column),
+                                                      progress)
+                    for row in rows]
+            _fulltext_indexes[key] = rows[0][0] > 0
+        return _fulltext_indexes[key]
+
+    def floor(self, expression: str) -> str:
+        return f'FLOOR({expression})'
+
+
+class SQLiteSource(QuakeSource):
+    """Local copy of the tables in a sqlite file made by import_dump.py,
+    so searches work without a link to the server"""
+    local = True
+    param = '?'
+
+    def __init__(self, file: Path | str):
+        self.file = Path(file)
+
+    @property
+    def key(self) -> str:
+        return f'sqlite:{self.file.resolve()}'
+
+    def iter_batches(self, sql: str, args: Sequence[Any],
+                     progress: 'SearchProgress') -> Iterator[List[tuple]]:
+        try:
+            with span('connect'):
+                conn = self._connect()
+            with closing(conn), progress.statement(conn.interrupt):
+                with span('execute'):
+                    cursor = conn.execute(sql, args)
+                yield from _iter_fetched(cursor)
+        except sqlite3.Error as exc:
+            raise ConnectDatabaseError(f'{self.file}: {exc}')
+
+    def explain(self, sql: str, args: Sequence[Any]) -> List[PlanStep]:
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}',
+                                    args).fetchall()
+        except sqlite3.Error as exc:
+            raise ConnectDatabaseError(f'{self.file}: {exc}')
+        plan = []
+        for *_, detail in rows:
+            # e.g. "SEARCH a USING INDEX arrival_itime (ITIME>? AND ITIME<?)"
+            access, _, rest = detail.partition(' ')
+            if access not in ('SCAN', 'SEARCH') or rest.startswith(
+                    ('CONSTANT', '(')):
+                continue
+            plan.append(PlanStep(rest.split()[0], detail, access == 'SCAN'))
+        return plan
+
+    def has_fulltext_index(self, table: str, column: str,
+                           progress: 'SearchProgress') -> bool:
+        return False
+
+    def floor(self, expression: str) -> str:
+        # values of the histogram are not negative
+        return f'CAST({expression} AS INTEGER)'
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self.file.exists():
+            raise sqlite3.OperationalError('no such file')
+        return sqlite3.connect(f'{self.file.resolve().as_uri()}?mode=ro',
+                               uri=True)
+
+
+_fulltext_indexes: Dict[Tuple[str, str, str], bool] = {}
+
+
+def _iter_fetched(cursor: Any) -> Iterator[List[tuple]]:
+    while True:
+        with span('fetch') as fetch:
+            rows = cursor.fetchmany(config.FETCH_BATCH_SIZE)
+            fetch.count(rows=len(rows))
+        if not rows:
+            return
+        yield rows
+
+
+def create_sqlite_tables(conn: sqlite3.Connection) -> None:
+    conn.executescript(SQLITE_SCHEMA)
+
+
+def create_sqlite_indexes(conn: sqlite3.Connection) -> None:
+    for index in INDEXES:
+        conn.execute(get_index_ddl(index, if_not_exists=True))
+
+
+def get_index_ddl(index: Index, if_not_exists: bool = False) -> str:
+    """CREATE INDEX statement of MySQL, with if_not_exists of sqlite"""
+    kind = f'{index.kind} ' if index.kind else ''
+    exists = 'IF NOT EXISTS ' if if_not_exists else ''
+    return f"CREATE {kind}INDEX {exists}{index.name} ON {index.table} " \
+           f"({', '.join(index.columns)})"
+
+
+_SOURCES: Dict[str, Callable[[], QuakeSource]] = {
+    'mysql': MySQLSource,
+    'sqlite': lambda: SQLiteSource(config.QUAKE_SOURCE['sqlite_file'])}
+
+
+def get_source() -> QuakeSource:
+    """Source chosen by config.QUAKE_SOURCE['backend']"""
+    return _SOURCES[config.QUAKE_SOURCE['backend']]()
+
+
+def _kill_query(connection_id: int) -> None:
+    try:
+        kill_query(connection_id)
+    except db_pool.Error as exc:
+        log.warning(f'Cannot kill query of DB connection '
+                    f'{connection_id}: {exc.msg}')
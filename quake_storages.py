@@ -1,22 +1,44 @@
 # -*- coding: utf-8 -*-
+import os
+import zipfile
+from importlib import import_module
+from concurrent.futures import ThreadPoolExecutor, Future, wait, \
+    FIRST_COMPLETED
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Protocol, Sequence, Iterable, Tuple, List, Callable
-
-import openpyxl
-from openpyxl.styles import Alignment
-from openpyxl.worksheet.worksheet import Worksheet
+from queue import Queue
+from threading import Thread
+from typing import Protocol, Sequence, Iterable, Iterator, Tuple, List, \
+    Dict, Set, Callable, TextIO
 
 import config
 from exceptions import FormatToStrError
+from instrumentation import Stopwatch, span, trace, current_span, \
+    attached
 from quake_structures import Quake
 
 
 class QuakesStorage(Protocol):
-    """Interface of any storage for saving info of quakes"""
+    """Interface of any storage for saving info of quakes. Quakes are
+    written one by one between open() and close(), abort() is called
+    instead of close() if saving of quakes is failed"""
+
+    def open(self) -> None:
+        ...
+
+    def write(self, formatted: 'FormattedQuake') -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+    def abort(self) -> None:
+        ...
 
     def save(self, quakes: Iterable[Quake]) -> None:
-        raise NotImplementedError
+        with trace('save'):
+            export_quakes(quakes, [self])
 
 
 def save_quakes(quakes: Iterable[Quake], storage: QuakesStorage) -> None:
@@ -24,70 +46,176 @@ def save_quakes(quakes: Iterable[Quake], storage: QuakesStorage) -> None:
     storage.save(quakes)
 
 
-class CatalogStorage(QuakesStorage):
-    """Store some quakes info as a catalog in an Excel file"""
-
-    def __init__(self, file: Path):
-        self._file = file
-        self._init_storage()
-        self.wb = openpyxl.load_workbook(self._file)
-        self._del_init_empty_worksheet()
-        self.sheet: Worksheet
-
-    def save(self, quakes: Iterable[Quake]) -> None:
+def export_quakes(quakes: Iterable[Quake], storages: Sequence[QuakesStorage],
+                  threaded: bool = False) -> None:
+    """Save quakes in all storages at one pass, values of a quake are
+    formatted once for all storages. With threaded each storage is
+    written by its own thread, which gets quakes through a bounded queue.
+    A failed storage is aborted without stopping the others, the first
+    error is raised when all storages are closed"""
+    if threaded:
+        _export_threaded(quakes, storages)
+        return
+    # storages with stopwatches of their writes
+    opened: List[Tuple[QuakesStorage, Stopwatch]] = []
+    errors: List[Exception] = []
+    formatting = Stopwatch('format')
+    try:
+        for storage in storages:
+            with span(_get_span_name(storage)):
+                storage.open()
+            opened.append((storage, Stopwatch(_get_span_name(storage))))
         for quake in quakes:
-            if quake.lat is None or quake.lon is None:
-                continue
-            self._init_sheet(quake)
-            self._add_values_in_sheet(quake)
-        self._format_cells()
-        self.wb.save(self._file)
-
-    def _init_storage(self) -> None:
-        if not self._file.exists():
-            wb = openpyxl.Workbook()
-            wb.save(self._file)
-
-    def _add_values_in_sheet(self, quake: Quake) -> None:
-        origin_dt = _format_common_attrs(quake)[0]
-        origin_d, origin_t = origin_dt.split()
-        lat = quake.lat if quake.lat else '-'
-        lon = quake.lon if quake.lon else '-'
-        mag = quake.magnitude
-        avg_ml = mag.ML if mag.ML != 0.0 else '-'
-        avg_mpsp = mag.MPSP if mag.MPSP != 0.0 else '-'
-        depth = quake.depth if quake.depth else '-'
-        stations_name = ', '.join(quake.stations_name)
-        row = (origin_d, origin_t, lat, lon, depth,
-               quake.reg, avg_ml, avg_mpsp, stations_name)
-        self.sheet.append(row)
-
-    def _format_cells(self) -> None:
-        for sheet in self.wb.sheetnames:
-            rows_of_cells = self.wb[sheet][self.wb[sheet].dimensions]
-            for row in rows_of_cells:
-                for cell in row:
-                    if cell.column in (3, 4, 5):
-                        # digital format for lat, lon, depth
-                        cell.number_format = '0.00'
-                    elif cell.column in (7, 8):
-                        cell.number_format = '0.0'
-                    cell.alignment = Alignment(horizontal='center',
-                                               vertical='center')
-
-    def _init_sheet(self, quake: Quake) -> None:
-        month_num = quake.origin_dt.month - 1
-        sheet_name = config.MONTHS[month_num]
-        if sheet_name not in self.wb.sheetnames:
-            self.sheet = self.wb.create_sheet(sheet_name, month_num)
-            self.sheet.append(config.CATALOG_HEADER)
-        else:
-            self.sheet = self.wb.get_sheet_by_name(sheet_name)
-
-    def _del_init_empty_worksheet(self):
-        if 'Sheet' in self.wb.sheetnames and \
-                self.wb['Sheet'].dimensions == 'A1:A1':
-            del self.wb['Sheet']
+            with formatting:
+                formatted = FormattedQuake(quake)
+            for storage, writing in opened[:]:
+                try:
+                    with writing:
+                        storage.write(formatted)
+                except Exception as exc:
+                    errors.append(exc)
+                    opened.remove((storage, writing))
+                    writing.close(quakes=writing.calls - 1)
+                    storage.abort()
+    except BaseException:
+        for storage, _ in opened:
+            storage.abort()
+        raise
+    finally:
+        formatting.close()
+        for _, writing in opened:
+            writing.close(quakes=writing.calls)
+    for storage, _ in opened:
+        try:
+            with span(_get_span_name(storage)):
+                storage.close()
+        except Exception as exc:
+            errors.append(exc)
+    if errors:
+        raise errors[0]
+
+
+def _get_span_name(storage: QuakesStorage) -> str:
+    return type(storage).__name__
+
+
+class FormattedQuake:
+    """Values of a quake formatted for storages. Times of stations are
+    formatted only if a storage needs them"""
+    __slots__ = ('quake', 'origin_dt', 'lat', 'lon', 'mag', 'avg_ml',
+                 'avg_mpsp', 'depth', 'mag_type', '_iso_phase_dts')
+
+    def __init__(self, quake: Quake):
+        self.quake = quake
+        (self.origin_dt, self.lat, self.lon, self.mag, self.avg_ml,
+         self.avg_mpsp, self.depth,
+         self.mag_type) = _format_common_attrs(quake)
+        self._iso_phase_dts: List[str] | None = None
+
+    @property
+    def nas_origin_dt(self) -> str:
+        """Origin time as '%Y %m %d %H %M %S.%f' cut to milliseconds"""
+        if self.origin_dt == '-':
+            return '-'
+        date, time = self.origin_dt.split()
+        day, month, year = date.split('.')
+        return f'{year} {month} {day} {time.replace(":", " ")}'
+
+    def iter_phase_dts(self) -> Iterator[str]:
+        """Times of stations as '%d.%m.%Y %H:%M:%S.%f' cut to milliseconds"""
+        return (f'{iso_dt[8:10]}.{iso_dt[5:7]}.{iso_dt[:4]}{iso_dt[10:]}'
+                for iso_dt in self._get_iso_phase_dts())
+
+    def iter_nas_phase_dts(self) -> Iterator[str]:
+        """Times of stations as '%Y %m %d   %H %M %S.%f' cut to
+        milliseconds"""
+        return (f'{iso_dt[:4]} {iso_dt[5:7]} {iso_dt[8:10]}   '
+                f'{iso_dt[11:13]} {iso_dt[14:16]} {iso_dt[17:]}'
+                for iso_dt in self._get_iso_phase_dts())
+
+    def _get_iso_phase_dts(self) -> List[str]:
+        """isoformat() is faster than strftime() and gives the same
+        digits for years since 1000"""
+        if self._iso_phase_dts is None:
+            self._iso_phase_dts = [sta.phase_dt.isoformat(' ', 'milliseconds')
+                                   for sta in self.quake.stations]
+        return self._iso_phase_dts
+
+
+class _StorageWriter(Thread):
+    """Thread writing quakes into a storage from a bounded queue"""
+
+    def __init__(self, storage: QuakesStorage):
+        super().__init__(daemon=True)
+        self.storage = storage
+        self.queue: Queue = Queue(maxsize=config.EXPORT['queue_size'])
+        self.error: BaseException | None = None
+        self._parent_span = current_span()
+
+    def run(self) -> None:
+        with attached(self._parent_span):
+            self._write_quakes()
+
+    def _write_quakes(self) -> None:
+        opened = False
+        name = _get_span_name(self.storage)
+        writing = Stopwatch(name)
+        try:
+            with span(name):
+                self.storage.open()
+            opened = True
+            while (formatted := self.queue.get()) is not _END_OF_QUAKES:
+                if formatted is _ABORT_QUAKES:
+                    opened = False
+                    self.storage.abort()
+                    return
+                with writing:
+                    self.storage.write(formatted)
+            opened = False
+            with span(name):
+                self.storage.close()
+        except BaseException as exc:
+            self.error = exc
+            if opened:
+                self.storage.abort()
+            self._skip_quakes()
+        finally:
+            writing.close(quakes=writing.calls)
+
+    def _skip_quakes(self) -> None:
+        """Take quakes from the queue until the end, so the thread
+        putting them is not blocked"""
+        while self.queue.get() not in (_END_OF_QUAKES, _ABORT_QUAKES):
+            pass
+
+
+_END_OF_QUAKES = object()
+_ABORT_QUAKES = object()
+
+
+def _export_threaded(quakes: Iterable[Quake],
+                     storages: Sequence[QuakesStorage]) -> None:
+    writers = [_StorageWriter(storage) for storage in storages]
+    for writer in writers:
+        writer.start()
+    end = _ABORT_QUAKES
+    formatting = Stopwatch('format')
+    try:
+        for quake in quakes:
+            with formatting:
+                formatted = FormattedQuake(quake)
+            for writer in writers:
+                writer.queue.put(formatted)
+        end = _END_OF_QUAKES
+    finally:
+        formatting.close()
+        for writer in writers:
+            writer.queue.put(end)
+        for writer in writers:
+            writer.join()
+    for writer in writers:
+        if writer.error is not None:
+            raise writer.error
 
 
 class BulletinStorage(QuakesStorage):
@@ -95,6 +223,16 @@ class BulletinStorage(QuakesStorage):
 
     def __init__(self, file: Path):
         self._file = file
+        quake_widths = tuple(config.AMNT_COLUMN_SYMBOLS['quake_hdr'])
+        sta_widths = tuple(config.AMNT_COLUMN_SYMBOLS['sta_hdr'])
+        self._quake_layout = _get_layout(quake_widths)
+        self._sta_layout = _get_layout(sta_widths)
+        self._sta_values_layout = _get_layout(sta_widths, _STA_VALUE_FORMATS)
+        self._sta_hdr_describe = self._sta_layout.format(
+            config.STATION_HEADER_DESCRIBE)
+        self._quake_hdr_describes: Dict[str, str] = {}
+        self._f: TextIO
+        self._amnt_quakes = 0
         self.origin_dt = ''
         self.lat = ''
         self.lon = ''
@@ -104,90 +242,188 @@ class BulletinStorage(QuakesStorage):
         self.mag_type = '-'
         self.depth = ''
 
-    def save(self, quakes: Iterable[Quake]) -> None:
-        with self._file.open('w', encoding='utf8') as f:
-            amnt_quakes = 0
-            for quake in quakes:
-                (self.origin_dt, self.lat, self.lon, self.mag, self.avg_ml,
-                 self.avg_mpsp, self.depth,
-                 self.mag_type) = _format_common_attrs(quake)
-                rows = self._get_rows(quake)
-                f.write('\n'.join(rows))
-                amnt_quakes += 1
-            f.write(f'\nTotal: {amnt_quakes}')
-
-    def _get_rows(self, quake: Quake) -> Iterable[str]:
+    def open(self) -> None:
+        self._f = self._file.open('w', encoding='utf8',
+                                  buffering=_WRITE_BUFFER_SIZE)
+        self._amnt_quakes = 0
+
+    def write(self, formatted: FormattedQuake) -> None:
+        self.origin_dt = formatted.origin_dt
+        self.lat = formatted.lat
+        self.lon = formatted.lon
+        self.mag = formatted.mag
+        self.avg_ml = formatted.avg_ml
+        self.avg_mpsp = formatted.avg_mpsp
+        self.depth = formatted.depth
+        self.mag_type = formatted.mag_type
+        self._f.write('\n'.join(self._get_rows(formatted)))
+        self._amnt_quakes += 1
+
+    def close(self) -> None:
+        with self._f:
+            self._f.write(f'\nTotal: {self._amnt_quakes}')
+
+    def abort(self) -> None:
+        self._f.close()
+
+    def _get_rows(self, formatted: FormattedQuake) -> Iterable[str]:
+        quake = formatted.quake
         quake_hdr_describe = self._get_quake_hdr_describe()
         quake_hdr = self._get_quake_hdr(quake) + '\n'
-        sta_hdr_describe = \
-            _format_to_str(config.STATION_HEADER_DESCRIBE,
-                           config.AMNT_COLUMN_SYMBOLS['sta_hdr'])
-        sta_strings = self._get_stations_string(quake)
+        sta_strings = self._get_stations_string(formatted)
         return ('#' + quake.id, quake_hdr_describe, quake_hdr,
-                sta_hdr_describe, sta_strings)
+                self._sta_hdr_describe, sta_strings)
 
     def _get_quake_hdr_describe(self) -> str:
         mag_type = 'Mag' if self.mag_type == '-' else self.mag_type
-        columns_data = config.QUAKE_HEADER_DESCRIBE[:]
-        columns_data.insert(5, mag_type)
-        return _format_to_str(columns_data,
-                              config.AMNT_COLUMN_SYMBOLS['quake_hdr'])
+        if mag_type not in self._quake_hdr_describes:
+            columns_data = config.QUAKE_HEADER_DESCRIBE[:]
+            columns_data.insert(5, mag_type)
+            self._quake_hdr_describes[mag_type] = \
+                self._quake_layout.format(columns_data)
+        return self._quake_hdr_describes[mag_type]
 
     def _get_quake_hdr(self, quake: Quake) -> str:
-        amnt_sta = str(len(quake.stations_name))
-        return _format_to_str(
-            columns_data=(self.origin_dt, self.lat, self.lon, self.depth,
-                          amnt_sta, self.mag, quake.reg),
-            hdr_type_config=config.AMNT_COLUMN_SYMBOLS['quake_hdr'])
-
-    def _get_stations_string(self, quake: Quake) -> str:
-        res = ''
-        for sta in quake.stations:
-            phase_dt = datetime.strftime(sta.phase_dt,
-                                         '%d.%m.%Y %H:%M:%S.%f')[:-3]
-            dist = f'{sta.dist:.2f}' if sta.dist else '-'
-            az = f'{sta.azimuth:.2f}' if sta.azimuth else '-'
-            ampl = f'{sta.ampl:.4f}' if sta.ampl else '-'
-            period = f'{sta.period:.2f}' if sta.period else '-'
-            mag = f'{sta.mag_ML:.1f}' if sta.mag_ML else \
-                f'{sta.mag_MPSP:.1f}' if sta.mag_MPSP else '-'
+        amnt_sta = str(quake.amnt_sta)
+        return self._quake_layout.format(
+            (self.origin_dt, self.lat, self.lon, self.depth,
+             amnt_sta, self.mag, quake.reg))
+
+    def _get_stations_string(self, formatted: FormattedQuake) -> str:
+        """Values of stations are formatted by the template of the layout,
+        a missing or zero value is shown as '-'"""
+        sta_template = self._sta_values_layout.template
+        rows = []
+        for sta, phase_dt in zip(formatted.quake.stations,
+                                 formatted.iter_phase_dts()):
             mag_type = 'ML' if sta.mag_ML else 'MPSP' if sta.mag_MPSP else '-'
-            sta_data = (sta.name, dist, az, sta.phase, sta.entry, phase_dt,
-                        ampl, period, mag, mag_type)
-            res += _format_to_str(sta_data,
-                                  config.AMNT_COLUMN_SYMBOLS['sta_hdr']) + '\n'
-        return res + '\n'
+            rows.append(sta_template.format(
+                sta.name if sta.name is not None else '-',
+                sta.dist or _MISSING,
+                sta.azimuth or _MISSING,
+                sta.phase if sta.phase is not None else '-',
+                sta.entry if sta.entry is not None else '-',
+                phase_dt,
+                sta.ampl or _MISSING,
+                sta.period or _MISSING,
+                sta.mag_ML or sta.mag_MPSP or _MISSING,
+                mag_type))
+        rows.append('\n')
+        return '\n'.join(rows)
 
 
 class NASBulletinStorage(QuakesStorage):
     """Store some info of each quake as a bulletin for NAS program
-    in a separate plain text file with ext (*.bltn)"""
+    in a separate plain text file with ext (*.bltn). Files are written
+    by a pool of threads, each one into a temporary file renamed
+    when it is complete"""
 
     def __init__(self, path: Path):
         self._path = path.joinpath(*path.parts[:-1])
-        self.bltn_strings: List[str, ] = []
+        self._workers = config.NAS_BULLETINS['workers']
+        self._executor: ThreadPoolExecutor
+        self._pending: Set[Future] = set()
+        self._names = _NASBulletinNames()
+
+    def open(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=self._workers)
+        self._pending = set()
+        self._names = _NASBulletinNames()
+
+    def write(self, formatted: FormattedQuake) -> None:
+        text = _get_nas_bulletin(formatted)
+        if text is None:
+            return
+        if len(self._pending) >= self._workers * 2:
+            done, self._pending = wait(self._pending,
+                                       return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+        file = self._path.joinpath(self._names.get(formatted.quake))
+        self._pending.add(
+            self._executor.submit(_write_atomically, file, text))
+
+    def close(self) -> None:
+        try:
+            done, self._pending = wait(self._pending)
+            for future in done:
+                future.result()
+        finally:
+            self._executor.shutdown()
+
+    def abort(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+
+class NASArchiveStorage(QuakesStorage):
+    """Store bulletins for NAS program of all quakes in one zip file,
+    named the same as files of NASBulletinStorage"""
 
-    def save(self, quakes: Iterable[Quake]) -> None:
-        for quake in quakes:
-            self._get_rows(quake)
-            if self.bltn_strings:
-                f_name = datetime.strftime(quake.origin_dt, '%Y%m%d_%H%M%S')
-                full_path = self._path.joinpath(f_name).with_suffix('.bltn')
-                data = '\n'.join(self.bltn_strings)
-                full_path.write_text(data, encoding='utf8')
-
-    def _get_rows(self, quake: Quake) -> None:
-        self.bltn_strings.clear()
-        if (quake.lat is not None and quake.lon is not None) \
-                or len(quake.stations_name) > 4:
-            dt, lat, lon = _format_common_attrs(quake,
-                                                '%Y %m %d %H %M %S.%f')[:3]
-            self.bltn_strings.append(f'Fi={lat}  LD={lon} T0={dt}')
-            for sta in quake.stations:
-                phase_dt = datetime.strftime(sta.phase_dt,
-                                             '%Y %m %d   %H %M %S.%f')[:-3]
-                self.bltn_strings.append(
-                    f'{sta.name}    {sta.phase}={phase_dt}')
+    def __init__(self, file: Path):
+        self._file = file
+        self._tmp_file = file.with_name(file.name + '.tmp')
+        self._archive: zipfile.ZipFile
+        self._names = _NASBulletinNames()
+
+    def open(self) -> None:
+        self._archive = zipfile.ZipFile(self._tmp_file, 'w',
+                                        compression=zipfile.ZIP_DEFLATED)
+        self._names = _NASBulletinNames()
+
+    def write(self, formatted: FormattedQuake) -> None:
+        text = _get_nas_bulletin(formatted)
+        if text is not None:
+            self._archive.writestr(self._names.get(formatted.quake), text)
+
+    def close(self) -> None:
+        try:
+            self._archive.close()
+            os.replace(self._tmp_file, self._file)
+        finally:
+            self._tmp_file.unlink(missing_ok=True)
+
+    def abort(self) -> None:
+        try:
+            self._archive.close()
+        finally:
+            self._tmp_file.unlink(missing_ok=True)
+
+
+class _NASBulletinNames:
+    """Names of files of bulletins for NAS program by the origin time
+    of a quake, quakes of the same second get suffixes _1, _2...
+    in order of quakes"""
+
+    def __init__(self):
+        self._names_count: Dict[str, int] = {}
+
+    def get(self, quake: Quake) -> str:
+        name = datetime.strftime(quake.origin_dt, '%Y%m%d_%H%M%S')
+        count = self._names_count.get(name, 0)
+        self._names_count[name] = count + 1
+        if count:
+            name = f'{name}_{count}'
+        return name + '.bltn'
+
+
+def _get_nas_bulletin(formatted: FormattedQuake) -> str | None:
+    quake = formatted.quake
+    if (quake.lat is None or quake.lon is None) and quake.amnt_sta <= 4:
+        return None
+    rows = [f'Fi={formatted.lat}  LD={formatted.lon} '
+            f'T0={formatted.nas_origin_dt}']
+    for sta, phase_dt in zip(quake.stations, formatted.iter_nas_phase_dts()):
+        rows.append(f'{sta.name}    {sta.phase}={phase_dt}')
+    return '\n'.join(rows)
+
+
+def _write_atomically(file: Path, text: str) -> None:
+    tmp_file = file.with_name(f'.{file.name}.tmp')
+    try:
+        tmp_file.write_text(text, encoding='utf8')
+        os.replace(tmp_file, file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
 
 
 class ArcGisStorage(QuakesStorage):
@@ -196,17 +432,26 @@ class ArcGisStorage(QuakesStorage):
 
     def __init__(self, file: Path):
         self._file = file
+        self._f: TextIO
 
-    def save(self, quakes: Iterable[Quake]) -> None:
-        with self._file.open('w', encoding='utf8') as f:
-            f.write(' '.join(config.ArcGIS_HEADER) + '\n')
-            for quake in quakes:
-                if columns := self._get_column_values(quake):
-                    row = ' '.join(columns)
-                    f.write(row + '\n')
-
-    def _get_column_values(self, quake: Quake) -> Iterable[str]:
-        origin_dt, lat, lon, mag = _format_common_attrs(quake)[:4]
+    def open(self) -> None:
+        self._f = self._file.open('w', encoding='utf8')
+        self._f.write(' '.join(config.ArcGIS_HEADER) + '\n')
+
+    def write(self, formatted: FormattedQuake) -> None:
+        if columns := self._get_column_values(formatted):
+            row = ' '.join(columns)
+            self._f.write(row + '\n')
+
+    def close(self) -> None:
+        self._f.close()
+
+    def abort(self) -> None:
+        self._f.close()
+
+    def _get_column_values(self, formatted: FormattedQuake) -> Iterable[str]:
+        origin_dt, lat, lon, mag = (formatted.origin_dt, formatted.lat,
+                                    formatted.lon, formatted.mag)
         if lat == '-' or lon == '-':
             return ()
         columns = origin_dt, lat, lon, '0.0', '1'
@@ -229,25 +474,110 @@ def _format_common_attrs(quake: Quake,
     avg_mpsp = f'{mag.MPSP:.1f}' if mag.MPSP else '-'
     preferred_mag = avg_ml if avg_ml != '-' else avg_mpsp
     depth = f'{quake.depth:.2f}' if quake.depth else '-'
-    mag_type = 'ML' if avg_ml != '-' else 'MPSP' if avg_mpsp != '-' else '-'
-    return origin_dt, lat, lon, preferred_mag, avg_ml, avg_mpsp, depth, mag_type
+    return (origin_dt, lat, lon, preferred_mag, avg_ml, avg_mpsp, depth,
+            quake.mag_type)
+
+
+class _Missing:
+    """Value shown as '-' in a column of any number format"""
+
+    def __format__(self, format_spec: str) -> str:
+        return format('-', format_spec.split('.')[0])
+
+
+_MISSING = _Missing()
+
+# formats of values of a station row in the bulletin
+_STA_VALUE_FORMATS = ('', '.2f', '.2f', '', '', '', '.4f', '.2f', '.1f', '')
+
+
+class _RowLayout:
+    """Columns of fixed widths compiled into one format string, values
+    of a column may have a format. A column of zero width is not padded"""
+
+    def __init__(self, widths: Sequence[int],
+                 value_formats: Sequence[str] | None = None):
+        self.widths = tuple(widths)
+        value_formats = value_formats or ('',) * len(self.widths)
+        self.template = ''.join(
+            f'{{:<{width}{value_format}}}'
+            for width, value_format in zip(self.widths, value_formats))
+
+    def format(self, columns_data: Sequence) -> str:
+        if len(columns_data) != len(self.widths):
+            raise FormatToStrError('len(columns_data) is not '
+                                   'equal len(hdr_type_config)')
+        return self.template.format(
+            *['-' if data is None else data for data in columns_data])
+
+
+@lru_cache(maxsize=None)
+def _get_layout(hdr_type_config: Tuple[int, ...],
+                value_formats: Tuple[str, ...] | None = None) -> _RowLayout:
+    return _RowLayout(hdr_type_config, value_formats)
 
 
 def _format_to_str(columns_data: Sequence, hdr_type_config: Sequence) -> str:
     """Return formatted string accordingly layout of hdr_type_config"""
-    if len(columns_data) != len(hdr_type_config):
-        raise FormatToStrError('len(columns_data) is not '
-                               'equal len(hdr_type_config)')
-    res = ''
-    for i in range(len(hdr_type_config)):
-        data = columns_data[i] if columns_data[i] is not None else '-'
-        res += f'{data:<{hdr_type_config[i]}}'
-    return res
-
-
-def get_storage(ext: str) -> Callable:
-    storage = {'.txt': BulletinStorage,
-               '.bltn': NASBulletinStorage,
-               '.xlsx': CatalogStorage,
-               '.GIS': ArcGisStorage}
-    return storage[ext]
+    return _get_layout(tuple(hdr_type_config)).format(columns_data)
+
+
+_WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+# Storages by extension of a file as 'module:class', the module is imported
+# when the storage is used first, so libraries of formats are not loaded
+# at start of the app
+_STORAGE_PATHS: Dict[str, str] = {
+    '.txt': 'quake_storages:BulletinStorage',
+    '.bltn': 'quake_storages:NASBulletinStorage',
+    '.zip': 'quake_storages:NASArchiveStorage',
+    '.xlsx': 'catalog_storage:CatalogStorage',
+    '.GIS': 'quake_storages:ArcGisStorage'}
+
+# filters of the file dialog for storages added by register_storage()
+_FILES_FILTERS: Dict[str, str] = {}
+
+STORAGES_ENTRY_POINTS_GROUP = 'getquakes.storages'
+
+_plugins_loaded = False
+
+
+def register_storage(ext: str, path: str,
+                     files_filter: str | None = None) -> None:
+    """Add a storage for files with ext given as 'module:class'"""
+    _STORAGE_PATHS[ext] = path
+    _FILES_FILTERS[ext] = files_filter or f'{ext[1:]} files (*{ext})'
+
+
+def get_storage(ext: str) -> Callable[[Path], QuakesStorage]:
+    _load_plugins()
+    module_name, class_name = _STORAGE_PATHS[ext].split(':')
+    return getattr(import_module(module_name), class_name)
+
+
+def get_storage_extensions() -> List[str]:
+    _load_plugins()
+    return list(_STORAGE_PATHS)
+
+
+def get_files_filters() -> List[str]:
+    """Filters of the file dialog of built-in and added storages"""
+    _load_plugins()
+    return list(config.FILES_FILTERS.values()) + list(_FILES_FILTERS.values())
+
+
+def _load_plugins() -> None:
+    """Register storages of config.STORAGE_PLUGINS and of entry points
+    named by extensions. They are looked up at the first use of storages,
+    since a scan of installed packages slows down start of the app"""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    for ext, (path, files_filter) in config.STORAGE_PLUGINS.items():
+        register_storage(ext, path, files_filter)
+    from importlib.metadata import entry_points
+    for entry_point in entry_points(group=STORAGES_ENTRY_POINTS_GROUP):
+        if entry_point.name not in _STORAGE_PATHS:
+            register_storage(entry_point.name, entry_point.value)
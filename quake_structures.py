@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 from decimal import Decimal
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import NamedTuple, Tuple, Set
+from typing import NamedTuple, Tuple, FrozenSet
 
 
 @dataclass(slots=True)
@@ -25,8 +25,22 @@ class Magnitude(NamedTuple):
     MPSP: float
 
 
+class QuakeSummary(NamedTuple):
+    """Values of a quake computed once from its stations"""
+    magnitude: Magnitude
+    stations_name: FrozenSet[str]
+    # time of the phase of the nearest station
+    first_phase_dt: datetime | None
+    preferred_mag: float
+    mag_type: str
+
+
 @dataclass(slots=True)
 class Quake:
+    """Quake with its stations. The summary of stations (magnitudes,
+    names of stations, the first phase) is computed when stations are
+    assigned. Changes of Sta objects in place are not seen by it until
+    refresh_summary() is called"""
     id: str
     origin_dt: datetime
     lat: float
@@ -34,27 +48,61 @@ class Quake:
     depth: float
     reg: str
     stations: Tuple[Sta, ...]
+    _summary: QuakeSummary = field(init=False, repr=False, compare=False)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name == 'stations':
+            self.refresh_summary()
+
+    def refresh_summary(self) -> None:
+        """Compute the summary again, it is needed only after changes
+        of Sta objects in place, assignment of stations does it itself"""
+        object.__setattr__(self, '_summary', _summarize(self.stations))
 
     @property
-    def stations_name(self) -> Set[str]:
-        stations_name = set()
-        for sta in self.stations:
-            stations_name.add(sta.name)
-        return stations_name
+    def stations_name(self) -> FrozenSet[str]:
+        return self._summary.stations_name
+
+    @property
+    def amnt_sta(self) -> int:
+        return len(self._summary.stations_name)
 
     @property
     def magnitude(self) -> Magnitude:
-        ml = n_ml = mpsp = n_mpsp = 0.0
-        avg_ml = avg_mpsp = 0.0
-        for sta in self.stations:
-            if sta.mag_ML:
-                ml += sta.mag_ML
-                n_ml += 1
-            if sta.mag_MPSP:
-                mpsp += sta.mag_MPSP
-                n_mpsp += 1
-        if n_ml != 0:
-            avg_ml = round(ml / n_ml, 1)
-        if n_mpsp != 0:
-            avg_mpsp = round(mpsp / n_mpsp, 1)
-        return Magnitude(avg_ml, avg_mpsp)
+        return self._summary.magnitude
+
+    @property
+    def first_phase_dt(self) -> datetime | None:
+        return self._summary.first_phase_dt
+
+    @property
+    def preferred_mag(self) -> float:
+        """ML if it is known else MPSP, 0.0 if there is no magnitude"""
+        return self._summary.preferred_mag
+
+    @property
+    def mag_type(self) -> str:
+        return self._summary.mag_type
+
+
+def _summarize(stations: Tuple[Sta, ...]) -> QuakeSummary:
+    stations_name = frozenset(sta.name for sta in stations)
+    ml = n_ml = mpsp = n_mpsp = 0.0
+    avg_ml = avg_mpsp = 0.0
+    for sta in stations:
+        if sta.mag_ML:
+            ml += sta.mag_ML
+            n_ml += 1
+        if sta.mag_MPSP:
+            mpsp += sta.mag_MPSP
+            n_mpsp += 1
+    if n_ml != 0:
+        avg_ml = round(ml / n_ml, 1)
+    if n_mpsp != 0:
+        avg_mpsp = round(mpsp / n_mpsp, 1)
+    preferred_mag = avg_ml if avg_ml != 0.0 else avg_mpsp
+    mag_type = 'ML' if avg_ml else 'MPSP' if avg_mpsp else '-'
+    first_phase_dt = stations[0].phase_dt if stations else None
+    return QuakeSummary(Magnitude(avg_ml, avg_mpsp), stations_name,
+                        first_phase_dt, preferred_mag, mag_type)
@@ -1,11 +1,33 @@
 # -*- coding: utf-8 -*-
-from typing import Tuple, List, NamedTuple
-from mysql.connector import connect, Error  # type: ignore
+import heapq
+import logging
+import math
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Tuple, List, Dict, NamedTuple, Iterable, Iterator, \
+    Callable, Sequence, Any, TYPE_CHECKING
 import config
-from exceptions import ConnectDatabaseError
+import comment_index
+import query_cache
+from quakes_memo import memo
+from exceptions import ConnectDatabaseError, SearchCancelledError
 from quake_structures import Quake, Sta
+from quake_sources import QuakeSource, PlanStep, get_source
+from instrumentation import Stopwatch, span, trace, current_span, \
+    attached
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from quake_batch import QuakeBatch
+
+
+log = logging.getLogger('db_logger')
+
 
 class QueryParams(NamedTuple):
     from_dt: str
@@ -16,77 +38,783 @@ class QueryParams(NamedTuple):
     comment: str
 
 
-def _get_sql_query(params: QueryParams) -> str:
+class TimeShard(NamedTuple):
+    """Part of the time window [from_ts, to_ts), the last shard of
+    the window includes to_ts"""
+    from_ts: float
+    to_ts: float
+    is_last: bool
+
+
+class SqlQuery(NamedTuple):
+    """Query with arguments bound by the placeholder of a source"""
+    sql: str
+    args: Tuple[Any, ...]
+
+
+class SearchProgress:
+    """Counters of a running search read by another thread,
+    which can also cancel the search"""
+
+    def __init__(self):
+        self.records = 0
+        self.quakes = 0
+        self.cancelled = False
+        self._statement_cancels: List[Callable[[], None]] = []
+        # a statement is not finished while it is being aborted
+        self._statements_lock = threading.Lock()
+
+    def cancel(self) -> None:
+        """Stop the search and abort its statements running on DB. They
+        are aborted in another thread, since killing a query waits for
+        a connection to DB and the caller may be the GUI thread"""
+        self.cancelled = True
+        if self._statement_cancels:
+            threading.Thread(target=self._cancel_statements,
+                             daemon=True).start()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise SearchCancelledError('Search is cancelled')
+
+    @contextmanager
+    def statement(self, cancel_statement: Callable[[], None]
+                  ) -> Iterator[None]:
+        """Let cancel() abort a running statement by cancel_statement"""
+        with self._statements_lock:
+            self._statement_cancels.append(cancel_statement)
+        try:
+            self.check()
+            yield
+        finally:
+            with self._statements_lock:
+                self._statement_cancels.remove(cancel_statement)
+
+    def _cancel_statements(self) -> None:
+        with self._statements_lock:
+            for cancel_statement in self._statement_cancels:
+                cancel_statement()
+
+
+def _get_timestamps(params: QueryParams) -> Tuple[float, float]:
     from_dt = datetime.strptime(params.from_dt + '+0000', '%Y-%m-%d %H:%M:%S%z')
-    from_dt_timestamp = from_dt.timestamp()
     to_dt = datetime.strptime(params.to_dt + '+0000', '%Y-%m-%d %H:%M:%S%z')
-    to_dt_timestamp = to_dt.timestamp()
-    key_words = params.comment.split()
-    key_words_count = len(key_words)
-    if key_words_count > 1:
-        comment_query = "%' OR o.COMMENTS LIKE '%".join(key_words)
-    elif key_words_count == 1:
-        comment_query = key_words[0]
-    else:
-        comment_query = ""
-    return f"SELECT" \
-           f" o.EVENTID, o.ORIGINTIME, ROUND(o.LAT, 2), ROUND(o.LON, 2)," \
-           f" o.`DEPTH`," \
-           f" CONCAT(SUBSTR(o.COMMENTS, 1, INSTR(o.COMMENTS, '.') - 3),"\
-           f"        SUBSTR(o.COMMENTS, INSTR(o.COMMENTS, ':') + 4))," \
-           f" a.ITIME, a.STA, ROUND(a.DIST, 2)," \
-           f" ROUND(a.AZIMUTH, 2), a.IPHASE, CONCAT(a.IM_EM, a.FM)," \
-           f" ROUND(a.AMPL, 4), ROUND(a.PER, 2)," \
-           f" ROUND(a.ML, 1), ROUND(a.MPSP, 1) " \
-           f"FROM origin o " \
-           f"INNER JOIN arrival a ON a.EVENTID = o.EVENTID " \
-           f"WHERE" \
-           f" (o.COMMENTS LIKE '%{comment_query}%')" \
-           f" AND" \
-           f" (a.ITIME BETWEEN '{from_dt_timestamp}' AND " \
-           f"                                       '{to_dt_timestamp}')" \
-           f" ORDER BY o.EVENTID"
-
-
-def get_data(params: QueryParams) -> List[tuple]:
+    return from_dt.timestamp(), to_dt.timestamp()
+
+
+_ORIGIN_COLUMNS = "o.EVENTID, o.ORIGINTIME, ROUND(o.LAT, 2), " \
+                  "ROUND(o.LON, 2), o.`DEPTH`, o.COMMENTS"
+
+_ARRIVAL_COLUMNS = "a.ITIME, a.STA, ROUND(a.DIST, 2), " \
+                   "ROUND(a.AZIMUTH, 2), a.IPHASE, a.IM_EM, a.FM, " \
+                   "ROUND(a.AMPL, 4), ROUND(a.PER, 2), " \
+                   "ROUND(a.ML, 1), ROUND(a.MPSP, 1)"
+
+
+def _get_sql_query(params: QueryParams, source: QuakeSource,
+                   shard: TimeShard | None = None,
+                   progress: SearchProgress | None = None) -> SqlQuery:
+    """Return the query of records of quakes. Arguments are bound, so the
+    range of ITIME uses the index of arrivals. The region and the entry
+    are made from the fetched columns by _to_record()"""
+    from_dt_timestamp, to_dt_timestamp = _get_timestamps(params)
+    itime = _get_itime_condition(source, from_dt_timestamp,
+                                 to_dt_timestamp, shard)
+    comment = _get_comment_condition(source, params.comment,
+                                     progress or SearchProgress())
+    events_filter = _get_events_filter(params, source, from_dt_timestamp,
+                                       to_dt_timestamp)
+    sql = f"SELECT {_ORIGIN_COLUMNS}, {_ARRIVAL_COLUMNS} " \
+          f"FROM origin o " \
+          f"INNER JOIN arrival a ON a.EVENTID = o.EVENTID " \
+          f"WHERE" \
+          f" ({itime.sql})" \
+          f" AND" \
+          f" ({comment.sql})" \
+          f"{events_filter.sql}" \
+          f" ORDER BY o.EVENTID"
+    return SqlQuery(sql, itime.args + comment.args + events_filter.args)
+
+
+def _get_origins_query(params: QueryParams, source: QuakeSource,
+                       shard: TimeShard | None = None,
+                       progress: SearchProgress | None = None) -> SqlQuery:
+    """Return the query of origins of the quakes _get_sql_query() finds,
+    the first phase of the two-phase fetch"""
+    from_dt_timestamp, to_dt_timestamp = _get_timestamps(params)
+    itime = _get_itime_condition(source, from_dt_timestamp,
+                                 to_dt_timestamp, shard)
+    comment = _get_comment_condition(source, params.comment,
+                                     progress or SearchProgress())
+    events_filter = _get_events_filter(params, source, from_dt_timestamp,
+                                       to_dt_timestamp)
+    sql = f"SELECT {_ORIGIN_COLUMNS} " \
+          f"FROM origin o " \
+          f"WHERE" \
+          f" o.EVENTID IN (SELECT a.EVENTID FROM arrival a" \
+          f" WHERE {itime.sql})" \
+          f" AND" \
+          f" ({comment.sql})" \
+          f"{events_filter.sql}" \
+          f" ORDER BY o.EVENTID"
+    return SqlQuery(sql, itime.args + comment.args + events_filter.args)
+
+
+def _get_arrivals_query(params: QueryParams, source: QuakeSource,
+                        event_ids: Sequence[Any],
+                        shard: TimeShard | None = None) -> SqlQuery:
+    """Return the query of arrivals of the time window of the given
+    quakes, the second phase of the two-phase fetch"""
+    itime = _get_itime_condition(source, *_get_timestamps(params), shard)
+    ids = ', '.join([source.param] * len(event_ids))
+    sql = f"SELECT a.EVENTID, {_ARRIVAL_COLUMNS} " \
+          f"FROM arrival a " \
+          f"WHERE a.EVENTID IN ({ids}) AND ({itime.sql})"
+    return SqlQuery(sql, tuple(event_ids) + itime.args)
+
+
+def _get_itime_condition(source: QuakeSource, from_dt_timestamp: float,
+                         to_dt_timestamp: float,
+                         shard: TimeShard | None) -> SqlQuery:
+    p = source.param
+    if shard is None:
+        return SqlQuery(f"a.ITIME BETWEEN {p} AND {p}",
+                        (from_dt_timestamp, to_dt_timestamp))
+    to_operator = '<=' if shard.is_last else '<'
+    return SqlQuery(f"a.ITIME >= {p} AND a.ITIME {to_operator} {p}",
+                    (shard.from_ts, shard.to_ts))
+
+
+def _get_comment_condition(source: QuakeSource, comment: str,
+                           progress: SearchProgress) -> SqlQuery:
+    """Any of keywords is in the comment, the comment of a quake
+    without keywords is not NULL. Keywords are resolved to EVENTIDs
+    by comment_index if it is enabled, else they are matched by the
+    FULLTEXT index of the DB if it is turned on in config and there is
+    one, else by LIKE"""
+    key_words = comment.split()
+    if not key_words:
+        return SqlQuery("o.COMMENTS IS NOT NULL", ())
+    p = source.param
+    if config.COMMENT_INDEX['enabled'] and comment_index.can_find(key_words):
+        event_ids = comment_index.find_events(source, key_words, progress)
+        if event_ids is not None:
+            if not event_ids:
+                return SqlQuery('0 = 1', ())
+            ids = ', '.join([p] * len(event_ids))
+            return SqlQuery(f"o.EVENTID IN ({ids})", tuple(sorted(event_ids)))
+    fulltext_words = _get_fulltext_words(key_words) \
+        if config.COMMENT_INDEX['fulltext'] else []
+    if fulltext_words and source.has_fulltext_index('origin', 'COMMENTS',
+                                                    progress):
+        return SqlQuery(f"MATCH (o.COMMENTS) AGAINST ({p} IN BOOLEAN MODE)",
+                        (' '.join(f'{word}*' for word in fulltext_words),))
+    likes = ' OR '.join([f"o.COMMENTS LIKE {p}"] * len(key_words))
+    return SqlQuery(likes, tuple(f'%{word}%' for word in key_words))
+
+
+# words shorter than innodb_ft_min_token_size are not in FULLTEXT index
+_FULLTEXT_MIN_WORD = 3
+_FULLTEXT_OPERATORS = re.compile(r'[-+<>()~*"@]')
+
+
+def _get_fulltext_words(key_words: List[str]) -> List[str]:
+    """Keywords as prefixes of words of MATCH ... AGAINST, none if some
+    keyword cannot be found by the FULLTEXT index"""
+    words = [_FULLTEXT_OPERATORS.sub('', word) for word in key_words]
+    if any(len(word) < _FULLTEXT_MIN_WORD for word in words):
+        return []
+    return words
+
+
+def _get_events_filter(params: QueryParams, source: QuakeSource,
+                       from_dt_timestamp: float,
+                       to_dt_timestamp: float) -> SqlQuery:
+    """Return SQL condition on EVENTID computed from arrivals of the time
+    window on the server. It selects a superset of quakes passing
+    _filter_quakes(), so the exact check is still made on the client"""
+    conditions = _get_mag_conditions(params, source) + \
+        _get_sta_conditions(params, source)
+    if not conditions:
+        return SqlQuery('', ())
+    p = source.param
+    sql = f" AND o.EVENTID IN (" \
+          f"SELECT f.EVENTID FROM arrival f" \
+          f" WHERE f.ITIME BETWEEN {p} AND {p}" \
+          f" GROUP BY f.EVENTID" \
+          f" HAVING {' AND '.join(condition.sql for condition in conditions)})"
+    args = (from_dt_timestamp, to_dt_timestamp) + \
+        tuple(arg for condition in conditions for arg in condition.args)
+    return SqlQuery(sql, args)
+
+
+def _get_mag_conditions(params: QueryParams,
+                        source: QuakeSource) -> List[SqlQuery]:
+    """Average magnitude of a quake lies between the min and max values
+    of its stations (zero magnitudes are skipped as in Quake.magnitude)"""
+    from_mag, to_mag = float(params.from_mag), float(params.to_mag)
+    if from_mag <= 0.0 <= to_mag:
+        # quake without any magnitude has 0.0 and passes the filter
+        return []
+    p = source.param
+    mag_ranges = []
+    for mag_type in ('ML', 'MPSP'):
+        mag = f'NULLIF(ROUND(f.{mag_type}, 1), 0)'
+        mag_ranges.append(f'(MIN({mag}) <= {p} AND MAX({mag}) >= {p})')
+    return [SqlQuery(f"({' OR '.join(mag_ranges)})",
+                     (to_mag, from_mag) * len(mag_ranges))]
+
+
+def _get_sta_conditions(params: QueryParams,
+                        source: QuakeSource) -> List[SqlQuery]:
+    """Every station from params must be among arrivals of a quake.
+    Names are compared as _add_sta() renames them"""
+    if params.sta.lower() == 'all':
+        return []
+    conditions = []
+    for sta_name in sorted(set(params.sta.split())):
+        if sta_name in config.STA_RENAME:
+            # such station is always renamed, so no quake can pass
+            return [SqlQuery('0 = 1', ())]
+        db_names = [sta_name]
+        if sta_name.endswith('R') and sta_name[:-1] in config.STA_RENAME:
+            db_names.append(sta_name[:-1])
+        names = ', '.join([source.param] * len(db_names))
+        conditions.append(SqlQuery(f'MAX(f.STA IN ({names})) = 1',
+                                   tuple(db_names)))
+    return conditions
+
+
+def _to_record(row: tuple) -> tuple:
+    """Make a record of get_data() from a row of the query: the region
+    is cut from the comment and the entry is IM_EM and FM together"""
+    return row[:5] + (_get_region(row[5]),) + row[6:11] + \
+        (_concat(row[11], row[12]),) + row[13:]
+
+
+def _get_region(comments: str | None) -> str | None:
+    """Text before the last two chars preceding the first '.' and
+    after the three chars following the first ':' of the comment"""
+    if comments is None:
+        return None
+    head_len = comments.find('.') + 1 - 3
+    head = comments[:head_len] if head_len > 0 else ''
+    return head + comments[comments.find(':') + 1 + 3:]
+
+
+def _concat(first: str | None, second: str | None) -> str | None:
+    if first is None or second is None:
+        return None
+    return first + second
+
+
+def get_data(params: QueryParams,
+             source: QuakeSource | None = None) -> List[tuple]:
     """Returns data of quakes from DB"""
-    sql = _get_sql_query(params)
+    return list(_iter_data(params, source or get_source()))
+
+
+def _iter_data(params: QueryParams, source: QuakeSource,
+               shard: TimeShard | None = None,
+               progress: SearchProgress | None = None) -> Iterator[tuple]:
+    """Yield records of quakes ordered by EVENTID from DB reading
+    the cursor in batches"""
+    if progress is None:
+        progress = SearchProgress()
+    if config.FETCH_STRATEGY['two_phase']:
+        records = _iter_two_phase_data(params, source, shard, progress)
+    else:
+        records = _iter_joined_data(params, source, shard, progress)
     try:
-        with connect(**config.DB, connection_timeout=2) as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(sql)
-                return cursor.fetchall()
-    except Error as exc:
-        raise ConnectDatabaseError(exc.msg)
+        yield from records
+    except ConnectDatabaseError:
+        progress.check()
+        raise
+
+
+def _iter_joined_data(params: QueryParams, source: QuakeSource,
+                      shard: TimeShard | None,
+                      progress: SearchProgress) -> Iterator[tuple]:
+    for rows in _iter_joined_rows(params, source, shard, progress):
+        yield from map(_to_record, rows)
+
+
+def _iter_joined_rows(params: QueryParams, source: QuakeSource,
+                      shard: TimeShard | None,
+                      progress: SearchProgress) -> Iterator[List[tuple]]:
+    """Yield rows of the query of _get_sql_query() by batches
+    of the cursor"""
+    sql, args = _get_sql_query(params, source, shard, progress)
+    for rows in source.iter_batches(sql, args, progress):
+        progress.check()
+        progress.records += len(rows)
+        yield rows
+
+
+def _iter_two_phase_data(params: QueryParams, source: QuakeSource,
+                         shard: TimeShard | None,
+                         progress: SearchProgress) -> Iterator[tuple]:
+    """Fetch origins of the window, then arrivals of chunks of them,
+    so values of an origin are not repeated in every row of arrivals.
+    Arrivals of a chunk are grouped by EVENTID and come in the order
+    of origins, as records of the join do"""
+    sql, args = _get_origins_query(params, source, shard, progress)
+    # origins are read out first, arrivals are fetched by other
+    # connections of the pool
+    origins = [origin for rows in source.iter_batches(sql, args, progress)
+               for origin in rows]
+    ids_per_query = config.FETCH_STRATEGY['ids_per_query']
+    for start in range(0, len(origins), ids_per_query):
+        chunk = origins[start:start + ids_per_query]
+        sql, args = _get_arrivals_query(
+            params, source, [origin[0] for origin in chunk], shard)
+        arrivals: Dict[Any, List[tuple]] = {}
+        for rows in source.iter_batches(sql, args, progress):
+            progress.check()
+            progress.records += len(rows)
+            for row in rows:
+                arrivals.setdefault(row[0], []).append(row[1:])
+        for origin in chunk:
+            for arrival in arrivals.get(origin[0], ()):
+                yield _to_record(origin + arrival)
+
+
+def _iter_sharded_data(params: QueryParams, source: QuakeSource,
+                       progress: SearchProgress | None = None
+                       ) -> Iterator[tuple]:
+    """Yield records of quakes ordered by EVENTID, fetched by time shards
+    of the window in parallel. Records of a quake whose arrivals are in
+    several shards come one after another, so they are grouped together.
+    Every shard is fetched ahead by not more than _SHARD_PREFETCH chunks
+    of records, so records are not kept in memory"""
+    if progress is None:
+        progress = SearchProgress()
+    shards = _get_shards(params, source, progress)
+    if len(shards) == 1:
+        yield from _iter_data(params, source, progress=progress)
+        return
+    parent = current_span()
+    stopped = threading.Event()
+
+    def fetch_shard(shard: TimeShard, chunks: queue.Queue) -> None:
+        with attached(parent):
+            records = _iter_data(params, source, shard, progress)
+            try:
+                while True:
+                    chunk = list(islice(records, config.FETCH_BATCH_SIZE))
+                    if not _put_chunk(chunks, chunk, stopped) or not chunk:
+                        return
+            except Exception as exc:
+                _put_chunk(chunks, exc, stopped)
+            finally:
+                records.close()
 
+    shards_chunks = [queue.Queue(_SHARD_PREFETCH) for _ in shards]
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        try:
+            for shard, chunks in zip(shards, shards_chunks):
+                executor.submit(fetch_shard, shard, chunks)
+            yield from heapq.merge(*map(_iter_chunks, shards_chunks),
+                                   key=lambda x: x[0])
+        finally:
+            # fetches of shards are stopped when records are not needed
+            stopped.set()
 
-def get_quakes(params: QueryParams) -> Tuple[Quake, ...]:
-    """Return tuple of Quake from db records"""
-    quakes = []
+
+# chunks of records of a shard fetched ahead of the merge of shards
+_SHARD_PREFETCH = 4
+
+
+def _put_chunk(chunks: queue.Queue, chunk: List[tuple] | Exception,
+               stopped: threading.Event) -> bool:
+    """Put the chunk into the queue unless the merge of shards is stopped,
+    an empty chunk is the end of the shard"""
+    while not stopped.is_set():
+        try:
+            chunks.put(chunk, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _iter_chunks(chunks: queue.Queue) -> Iterator[tuple]:
+    while chunk := chunks.get():
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield from chunk
+
+
+def _iter_row_batches(params: QueryParams, source: QuakeSource,
+                      progress: SearchProgress) -> Iterator[List[tuple]]:
+    """Yield batches of rows of the query of _get_sql_query() as the
+    cursor gives them. Time shards of the window are fetched in parallel
+    and their batches come in turn, so rows are not ordered by EVENTID"""
+    shards = _get_shards(params, source, progress)
+    if len(shards) == 1:
+        batches = _iter_joined_rows(params, source, None, progress)
+    else:
+        batches = _iter_shards_rows(params, source, shards, progress)
+    try:
+        yield from batches
+    except ConnectDatabaseError:
+        progress.check()
+        raise
+
+
+def _iter_shards_rows(params: QueryParams, source: QuakeSource,
+                      shards: List[TimeShard],
+                      progress: SearchProgress) -> Iterator[List[tuple]]:
+    parent = current_span()
+    stopped = threading.Event()
+    batches: queue.Queue = queue.Queue(_SHARD_PREFETCH * len(shards))
+
+    def fetch_shard(shard: TimeShard) -> None:
+        with attached(parent):
+            shard_batches = _iter_joined_rows(params, source, shard,
+                                              progress)
+            try:
+                for rows in shard_batches:
+                    if not _put_chunk(batches, rows, stopped):
+                        return
+                _put_chunk(batches, [], stopped)
+            except Exception as exc:
+                _put_chunk(batches, exc, stopped)
+            finally:
+                shard_batches.close()
+
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        try:
+            for shard in shards:
+                executor.submit(fetch_shard, shard)
+            fetched_shards = 0
+            while fetched_shards < len(shards):
+                rows = batches.get()
+                if isinstance(rows, Exception):
+                    raise rows
+                if rows:
+                    yield rows
+                else:
+                    fetched_shards += 1
+        finally:
+            stopped.set()
+
+
+def _get_shards(params: QueryParams, source: QuakeSource,
+                progress: SearchProgress) -> List[TimeShard]:
+    """Split the time window into shards, the adaptive split makes
+    shards with the same amount of arrivals"""
+    from_ts, to_ts = _get_timestamps(params)
+    shards_config = config.DB_SHARDS
+    # shards are read at once, every one by its own connection
+    shards_count = min(
+        shards_config['workers'], config.DB_POOL['size'],
+        math.ceil((to_ts - from_ts) / shards_config['min_seconds']))
+    if shards_count <= 1:
+        return [TimeShard(from_ts, to_ts, True)]
+    if shards_config['adaptive']:
+        bounds = _get_adaptive_bounds(from_ts, to_ts, shards_count, source,
+                                      progress)
+    else:
+        step = (to_ts - from_ts) / shards_count
+        bounds = [from_ts + step * i for i in range(shards_count)] + [to_ts]
+    return [TimeShard(bounds[i], bounds[i + 1], i == len(bounds) - 2)
+            for i in range(len(bounds) - 1)]
+
+
+def _get_adaptive_bounds(from_ts: float, to_ts: float, shards_count: int,
+                         source: QuakeSource,
+                         progress: SearchProgress) -> List[float]:
+    """Return bounds of shards from a histogram of arrivals
+    counted on the server"""
+    buckets_count = shards_count * config.DB_SHARDS['buckets_per_shard']
+    bucket = (to_ts - from_ts) / buckets_count
+    p = source.param
+    bucket_num = source.floor(f'(a.ITIME - {p}) / {p}')
+    sql = f"SELECT {bucket_num}, COUNT(*) " \
+          f"FROM arrival a " \
+          f"WHERE a.ITIME BETWEEN {p} AND {p} " \
+          f"GROUP BY 1"
+    args = (from_ts, bucket, from_ts, to_ts)
+    try:
+        histogram = [row for rows in source.iter_batches(sql, args, progress)
+                     for row in rows]
+    except ConnectDatabaseError:
+        progress.check()
+        raise
+    counts = [0] * buckets_count
+    for bucket_num, count in histogram:
+        counts[min(int(bucket_num), buckets_count - 1)] += count
+    total = sum(counts)
+    if total == 0:
+        return [from_ts, to_ts]
+    bounds = [from_ts]
+    accumulated = 0
+    for bucket_num, count in enumerate(counts[:-1]):
+        accumulated += count
+        if accumulated >= total * len(bounds) / shards_count:
+            bounds.append(from_ts + bucket * (bucket_num + 1))
+            if len(bounds) == shards_count:
+                break
+    bounds.append(to_ts)
+    return bounds
+
+
+def _iter_cached_data(params: QueryParams, source: QuakeSource,
+                      progress: SearchProgress | None = None
+                      ) -> Iterator[tuple]:
+    """Yield records of quakes ordered by EVENTID from the local cache,
+    records missing there are fetched from DB. The cache is filled
+    without the magnitude and station conditions of _get_events_filter()
+    since they depend on the whole time window of a search"""
+    unfiltered_params = params._replace(sta='all', from_mag='-inf',
+                                        to_mag='inf')
+
+    def fetch(from_ts: float, to_ts: float) -> Iterator[tuple]:
+        return _iter_data(unfiltered_params, source,
+                          TimeShard(from_ts, to_ts, True), progress)
+
+    from_ts, to_ts = _get_timestamps(params)
+    return query_cache.iter_records(source.key, params.comment,
+                                    from_ts, to_ts, fetch)
+
+
+def _iter_records(params: QueryParams, source: QuakeSource,
+                  progress: SearchProgress | None = None) -> Iterator[tuple]:
+    if config.QUERY_CACHE['enabled'] and not source.local:
+        return _iter_cached_data(params, source, progress)
+    return _iter_sharded_data(params, source, progress)
+
+
+def _get_memoized_data(params: QueryParams,
+                       source: QuakeSource) -> Tuple[tuple, ...]:
+    """Return records of quakes kept in memory by one of previous
+    searches including this one, or fetch and keep them"""
+    from_ts, to_ts = _get_timestamps(params)
+    quake_records = memo.get(params, source.key, from_ts, to_ts)
+    if quake_records is None:
+        quake_records = tuple(_iter_records(params, source))
+        memo.put(params, source.key, from_ts, to_ts, quake_records)
+    return quake_records
+
+
+def get_quakes(params: QueryParams,
+               source: QuakeSource | None = None) -> Tuple[Quake, ...]:
+    """Return tuple of Quake from db records, the source is chosen
+    by config if it is not given"""
+    source = source or get_source()
+    with trace('get_quakes') as search:
+        if config.QUAKES_MEMO['enabled']:
+            with span('records') as records:
+                quake_records = _get_memoized_data(params, source)
+                records.count(records=len(quake_records))
+        else:
+            quake_records = _iter_records(params, source)
+        workers = _get_assembly_workers()
+        if workers:
+            quake_records = tuple(quake_records)
+        if workers and len(quake_records) >= \
+                config.PARALLEL_ASSEMBLY['min_records']:
+            from quake_assembly import assemble_quakes  # imports this module
+            with span('assemble'):
+                found = tuple(assemble_quakes(quake_records, params,
+                                              workers))
+        else:
+            with span('convert') as convert:
+                quakes = list(_group_quakes(quake_records))
+                convert.count(quakes=len(quakes))
+            with span('filter_quakes'):
+                found = tuple(_filter_quakes(quakes, params))
+        search.count(quakes=len(found))
+    return found
+
+
+def _get_assembly_workers() -> int:
+    """Amount of processes assembling quakes of a search, 0 if quakes
+    are assembled by this process: a pool is turned off in config or
+    there is one CPU"""
+    cpus = os.cpu_count() or 1
+    if not config.PARALLEL_ASSEMBLY['enabled'] or cpus < 2:
+        return 0
+    workers = config.PARALLEL_ASSEMBLY['workers'] or cpus
+    return workers if workers > 1 else 0
+
+
+def get_quake_batch(params: QueryParams,
+                    progress: SearchProgress | None = None,
+                    source: QuakeSource | None = None) -> 'QuakeBatch':
+    """Return the same quakes as get_quakes() in columnar QuakeBatch,
+    Quake objects are built only when they are got from the batch.
+    Columns are filled from batches of the cursor of the joined query,
+    records are neither made nor kept in memory, nor cached"""
+    from quake_batch import QuakeBatch  # numpy is imported on demand
+    if progress is None:
+        progress = SearchProgress()
+    source = source or get_source()
+    with span('build_batch') as building:
+        batch = QuakeBatch.from_rows(
+            _iter_row_batches(params, source, progress))
+        progress.quakes = len(batch)
+        building.count(quakes=len(batch))
+    sta_names = set(params.sta.split()) \
+        if params.sta.lower() != 'all' else None
+    with span('select'):
+        return batch.select(float(params.from_mag), float(params.to_mag),
+                            sta_names)
+
+
+def explain_query(params: QueryParams,
+                  source: QuakeSource | None = None) -> List[PlanStep]:
+    """Return the plan of the query of a search made by the source,
+    with the two-phase fetch the plans of queries of both phases"""
+    source = source or get_source()
+    if not config.FETCH_STRATEGY['two_phase']:
+        return source.explain(*_get_sql_query(params, source))
+    event_ids = [str(i) for i in range(config.FETCH_STRATEGY['ids_per_query'])]
+    return source.explain(*_get_origins_query(params, source)) + \
+        source.explain(*_get_arrivals_query(params, source, event_ids))
+
+
+def iter_found_quakes(params: QueryParams,
+                      progress: SearchProgress | None = None,
+                      source: QuakeSource | None = None) -> Iterator[Quake]:
+    """Yield the quakes of get_quakes() as soon as they are grouped, not
+    sorted. The progress is updated while the search goes on and stops
+    it with SearchCancelledError when it is cancelled. The search always
+    queries DB and fetched records are not kept in memory"""
+    if progress is None:
+        progress = SearchProgress()
+    source = source or get_source()
+    quake_records = _iter_records(params, source, progress)
+    if workers := _get_assembly_workers():
+        from quake_assembly import iter_assembled_quakes  # imports this module
+        yield from iter_assembled_quakes(quake_records, params, workers,
+                                         progress)
+        return
+    quake_fits = _get_quake_filter(params)
+    for quake in _group_quakes(quake_records):
+        progress.check()
+        progress.quakes += 1
+        if quake_fits(quake):
+            yield quake
+
+
+class FollowUpdate(NamedTuple):
+    """Quakes changed by a poll of QuakeFollower, new ones are sorted
+    as in get_quakes()"""
+    added: List[Quake]
+    updated: List[Quake]
+    records: int
+
+
+class QuakeFollower:
+    """Quakes of a search kept up to date by polls of arrivals with ITIME
+    greater than the greatest one fetched before. Records of all quakes
+    of the window are kept, so a quake with new arrivals is grouped again
+    from all of its records by the rules of _filter_stations(). A found
+    quake stays found even if new arrivals move it out of the range of
+    magnitudes. Arrivals inserted with ITIME below the watermark and
+    changed origins are not seen until a new search"""
+
+    def __init__(self, params: QueryParams,
+                 source: QuakeSource | None = None):
+        self.params = params
+        self.source = source or get_source()
+        self.watermark: float | None = None
+        # conditions of _get_events_filter() depend on all arrivals
+        # of a quake, so they are checked on the client only
+        self._unfiltered_params = params._replace(sta='all', from_mag='-inf',
+                                                  to_mag='inf')
+        self._quake_fits = _get_quake_filter(params)
+        self._records: Dict[Any, List[tuple]] = {}
+        self._found: Dict[Any, Quake] = {}
+
+    def poll(self, progress: SearchProgress | None = None) -> FollowUpdate:
+        """Fetch the whole window at the first poll, then only arrivals
+        newer than the watermark, and group quakes having new records"""
+        if progress is None:
+            progress = SearchProgress()
+        from_ts, to_ts = _get_timestamps(self.params)
+        if self.watermark is None:
+            records = _iter_records(self._unfiltered_params, self.source,
+                                    progress)
+        elif self.watermark < to_ts:
+            records = _iter_data(self._unfiltered_params, self.source,
+                                 TimeShard(self.watermark, to_ts, True),
+                                 progress)
+        else:
+            return FollowUpdate([], [], 0)
+        # records are fetched before the merge, so a failed poll
+        # does not move the watermark
+        new_records = self._merge(list(records))
+        if self.watermark is None:
+            self.watermark = from_ts
+        added, updated = [], []
+        for quake_id in new_records:
+            quake = next(_group_quakes(self._records[quake_id]))
+            if quake_id in self._found:
+                updated.append(quake)
+            elif self._quake_fits(quake):
+                added.append(quake)
+            else:
+                continue
+            self._found[quake_id] = quake
+        return FollowUpdate(sort_quakes(added), updated,
+                            sum(new_records.values()))
+
+    def _merge(self, records: Iterable[tuple]) -> Dict[Any, int]:
+        """Add records to the kept ones, return amounts of new records
+        by EVENTID. Arrivals at the watermark are fetched again and
+        skipped"""
+        watermark = self.watermark
+        new_records: Dict[Any, int] = {}
+        for record in records:
+            quake_records = self._records.setdefault(record[0], [])
+            if record[6] == watermark and record in quake_records:
+                continue
+            quake_records.append(record)
+            new_records[record[0]] = new_records.get(record[0], 0) + 1
+            if self.watermark is None or record[6] > self.watermark:
+                self.watermark = record[6]
+        return new_records
+
+
+def sort_quakes(quakes: Iterable[Quake]) -> List[Quake]:
+    """Sort quakes by the time of the first phase as get_quakes() does"""
+    return sorted(quakes, key=lambda x: x.first_phase_dt)
+
+
+def _group_quakes(quake_records: Iterable[tuple]) -> Iterator[Quake]:
+    """Yield Quake from records ordered by EVENTID
+    when the EVENTID boundary is crossed"""
     stations: List[Sta] = []
     origin_dt = datetime(year=1, month=1, day=1)
     _id, origin_dtime, lat, lon, depth, reg = \
-        '', 0.0, 0.0, 0.0, 0.0, ''
-    quake_records = get_data(params)
-    for quake_record in quake_records:
-        if quake_record[0] != _id:
-            if len(stations) != 0:
+        None, 0.0, 0.0, 0.0, 0.0, ''
+    filtering = Stopwatch('filter_stations')
+    try:
+        for quake_record in quake_records:
+            if quake_record[0] != _id:
+                if len(stations) != 0:
+                    with filtering:
+                        stations = _filter_stations(stations)
+                    yield Quake(_id, origin_dt, lat,
+                                lon, depth, reg, tuple(stations))
+                    stations = []
+                _id, origin_dtime, lat, lon, depth, reg = quake_record[:6]
+                origin_dt = datetime.utcfromtimestamp(origin_dtime) \
+                    if origin_dtime is not None else datetime.min
+
+            sta_dt = datetime.utcfromtimestamp(quake_record[6])
+            sta = Sta(sta_dt, *quake_record[7:])
+            stations.append(sta)
+        if len(stations) != 0:
+            with filtering:
                 stations = _filter_stations(stations)
-                quake = Quake(_id, origin_dt, lat,
-                              lon, depth, reg, tuple(stations))
-                quakes.append(quake)
-                stations.clear()
-            _id, origin_dtime, lat, lon, depth, reg = quake_record[:6]
-            origin_dt = datetime.utcfromtimestamp(origin_dtime) \
-                if origin_dtime is not None else datetime.min
-
-        sta_dt = datetime.utcfromtimestamp(quake_record[6])
-        sta = Sta(sta_dt, *quake_record[7:])
-        stations.append(sta)
-    stations = _filter_stations(stations)
-    quakes.append(Quake(_id, origin_dt, lat, lon,
-                        depth, reg, tuple(stations)))
-    return tuple(_filter_quakes(quakes, params))
+            yield Quake(_id, origin_dt, lat, lon,
+                        depth, reg, tuple(stations))
+    finally:
+        filtering.close()
 
 
 def _add_sta(sta: Sta, stations: List[Sta], prev_sta: Sta | None) -> Sta:
@@ -128,16 +856,21 @@ def _filter_stations(stations: List[Sta]) -> List[Sta]:
     return sorted_by_dist
 
 
-def _filter_quakes(quakes: List[Quake], params: QueryParams) -> List[Quake]:
+def _get_quake_filter(params: QueryParams) -> Callable[[Quake], bool]:
+    """Return predicate checking magnitude and stations of a single quake"""
     sta_set = set(params.sta.split())
+    check_sta = params.sta.lower() != 'all'
     from_mag, to_mag = float(params.from_mag), float(params.to_mag)
-    res: List[Quake] = []
-    for quake in quakes:
-        mag_ml, mag_mpsp = quake.magnitude
-        mag = mag_ml if mag_ml != 0.0 else mag_mpsp
-        if from_mag <= mag <= to_mag:
-            res.append(quake)
-    if params.sta.lower() != 'all':
-        res = [quake for quake in res
-               if sta_set.issubset(quake.stations_name)]
-    return sorted(res, key=lambda x: x.stations[0].phase_dt)
+
+    def quake_fits(quake: Quake) -> bool:
+        if not from_mag <= quake.preferred_mag <= to_mag:
+            return False
+        return not check_sta or sta_set.issubset(quake.stations_name)
+
+    return quake_fits
+
+
+def _filter_quakes(quakes: Iterable[Quake],
+                   params: QueryParams) -> List[Quake]:
+    quake_fits = _get_quake_filter(params)
+    return sort_quakes(quake for quake in quakes if quake_fits(quake))
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+import logging
+import sys
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Tuple, NamedTuple, Any
+
+import config
+
+
+log = logging.getLogger('db_logger')
+
+
+class MemoEntry(NamedTuple):
+    records: Tuple[tuple, ...]
+    size: int
+    kept_at: float
+
+
+class QuakesMemo:
+    """Keep records of recent searches in memory. A search narrower than
+    a kept one (shorter time window, narrower magnitude range, more
+    stations) gets records of the kept search without a query to DB.
+    Records kept longer than ttl_seconds are dropped, so changes of DB
+    are seen at last"""
+
+    def __init__(self, max_mb: float, ttl_seconds: float):
+        self.max_size = max_mb * 1024 * 1024
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Any, MemoEntry] = OrderedDict()
+        self._size = 0
+
+    def get(self, params: Any, db: str, from_ts: float,
+            to_ts: float) -> Tuple[tuple, ...] | None:
+        """Return records of a kept search in the db including the params
+        or None if there is no such search"""
+        self._remove_expired()
+        search = _get_key(params, db, from_ts, to_ts)
+        for key, entry in reversed(self._entries.items()):
+            if _is_subset(search, key):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._log_counters()
+                if (key.from_ts, key.to_ts) == (from_ts, to_ts):
+                    return entry.records
+                return tuple(record for record in entry.records
+                             if from_ts <= record[6] <= to_ts)
+        self.misses += 1
+        self._log_counters()
+        return None
+
+    def put(self, params: Any, db: str, from_ts: float, to_ts: float,
+            records: Tuple[tuple, ...]) -> None:
+        size = _get_size(records)
+        if size > self.max_size:
+            return
+        key = _get_key(params, db, from_ts, to_ts)
+        self._remove(key)
+        while self._entries and self._size + size > self.max_size:
+            self._remove(next(iter(self._entries)))
+        self._entries[key] = MemoEntry(records, size, time.monotonic())
+        self._size += size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def _remove_expired(self) -> None:
+        expired_at = time.monotonic() - self.ttl_seconds
+        for key, entry in list(self._entries.items()):
+            if entry.kept_at < expired_at:
+                self._remove(key)
+
+    def _remove(self, key: Any) -> None:
+        if entry := self._entries.pop(key, None):
+            self._size -= entry.size
+
+    def _log_counters(self) -> None:
+        log.info(f'Memo of searches: hits {self.hits}, '
+                 f'misses {self.misses}, {len(self._entries)} searches '
+                 f'in {self._size / 1024 / 1024:.1f} MB')
+
+
+class _MemoKey(NamedTuple):
+    db: str
+    comment: str
+    from_ts: float
+    to_ts: float
+    sta: str
+    from_mag: float
+    to_mag: float
+
+
+def _get_key(params: Any, db: str, from_ts: float,
+             to_ts: float) -> _MemoKey:
+    return _MemoKey(db, ' '.join(sorted(set(params.comment.split()))),
+                    from_ts, to_ts, params.sta, float(params.from_mag),
+                    float(params.to_mag))
+
+
+def _is_subset(search: _MemoKey, key: _MemoKey) -> bool:
+    """Check if quakes of the search are among records
+    fetched for the kept search"""
+    if (search.db, search.comment) != (key.db, key.comment):
+        return False
+    if not key.from_ts <= search.from_ts <= search.to_ts <= key.to_ts:
+        return False
+    if key.sta.lower() != 'all':
+        if search.sta.lower() == 'all' or \
+                not set(key.sta.split()).issubset(search.sta.split()):
+            return False
+    if key.from_mag <= 0.0 <= key.to_mag:
+        # records of such search are not filtered by magnitude on DB
+        return True
+    # average magnitudes of quakes depend on the time window
+    return (key.from_ts, key.to_ts) == (search.from_ts, search.to_ts) and \
+        key.from_mag <= search.from_mag and search.to_mag <= key.to_mag
+
+
+def _get_size(records: Tuple[tuple, ...]) -> int:
+    """Estimate memory of records by a sample of them"""
+    sample = list(islice(records, 1000))
+    if not sample:
+        return sys.getsizeof(records)
+    sample_size = sum(sys.getsizeof(record) +
+                      sum(sys.getsizeof(field) for field in record)
+                      for record in sample)
+    return sys.getsizeof(records) + sample_size * len(records) // len(sample)
+
+
+memo = QuakesMemo(config.QUAKES_MEMO['max_mb'],
+                  config.QUAKES_MEMO['ttl_seconds'])
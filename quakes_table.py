@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+from typing import Any, Dict, Iterable, List
+
+from PySide6.QtCore import (QAbstractProxyModel, QAbstractTableModel,
+                            QItemSelection, QModelIndex, Qt)
+
+from quake_structures import Quake
+
+
+COLUMNS = ('ID', 'Origin Time', 'Lat', 'Lon', 'Depth', 'ML', 'MPSP', 'Region',
+           'STA, Ph, time')
+STATIONS_COLUMN = 8
+
+
+class QuakesTableModel(QAbstractTableModel):
+    """Quakes shown in the table of GUI. Text of a cell is made only
+    when the view asks for it, i.e. for visible rows"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.quakes: List[Quake] = []
+        self._rows: Dict[str, int] = {}
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.quakes)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return _get_text(self.quakes[index.row()], index.column())
+
+    def headerData(self, section: int, orientation: Qt.Orientation,
+                   role: int = Qt.DisplayRole) -> Any:
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return section + 1
+
+    def set_quakes(self, quakes: Iterable[Quake]) -> None:
+        self.beginResetModel()
+        self.quakes = list(quakes)
+        self._rows = {quake.id: row for row, quake in enumerate(self.quakes)}
+        self.endResetModel()
+
+    def add_quakes(self, quakes: List[Quake]) -> None:
+        if not quakes:
+            return
+        first = len(self.quakes)
+        self.beginInsertRows(QModelIndex(), first, first + len(quakes) - 1)
+        self.quakes.extend(quakes)
+        self._rows.update((quake.id, row) for row, quake in
+                          enumerate(quakes, first))
+        self.endInsertRows()
+
+    def update_quakes(self, quakes: List[Quake]) -> None:
+        """Replace shown quakes with the same ids, only their rows
+        are repainted"""
+        last_column = len(COLUMNS) - 1
+        for quake in quakes:
+            row = self._rows.get(quake.id)
+            if row is None:
+                continue
+            self.quakes[row] = quake
+            self.dataChanged.emit(self.index(row, 0),
+                                  self.index(row, last_column))
+
+    def quake(self, row: int) -> Quake:
+        return self.quakes[row]
+
+    def sort_keys(self, column: int) -> List[Any]:
+        return [_get_sort_key(quake, column) for quake in self.quakes]
+
+
+class QuakesSortProxy(QAbstractProxyModel):
+    """Sorted and filtered rows of QuakesTableModel. All rows are sorted
+    at once by keys got from the model, since a sort of
+    QSortFilterProxyModel calls data() of the model for every comparison.
+    Rows inserted into the model are appended to the end until the next
+    sort, changed rows keep their places too. Rows to show are given
+    by set_rows()"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._order: List[int] = []
+        self._positions: List[int] = []
+        self._rows: List[int] | None = None
+        self._inserted_count = 0
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+
+    def setSourceModel(self, model: QuakesTableModel) -> None:
+        self.beginResetModel()
+        super().setSourceModel(model)
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self._reset)
+        model.rowsAboutToBeInserted.connect(self._begin_insert_rows)
+        model.rowsInserted.connect(self._end_insert_rows)
+        model.dataChanged.connect(self._change_data)
+        self._reset()
+
+    def index(self, row: int, column: int,
+              parent=QModelIndex()) -> QModelIndex:
+        if parent.isValid() or not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()) -> QModelIndex:
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return self.sourceModel().columnCount(QModelIndex())
+
+    def mapToSource(self, proxy_index: QModelIndex) -> QModelIndex:
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(self._order[proxy_index.row()],
+                                        proxy_index.column())
+
+    def mapFromSource(self, source_index: QModelIndex) -> QModelIndex:
+        if not source_index.isValid():
+            return QModelIndex()
+        position = self._positions[source_index.row()]
+        if position < 0:
+            return QModelIndex()
+        return self.index(position, source_index.column())
+
+    def sort(self, column: int, order=Qt.AscendingOrder) -> None:
+        if column < 0:
+            return
+        self._sort_column, self._sort_order = column, order
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        sources = [self.mapToSource(index) for index in persistent]
+        self._sort_rows()
+        self.changePersistentIndexList(
+            persistent, [self.mapFromSource(index) for index in sources])
+        self.layoutChanged.emit()
+
+    def set_rows(self, rows: List[int] | None) -> None:
+        """Show only the rows of the model, all rows if None"""
+        self.beginResetModel()
+        self._rows = rows
+        self._sort_rows()
+        self.endResetModel()
+
+    def source_rows(self, selection: QItemSelection) -> List[int]:
+        """Return rows of the model selected in the proxy,
+        in order of the model"""
+        rows = set()
+        for selection_range in selection:
+            rows.update(self._order[row] for row in
+                        range(selection_range.top(),
+                              selection_range.bottom() + 1))
+        return sorted(rows)
+
+    def _reset(self) -> None:
+        self._sort_rows()
+        self.endResetModel()
+
+    def _sort_rows(self) -> None:
+        rows_count = self.sourceModel().rowCount()
+        rows = self._rows if self._rows is not None else range(rows_count)
+        if self._sort_column < 0:
+            self._order = list(rows)
+        else:
+            keys = self.sourceModel().sort_keys(self._sort_column)
+            descending = self._sort_order == Qt.DescendingOrder
+            self._order = sorted(rows, key=keys.__getitem__,
+                                 reverse=descending)
+        self._positions = [-1] * rows_count
+        for position, row in enumerate(self._order):
+            self._positions[row] = position
+
+    def _begin_insert_rows(self, parent: QModelIndex, first: int,
+                           last: int) -> None:
+        self._inserted_count = last - first + 1
+        end = len(self._order)
+        self.beginInsertRows(QModelIndex(), end,
+                             end + self._inserted_count - 1)
+
+    def _end_insert_rows(self) -> None:
+        end = len(self._order)
+        first_row = len(self._positions)
+        self._order.extend(range(first_row, first_row + self._inserted_count))
+        self._positions.extend(range(end, end + self._inserted_count))
+        if self._rows is not None:
+            self._rows.extend(range(first_row,
+                                    first_row + self._inserted_count))
+        self.endInsertRows()
+
+    def _change_data(self, top_left: QModelIndex,
+                     bottom_right: QModelIndex) -> None:
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            position = self._positions[row]
+            if position >= 0:
+                self.dataChanged.emit(
+                    self.index(position, top_left.column()),
+                    self.index(position, bottom_right.column()))
+
+
+def _get_text(quake: Quake, column: int) -> str:
+    if column == STATIONS_COLUMN:
+        return '\n'.join(' '.join((sta.name, sta.phase, f'{sta.phase_dt}'))
+                         + '\n' for sta in quake.stations)
+    return f'{_get_value(quake, column)}'
+
+
+def _get_sort_key(quake: Quake, column: int) -> Any:
+    if column == STATIONS_COLUMN:
+        return quake.amnt_sta
+    value = _get_value(quake, column)
+    if column == 1:
+        return value
+    if column in (0, 7):
+        return f'{value}'
+    return float(value) if value is not None else float('-inf')
+
+
+def _get_value(quake: Quake, column: int) -> Any:
+    if column == 0:
+        return quake.id
+    if column == 1:
+        return quake.origin_dt
+    if column == 2:
+        return quake.lat
+    if column == 3:
+        return quake.lon
+    if column == 4:
+        return quake.depth
+    if column == 5:
+        return quake.magnitude.ML
+    if column == 6:
+        return quake.magnitude.MPSP
+    return quake.reg
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Local cache of records fetched from the DB.
+
+Records are kept in a sqlite file by the DB and comment keywords of a
+search together with the time intervals they cover. Usage to clear the
+cache: python query_cache.py clear
+"""
+import argparse
+import sqlite3
+import time
+from contextlib import closing
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+import config
+
+
+Interval = Tuple[float, float]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    key TEXT PRIMARY KEY, watermark REAL, last_used REAL, rows INTEGER);
+CREATE TABLE IF NOT EXISTS intervals (
+    key TEXT, from_ts REAL, to_ts REAL);
+CREATE TABLE IF NOT EXISTS records (
+    key TEXT, itime REAL, eventid, origintime, lat, lon, depth, reg,
+    sta, dist, azimuth, phase, entry, ampl, period, ml, mpsp);
+CREATE INDEX IF NOT EXISTS records_key_itime ON records (key, itime);
+CREATE INDEX IF NOT EXISTS intervals_key ON intervals (key);
+"""
+
+
+def iter_records(db: str, comment: str, from_ts: float, to_ts: float,
+                 fetch: Callable[[float, float], Iterable[tuple]]
+                 ) -> Iterator[tuple]:
+    """Yield records of the time window ordered by EVENTID in the shape
+    of quakes_from_db.get_data(). Intervals missing in the cache and
+    arrivals newer than the cached ones are got by fetch(from_ts, to_ts)"""
+    key = _get_key(db, comment)
+    with closing(_connect()) as conn:
+        with conn:
+            watermark = _get_watermark(conn, key)
+            covered = _get_intervals(conn, key)
+            if watermark is not None:
+                covered = _intersect(covered, (float('-inf'), watermark))
+            else:
+                covered = []
+            for interval in _subtract((from_ts, to_ts), covered):
+                _store(conn, key, interval, fetch(*interval))
+            _touch(conn, key)
+            _evict(conn, key)
+        records = conn.execute(
+            'SELECT eventid, origintime, lat, lon, depth, reg, itime, sta,'
+            ' dist, azimuth, phase, entry, ampl, period, ml, mpsp '
+            'FROM records WHERE key = ? AND itime BETWEEN ? AND ? '
+            'ORDER BY eventid', (key, from_ts, to_ts))
+        for record in records:
+            if isinstance(record[12], str):
+                record = record[:12] + (Decimal(record[12]),) + record[13:]
+            yield record
+
+
+def clear() -> None:
+    """Remove all records from the cache"""
+    with closing(_connect()) as conn:
+        with conn:
+            conn.execute('DELETE FROM records')
+            conn.execute('DELETE FROM intervals')
+            conn.execute('DELETE FROM queries')
+        conn.execute('VACUUM')
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(config.QUERY_CACHE['file'])
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _get_key(db: str, comment: str) -> str:
+    key_words = ' '.join(sorted(set(comment.split())))
+    return f"{db}?{key_words}"
+
+
+def _get_watermark(conn: sqlite3.Connection, key: str) -> float | None:
+    row = conn.execute('SELECT MAX(itime) FROM records WHERE key = ?',
+                       (key,)).fetchone()
+    return row[0]
+
+
+def _get_intervals(conn: sqlite3.Connection, key: str) -> List[Interval]:
+    return conn.execute('SELECT from_ts, to_ts FROM intervals '
+                        'WHERE key = ? ORDER BY from_ts', (key,)).fetchall()
+
+
+def _store(conn: sqlite3.Connection, key: str, interval: Interval,
+           records: Iterable[tuple]) -> None:
+    """Replace cached records of the interval by the fetched ones"""
+    conn.execute('DELETE FROM records WHERE key = ? '
+                 'AND itime BETWEEN ? AND ?', (key, *interval))
+    conn.executemany(
+        'INSERT INTO records (key, eventid, origintime, lat, lon, depth,'
+        ' reg, itime, sta, dist, azimuth, phase, entry, ampl, period, ml,'
+        ' mpsp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        ((key, *record[:12],
+          str(record[12]) if isinstance(record[12], Decimal) else record[12],
+          *record[13:]) for record in records))
+    intervals = _merge(_get_intervals(conn, key) + [interval])
+    conn.execute('DELETE FROM intervals WHERE key = ?', (key,))
+    conn.executemany('INSERT INTO intervals VALUES (?, ?, ?)',
+                     ((key, *interval) for interval in intervals))
+
+
+def _touch(conn: sqlite3.Connection, key: str) -> None:
+    conn.execute(
+        'INSERT OR REPLACE INTO queries VALUES (?, ?, ?, '
+        '(SELECT COUNT(*) FROM records WHERE key = ?))',
+        (key, _get_watermark(conn, key), time.time(), key))
+
+
+def _evict(conn: sqlite3.Connection, current_key: str) -> None:
+    """Remove least recently used searches while the cache is too big"""
+    total = conn.execute('SELECT SUM(rows) FROM queries').fetchone()[0]
+    lru_queries = conn.execute(
+        'SELECT key, rows FROM queries WHERE key != ? ORDER BY last_used',
+        (current_key,)).fetchall()
+    for key, rows in lru_queries:
+        if total <= config.QUERY_CACHE['max_rows']:
+            break
+        for table in ('records', 'intervals', 'queries'):
+            conn.execute(f'DELETE FROM {table} WHERE key = ?', (key,))
+        total -= rows
+
+
+def _merge(intervals: List[Interval]) -> List[Interval]:
+    res: List[Interval] = []
+    for from_ts, to_ts in sorted(intervals):
+        if res and from_ts <= res[-1][1]:
+            res[-1] = (res[-1][0], max(res[-1][1], to_ts))
+        else:
+            res.append((from_ts, to_ts))
+    return res
+
+
+def _intersect(intervals: List[Interval],
+               window: Interval) -> List[Interval]:
+    res = []
+    for from_ts, to_ts in intervals:
+        from_ts, to_ts = max(from_ts, window[0]), min(to_ts, window[1])
+        if from_ts <= to_ts:
+            res.append((from_ts, to_ts))
+    return res
+
+
+def _subtract(window: Interval, intervals: List[Interval]) -> List[Interval]:
+    """Return parts of the window not covered by sorted intervals"""
+    covered = _intersect(intervals, window)
+    if not covered:
+        return [window]
+    res = []
+    from_ts = window[0]
+    for covered_from, covered_to in covered:
+        if covered_from > from_ts:
+            res.append((from_ts, covered_from))
+        from_ts = max(from_ts, covered_to)
+    if from_ts < window[1]:
+        res.append((from_ts, window[1]))
+    return res
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('command', choices=('clear',))
+    parser.parse_args()
+    clear()
+    print(f"Cache {config.QUERY_CACHE['file']} is cleared")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import sys
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, Tuple
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import config  # noqa: E402
+from quake_sources import SQLiteSource, create_sqlite_tables  # noqa: E402
+from quakes_from_db import QueryParams  # noqa: E402
+from quakes_memo import memo  # noqa: E402
+
+# 2021-01-01 00:00:00 UTC
+DAY_TS = 1609459200.0
+
+PARAMS = QueryParams('2021-01-01 00:00:00', '2021-01-02 00:00:00', 'all',
+                     '0', '9', '')
+
+
+def add_quake(file: Path, eventid: str, origin_ts: float,
+              stations: Iterable[Tuple[str, float, float]],
+              comments: str = 'XX.ab: Region') -> None:
+    """Insert an origin with arrivals of stations given as name,
+    seconds after the origin and ML"""
+    with closing(sqlite3.connect(file)) as conn, conn:
+        conn.execute('INSERT INTO origin VALUES (?, ?, ?, ?, ?, ?)',
+                     (eventid, origin_ts, 42.0, 74.0, 10.0, comments))
+        for name, seconds, ml in stations:
+            conn.execute(
+                'INSERT INTO arrival VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (eventid, origin_ts + seconds, name, seconds * 7.0, 90.0,
+                 'P', 'I', 'C', 1.0, 0.5, ml, None))
+
+
+@pytest.fixture
+def db_file(tmp_path: Path) -> Path:
+    file = tmp_path / 'quakes.sqlite'
+    with closing(sqlite3.connect(file)) as conn:
+        create_sqlite_tables(conn)
+    return file
+
+
+@pytest.fixture
+def source(db_file: Path) -> SQLiteSource:
+    return SQLiteSource(db_file)
+
+
+@pytest.fixture(autouse=True)
+def search_config(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Searches of tests are not changed by the local config"""
+    monkeypatch.setitem(config.QUERY_CACHE, 'enabled', False)
+    monkeypatch.setitem(config.COMMENT_INDEX, 'enabled', False)
+    monkeypatch.setitem(config.COMMENT_INDEX, 'fulltext', False)
+    monkeypatch.setitem(config.PARALLEL_ASSEMBLY, 'enabled', False)
+    monkeypatch.setitem(config.FETCH_STRATEGY, 'two_phase', False)
+    monkeypatch.setitem(config.INSTRUMENTATION, 'trace_file', None)
+    monkeypatch.setitem(config.QUAKES_MEMO, 'enabled', True)
+    memo.clear()
+    yield
+    memo.clear()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+import config
+import quake_assembly
+from conftest import DAY_TS, PARAMS, add_quake
+from quakes_from_db import SearchProgress, _get_assembly_workers, \
+    get_quakes, iter_found_quakes, sort_quakes
+
+QUAKES = 60
+
+
+@pytest.fixture
+def parallel_assembly(monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    monkeypatch.setitem(config.PARALLEL_ASSEMBLY, 'enabled', True)
+    monkeypatch.setitem(config.PARALLEL_ASSEMBLY, 'workers', 2)
+    monkeypatch.setitem(config.PARALLEL_ASSEMBLY, 'min_records', 30)
+    monkeypatch.setattr(quake_assembly, '_STREAM_PART_RECORDS', 20)
+
+
+@pytest.fixture
+def quakes_source(db_file, source):
+    for number in range(QUAKES):
+        add_quake(db_file, f'{number:03}', DAY_TS + number * 600,
+                  [('ABC', 10, 1.0 + number % 4), ('DEF', 20, 2.0)])
+    return source
+
+
+def test_pool_needs_several_cpus(monkeypatch):
+    monkeypatch.setitem(config.PARALLEL_ASSEMBLY, 'enabled', True)
+    monkeypatch.setitem(config.PARALLEL_ASSEMBLY, 'workers', 4)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 1)
+    assert _get_assembly_workers() == 0
+    monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+    assert _get_assembly_workers() == 4
+    monkeypatch.setitem(config.PARALLEL_ASSEMBLY, 'workers', 1)
+    assert _get_assembly_workers() == 0
+    monkeypatch.setitem(config.PARALLEL_ASSEMBLY, 'enabled', False)
+    assert _get_assembly_workers() == 0
+
+
+def test_search_is_assembled_by_pool(quakes_source, request, monkeypatch):
+    params = PARAMS._replace(from_mag='2.0')
+    serial = list(iter_found_quakes(params, source=quakes_source))
+    assert 0 < len(serial) < QUAKES
+    request.getfixturevalue('parallel_assembly')
+    taken = []
+    take = quake_assembly._take
+    monkeypatch.setattr(quake_assembly, '_take',
+                        lambda *args: taken.append(args) or take(*args))
+    progress = SearchProgress()
+    found = list(iter_found_quakes(params, progress, source=quakes_source))
+    assert taken
+    assert found == serial
+    assert progress.quakes == QUAKES
+
+
+@pytest.mark.usefixtures('parallel_assembly')
+def test_get_quakes_is_assembled_by_pool(quakes_source):
+    params = PARAMS._replace(from_mag='2.0')
+    found = get_quakes(params, quakes_source)
+    assert list(found) == sort_quakes(iter_found_quakes(
+        params, source=quakes_source))
+
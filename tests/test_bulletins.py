@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Files of bulletins are compared with files in tests/data written from
+the same quakes by storages of the first version of quake_storages.
+It saved NAS bulletins of quakes of the same second into one file,
+so the files with suffixes _1, _2 are its bulletins of these quakes
+saved one by one."""
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from quake_storages import export_quakes, get_storage, save_quakes
+from quake_structures import Quake, Sta
+
+DATA = Path(__file__).parent / 'data'
+
+
+def make_quakes() -> List[Quake]:
+    def sta(name, seconds, dist, azimuth, phase, entry, ampl, period, ml,
+            mpsp):
+        phase_dt = datetime(2021, 3, 5, 14, 20, 0, 125000)
+        return Sta(phase_dt.replace(second=seconds % 60,
+                                    minute=20 + seconds // 60),
+                   name, dist, azimuth, phase, entry, ampl, period, ml, mpsp)
+
+    origin_dt = datetime(2021, 3, 5, 14, 19, 42, 250000)
+    return [
+        Quake('100001', origin_dt, 51.87, 104.82, 12.5, 'Байкал', (
+            sta('IRK', 5, 58.3, 120.4, 'P', 'IP', Decimal('0.1235'), 0.4,
+                2.3, None),
+            sta('IRK', 12, 58.3, 120.4, 'S', 'E', Decimal('1.5'), 0.8, 2.4,
+                None),
+            sta('ADZR', 30, 210.04, 0.0, 'Pn', '', None, None, 2.6, 3.1),
+            sta('TLY', 41, 310.0, 288.12, 'Pg', 'ES', Decimal('12.03'),
+                1.25, None, 3.3))),
+        # quakes of the same second as the first one
+        Quake('100002', origin_dt.replace(microsecond=870000), 51.9, 104.1,
+              None, 'Байкал', (
+                  sta('IRK', 8, 12.0, 45.5, 'P', 'IPC', None, None, 3.54,
+                      None),
+                  sta('MOY', 20, 0.0, None, 'S', 'E', None, None, 3.56,
+                      None))),
+        Quake('100003', origin_dt.replace(microsecond=0), 52.0, 105.0, 0.0,
+              'Region 3', (
+                  sta('UUD', 15, 99.99, 180.0, 'Lg', 'ED', Decimal('0.0001'),
+                      0.05, None, 4.55),)),
+        Quake('100004', datetime(2021, 3, 5, 15, 1, 2, 999999), 55.55, 96.1,
+              33.0, 'Region 4', (
+                  sta('KRS', 50, 720.5, 10.0, 'Sn', 'E', None, 2.0, None,
+                      None),
+                  sta('NIZ', 55, 800.0, 11.5, 'P', 'IP', None, 2.0, None,
+                      None))),
+        # quakes without location are written only with many stations
+        Quake('100005', datetime(2021, 3, 5, 16, 0, 0), None, None, None,
+              'Region 5', tuple(
+                  sta(name, 10 + i, 100.0 * i, 30.0, 'P', 'E', None, None,
+                      1.0 + i / 10, None)
+                  for i, name in enumerate(
+                      ('BOD', 'ZAK', 'KIR', 'ORL', 'BYR')))),
+        Quake('100006', datetime.min, None, 101.2, 5.0, 'Region 6', (
+            sta('HRM', 3, 20.0, 5.0, 'P', 'IP', None, None, 1.2, None),)),
+        Quake('100007', datetime(2021, 3, 6, 1, 2, 3, 4000), 53.0, 108.0,
+              10.0, '', (
+                  sta('SRD', 0, 1.0, 1.0, 'P', 'IP', Decimal('3'), 0.1, 2.52,
+                      None),
+                  sta('KMN', 7, 2.0, 2.0, 'S', 'ES', None, None, 2.51,
+                      None))),
+    ]
+
+
+@pytest.mark.parametrize('ext', ['.txt', '.GIS'])
+def test_bulletin_is_same(tmp_path, ext):
+    file = tmp_path / f'bulletin{ext}'
+    save_quakes(make_quakes(), get_storage(ext)(file))
+    assert file.read_bytes() == (DATA / f'bulletin{ext}').read_bytes()
+
+
+@pytest.mark.parametrize('threaded', [False, True])
+def test_export_is_same(tmp_path, threaded):
+    nas = tmp_path / 'nas'
+    nas.mkdir()
+    storages = [get_storage('.txt')(tmp_path / 'bulletin.txt'),
+                get_storage('.GIS')(tmp_path / 'bulletin.GIS'),
+                get_storage('.bltn')(nas / 'quakes.bltn')]
+    export_quakes(make_quakes(), storages, threaded=threaded)
+    for name in ('bulletin.txt', 'bulletin.GIS'):
+        assert (tmp_path / name).read_bytes() == (DATA / name).read_bytes()
+    assert _read_files(nas) == _read_files(DATA / 'nas')
+
+
+def test_nas_bulletins_are_same(tmp_path):
+    save_quakes(make_quakes(), get_storage('.bltn')(tmp_path / 'q.bltn'))
+    files = _read_files(tmp_path)
+    assert files == _read_files(DATA / 'nas')
+    assert {'20210305_141942.bltn', '20210305_141942_1.bltn',
+            '20210305_141942_2.bltn', '20210305_160000.bltn'} <= set(files)
+
+
+def test_nas_archive_has_bulletins(tmp_path):
+    file = tmp_path / 'bulletins.zip'
+    save_quakes(make_quakes(), get_storage('.zip')(file))
+    with zipfile.ZipFile(file) as archive:
+        files = {name: archive.read(name) for name in archive.namelist()}
+    assert files == _read_files(DATA / 'nas')
+
+
+def _read_files(path: Path) -> dict:
+    return {file.name: file.read_bytes() for file in path.iterdir()}
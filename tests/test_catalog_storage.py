@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from datetime import datetime
+
+import openpyxl
+import pytest
+
+from catalog_storage import CatalogStorage
+from quake_storages import FormattedQuake
+from quake_structures import Quake, Sta
+
+
+def _quake(month: int) -> Quake:
+    sta = Sta(datetime(2021, month, 1, 0, 0, 10), 'ABC', 10.0, 90.0, 'P',
+              'IC', None, 0.5, 2.0, None)
+    return Quake(str(month), datetime(2021, month, 1), 42.0, 74.0, 10.0,
+                 'Region', (sta,))
+
+
+def _write(storage: CatalogStorage, *months: int) -> None:
+    storage.open()
+    for month in months:
+        storage.write(FormattedQuake(_quake(month)))
+
+
+def test_close_writes_sheets_of_months(tmp_path):
+    file = tmp_path / 'catalog.xlsx'
+    storage = CatalogStorage(file)
+    _write(storage, 1, 3)
+    storage.close()
+    wb = openpyxl.load_workbook(file, read_only=True)
+    assert wb.sheetnames == ['January', 'March']
+    wb.close()
+
+
+def test_rows_are_appended_to_existing_file(tmp_path):
+    file = tmp_path / 'catalog.xlsx'
+    for month in (1, 1, 2):
+        storage = CatalogStorage(file)
+        _write(storage, month)
+        storage.close()
+    wb = openpyxl.load_workbook(file, read_only=True)
+    assert wb.sheetnames == ['January', 'February']
+    assert len(list(wb['January'].iter_rows(values_only=True))) == 3
+    wb.close()
+
+
+def test_quakes_are_appended_to_empty_catalog(tmp_path):
+    file = tmp_path / 'catalog.xlsx'
+    storage = CatalogStorage(file)
+    _write(storage)
+    storage.close()
+    storage = CatalogStorage(file)
+    _write(storage, 3)
+    storage.close()
+    wb = openpyxl.load_workbook(file, read_only=True)
+    assert wb.sheetnames == ['March']
+    wb.close()
+
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch):
+    """Directory of temporary files of openpyxl"""
+    temp_dir = tmp_path / 'temp'
+    temp_dir.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(temp_dir))
+    return temp_dir
+
+
+def test_abort_removes_temporary_files(tmp_path, temp_dir):
+    file = tmp_path / 'catalog.xlsx'
+    storage = CatalogStorage(file)
+    _write(storage, 1, 2)
+    assert len(os.listdir(temp_dir)) == 2
+    storage.abort()
+    assert os.listdir(temp_dir) == []
+    assert not file.exists()
+
+
+def test_abort_without_cleanup_of_writer(tmp_path, temp_dir, monkeypatch):
+    from openpyxl.worksheet._writer import WorksheetWriter
+    monkeypatch.delattr(WorksheetWriter, 'cleanup')
+    storage = CatalogStorage(tmp_path / 'catalog.xlsx')
+    _write(storage, 1)
+    storage.abort()
+    assert not storage._sheets
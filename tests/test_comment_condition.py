@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import config
+from conftest import DAY_TS, PARAMS, add_quake
+from quake_sources import SQLiteSource
+from quakes_from_db import SearchProgress, _get_comment_condition, \
+    iter_found_quakes
+
+
+class _FulltextSource(SQLiteSource):
+    def has_fulltext_index(self, table, column, progress):
+        return True
+
+
+def test_like_is_used_without_fulltext_in_config(db_file):
+    condition = _get_comment_condition(_FulltextSource(db_file), 'region',
+                                       SearchProgress())
+    assert condition.sql == 'o.COMMENTS LIKE ?'
+    assert condition.args == ('%region%',)
+
+
+def test_fulltext_is_used_when_it_is_turned_on(db_file, monkeypatch):
+    monkeypatch.setitem(config.COMMENT_INDEX, 'fulltext', True)
+    condition = _get_comment_condition(_FulltextSource(db_file), 'region',
+                                       SearchProgress())
+    assert condition.sql.startswith('MATCH (o.COMMENTS) AGAINST')
+    assert condition.args == ('region*',)
+    condition = _get_comment_condition(SQLiteSource(db_file), 'region',
+                                       SearchProgress())
+    assert condition.sql == 'o.COMMENTS LIKE ?'
+
+
+def test_keywords_are_parts_of_words(db_file, source):
+    add_quake(db_file, '1', DAY_TS + 100, [('ABC', 10, 2.0)],
+              'XX.ab: Subregion')
+    add_quake(db_file, '2', DAY_TS + 200, [('ABC', 10, 2.0)],
+              'XX.ab: Other')
+    found = iter_found_quakes(PARAMS._replace(comment='region'),
+                              source=source)
+    assert [quake.id for quake in found] == ['1']
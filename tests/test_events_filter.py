@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+import config
+import quakes_from_db
+from conftest import DAY_TS, PARAMS
+from quakes_from_db import SqlQuery, get_quakes
+
+# magnitudes ML and MPSP of arrivals of quakes at stations of STATIONS,
+# None is NULL in the DB
+QUAKES = [
+    [(2.0, None), (2.1, None)],
+    [(2.04, None), (2.06, 3.0)],
+    [(None, 2.5), (None, 2.6), (None, None)],
+    [(0.0, 2.0), (None, 1.95)],
+    [(3.0, None), (0.0, None), (None, 4.0)],
+    [(None, None), (None, None)],
+    [(0.0, 0.0)],
+    [(1.25, None), (1.35, None), (None, 1.3)],
+    [(4.96, 5.0), (5.04, None)],
+    [(-0.5, None), (0.5, None)],
+]
+
+STATIONS = ('ABC', 'ADZ', 'DEF', 'GHI')
+
+
+@pytest.fixture
+def mag_source(db_file, source, monkeypatch):
+    with closing(sqlite3.connect(db_file)) as conn, conn:
+        for number, mags in enumerate(QUAKES):
+            eventid = f'{number:03}'
+            origin_ts = DAY_TS + number * 600
+            conn.execute('INSERT INTO origin VALUES (?, ?, ?, ?, ?, ?)',
+                         (eventid, origin_ts, 42.0, 74.0, 10.0,
+                          'XX.ab: Region'))
+            for index, (ml, mpsp) in enumerate(mags):
+                sta = STATIONS[(number + index) % len(STATIONS)]
+                conn.execute(
+                    'INSERT INTO arrival VALUES '
+                    '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (eventid, origin_ts + 10 * (index + 1), sta,
+                     70.0 * (index + 1), 90.0, 'P', 'I', 'C', 1.0, 0.5,
+                     ml, mpsp))
+    # searches are made by the DB, not taken from the memo
+    monkeypatch.setitem(config.QUAKES_MEMO, 'enabled', False)
+    return source
+
+
+@pytest.mark.parametrize('from_mag, to_mag', [
+    ('0', '9'), ('2.0', '2.0'), ('2.05', '2.1'), ('2.1', '9'), ('2.5', '2.6'),
+    ('2.6', '9'), ('1.3', '1.3'), ('-1', '-0.1'), ('-1', '0'), ('0.1', '9'),
+    ('5.0', '5.0'), ('4.9', '4.99'), ('3.0', '3.0'), ('3.5', '3.5')])
+@pytest.mark.parametrize('sta', [
+    'all', 'ABC', 'ABC DEF', 'DEF ABC ABC', 'ADZR', 'ADZ', 'ADZR GHI', 'XYZ'])
+def test_pushdown_finds_quakes_of_client_filter(mag_source, monkeypatch,
+                                                from_mag, to_mag, sta):
+    params = PARAMS._replace(sta=sta, from_mag=from_mag, to_mag=to_mag)
+    pushed = get_quakes(params, mag_source)
+    monkeypatch.setattr(quakes_from_db, '_get_events_filter',
+                        lambda *args: SqlQuery('', ()))
+    assert pushed == get_quakes(params, mag_source)
+
+
+def test_pushdown_is_in_query(mag_source):
+    params = PARAMS._replace(sta='ABC', from_mag='2.0', to_mag='3.0')
+    sql, _ = quakes_from_db._get_sql_query(params, mag_source)
+    assert 'HAVING' in sql
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import time
+
+from conftest import DAY_TS, PARAMS, add_quake
+from quake_sources import SQLiteSource
+from quakes_from_db import get_quakes, iter_found_quakes
+from quakes_memo import QuakesMemo, memo
+
+
+def _ids(quakes) -> list:
+    return sorted(quake.id for quake in quakes)
+
+
+def test_search_sees_inserted_quake(db_file, source):
+    add_quake(db_file, '1', DAY_TS + 100, [('ABC', 10, 2.0)])
+    assert _ids(iter_found_quakes(PARAMS, source=source)) == ['1']
+    add_quake(db_file, '2', DAY_TS + 200, [('ABC', 10, 2.5)])
+    assert _ids(iter_found_quakes(PARAMS, source=source)) == ['1', '2']
+    assert memo.get(PARAMS, source.key, DAY_TS, DAY_TS + 86400) is None
+
+
+class _CountingSource(SQLiteSource):
+    """Source counting queries of searches"""
+
+    def __init__(self, file):
+        super().__init__(file)
+        self.queries = 0
+
+    def iter_batches(self, sql, args, progress):
+        self.queries += 1
+        return super().iter_batches(sql, args, progress)
+
+
+def test_narrower_get_quakes_is_answered_from_memory(db_file):
+    source = _CountingSource(db_file)
+    add_quake(db_file, '1', DAY_TS + 100, [('ABC', 10, 2.0)])
+    add_quake(db_file, '2', DAY_TS + 50_000, [('ABC', 10, 3.0),
+                                              ('DEF', 20, 3.0)])
+    for narrower in (PARAMS._replace(to_dt='2021-01-01 12:00:00'),
+                     PARAMS._replace(sta='DEF'),
+                     PARAMS._replace(from_mag='2.5')):
+        memo.clear()
+        from_db = get_quakes(narrower, source)
+        memo.clear()
+        assert _ids(get_quakes(PARAMS, source)) == ['1', '2']
+        queries = source.queries
+        assert get_quakes(narrower, source) == from_db
+        assert source.queries == queries
+
+
+def test_get_quakes_sees_inserted_quake_when_memo_expires(db_file, source,
+                                                         monkeypatch):
+    add_quake(db_file, '1', DAY_TS + 100, [('ABC', 10, 2.0)])
+    assert _ids(get_quakes(PARAMS, source)) == ['1']
+    add_quake(db_file, '2', DAY_TS + 200, [('ABC', 10, 2.5)])
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic',
+                        lambda: now + memo.ttl_seconds + 1)
+    assert _ids(get_quakes(PARAMS, source)) == ['1', '2']
+
+
+def test_expired_records_are_dropped(monkeypatch):
+    quakes_memo = QuakesMemo(max_mb=1, ttl_seconds=60)
+    from_ts, to_ts = DAY_TS, DAY_TS + 86400
+    records = (('1', DAY_TS, 42.0, 74.0, 10.0, 'Region', DAY_TS + 10),)
+    quakes_memo.put(PARAMS, 'db', from_ts, to_ts, records)
+    assert quakes_memo.get(PARAMS, 'db', from_ts, to_ts) == records
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 61)
+    assert quakes_memo.get(PARAMS, 'db', from_ts, to_ts) is None
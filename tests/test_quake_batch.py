@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+import config
+from conftest import DAY_TS, PARAMS, add_quake
+from quakes_from_db import SearchProgress, get_quake_batch, get_quakes
+
+QUAKES = 40
+
+
+def add_arrivals(file, eventid, arrivals):
+    """Insert arrivals given as rows of the arrival table without EVENTID"""
+    with closing(sqlite3.connect(file)) as conn, conn:
+        conn.executemany(
+            'INSERT INTO arrival VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(eventid,) + arrival for arrival in arrivals])
+
+
+@pytest.fixture
+def batch_source(db_file, source, monkeypatch):
+    for number in range(QUAKES):
+        add_quake(db_file, f'{number:03}', DAY_TS + number * 600,
+                  [('ABC', 10, 1.0 + number % 4), ('DEF', 20, 2.0),
+                   ('ADZ', 30 - number % 3, 0.0)])
+    # arrivals of a station merged into one and a station without values
+    add_arrivals(db_file, '007', [
+        (DAY_TS + 7 * 600 + 10, 'ABC', None, None, 'S', 'E', None, None,
+         None, 3.5, 3.0),
+        (DAY_TS + 7 * 600 + 40, 'GHI', None, None, None, None, None, None,
+         None, None, None)])
+    # a quake without origin and magnitudes
+    with closing(sqlite3.connect(db_file)) as conn, conn:
+        conn.execute('INSERT INTO origin VALUES (?, ?, ?, ?, ?, ?)',
+                     ('100', None, None, None, None, 'XX.ab: Region'))
+    add_arrivals(db_file, '100', [
+        (DAY_TS + 5, 'DEF', 35.0, 10.0, 'P', 'I', None, 0.5, 1.0, None,
+         None),
+        (DAY_TS + 5, 'DEF', None, None, 'P', 'I', 'C', None, None, 0.0,
+         None)])
+    monkeypatch.setattr(config, 'FETCH_BATCH_SIZE', 7)
+    return source
+
+
+@pytest.mark.parametrize('sta, from_mag, to_mag', [
+    ('all', '0', '9'), ('all', '2.0', '3.0'), ('all', '-1', '0'),
+    ('ABC', '0', '9'), ('ADZR DEF', '1.5', '9'), ('GHI ABC', '0', '9'),
+    ('XYZ', '0', '9')])
+def test_batch_has_quakes_of_get_quakes(batch_source, sta, from_mag,
+                                        to_mag):
+    params = PARAMS._replace(sta=sta, from_mag=from_mag, to_mag=to_mag)
+    batch = get_quake_batch(params, source=batch_source)
+    assert list(batch) == list(get_quakes(params, batch_source))
+    assert [batch[index] for index in range(len(batch))] == list(batch)
+
+
+def test_shards_of_batch_are_merged(batch_source, monkeypatch):
+    monkeypatch.setitem(config.DB_SHARDS, 'workers', 4)
+    monkeypatch.setitem(config.DB_SHARDS, 'min_seconds', 3600)
+    monkeypatch.setitem(config.DB_SHARDS, 'adaptive', False)
+    progress = SearchProgress()
+    batch = get_quake_batch(PARAMS, progress, batch_source)
+    assert list(batch) == list(get_quakes(PARAMS, batch_source))
+    assert progress.quakes == QUAKES + 1
+
+
+def test_batch_of_empty_window(batch_source):
+    params = PARAMS._replace(from_dt='2020-01-01 00:00:00',
+                             to_dt='2020-01-02 00:00:00')
+    assert list(get_quake_batch(params, source=batch_source)) == []
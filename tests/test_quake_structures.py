@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from quake_structures import Quake, Sta
+
+
+def _sta(name: str, second: int, mag_ml: float | None) -> Sta:
+    return Sta(datetime(2021, 1, 1, 0, 0, second), name, 10.0, 90.0, 'P',
+               'IC', None, 0.5, mag_ml, None)
+
+
+def _quake(*stations: Sta) -> Quake:
+    return Quake('1', datetime(2021, 1, 1), 42.0, 74.0, 10.0, 'Region',
+                 stations)
+
+
+def test_summary_of_stations():
+    quake = _quake(_sta('ABC', 10, 2.0), _sta('DEF', 20, 3.0))
+    assert quake.preferred_mag == 2.5
+    assert quake.mag_type == 'ML'
+    assert quake.stations_name == {'ABC', 'DEF'}
+    assert quake.amnt_sta == 2
+    assert quake.first_phase_dt == datetime(2021, 1, 1, 0, 0, 10)
+
+
+def test_assigned_stations_refresh_summary():
+    quake = _quake(_sta('ABC', 10, 2.0))
+    quake.stations = (_sta('XYZ', 5, 4.0),) + quake.stations
+    assert quake.preferred_mag == 3.0
+    assert quake.stations_name == {'ABC', 'XYZ'}
+    assert quake.first_phase_dt == datetime(2021, 1, 1, 0, 0, 5)
+
+
+def test_changes_in_place_need_refresh_summary():
+    quake = _quake(_sta('ABC', 10, 2.0))
+    quake.stations[0].mag_ML = 4.0
+    quake.stations[0].name = 'ABCR'
+    assert quake.preferred_mag == 2.0
+    assert quake.stations_name == {'ABC'}
+    quake.refresh_summary()
+    assert quake.preferred_mag == 4.0
+    assert quake.stations_name == {'ABCR'}
+
+
+def test_summary_is_not_compared():
+    first = _quake(_sta('ABC', 10, 2.0))
+    second = _quake(_sta('ABC', 10, 1.0))
+    second.stations[0].mag_ML = 2.0
+    assert first == second
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from exceptions import SearchCancelledError
+from quakes_from_db import SearchProgress
+
+
+def test_cancel_does_not_wait_for_statements():
+    progress = SearchProgress()
+    release = threading.Event()
+    cancelled = threading.Event()
+
+    def cancel_statement():
+        release.wait(5)
+        cancelled.set()
+
+    with progress.statement(cancel_statement):
+        start = time.monotonic()
+        progress.cancel()
+        assert time.monotonic() - start < 1
+        assert progress.cancelled
+        with pytest.raises(SearchCancelledError):
+            progress.check()
+        release.set()
+        assert cancelled.wait(5)
+
+
+def test_cancelled_progress_stops_statements():
+    progress = SearchProgress()
+    progress.cancel()
+    with pytest.raises(SearchCancelledError):
+        with progress.statement(lambda: None):
+            pass
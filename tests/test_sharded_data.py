@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+import config
+from conftest import DAY_TS, PARAMS, add_quake
+from exceptions import ConnectDatabaseError, SearchCancelledError
+from quakes_from_db import SearchProgress, get_quakes, iter_found_quakes
+
+QUAKES = 500
+
+
+@pytest.fixture
+def sharded_source(db_file, source, monkeypatch):
+    for number in range(QUAKES):
+        add_quake(db_file, f'{number:04}', DAY_TS + number * 150,
+                  [('ABC', 10, 2.0), ('DEF', 20, 2.5), ('GHI', 30, 3.0)])
+    monkeypatch.setattr(config, 'FETCH_BATCH_SIZE', 10)
+    monkeypatch.setitem(config.DB_SHARDS, 'workers', 4)
+    monkeypatch.setitem(config.DB_SHARDS, 'min_seconds', 3600)
+    monkeypatch.setitem(config.DB_SHARDS, 'adaptive', False)
+    return source
+
+
+def test_shards_are_merged(sharded_source):
+    quakes = sorted(iter_found_quakes(PARAMS, source=sharded_source),
+                    key=lambda quake: quake.first_phase_dt)
+    assert [quake.id for quake in quakes] == \
+        [f'{number:04}' for number in range(QUAKES)]
+    assert quakes == list(get_quakes(PARAMS, sharded_source))
+
+
+def test_export_is_consumed_lazily(sharded_source):
+    progress = SearchProgress()
+    quakes = iter_found_quakes(PARAMS, progress, source=sharded_source)
+    next(quakes)
+    assert progress.records < QUAKES * 3 / 4
+    quakes.close()
+
+
+def test_cancel_stops_shards(sharded_source):
+    progress = SearchProgress()
+    quakes = iter_found_quakes(PARAMS, progress, source=sharded_source)
+    next(quakes)
+    progress.cancel()
+    with pytest.raises(SearchCancelledError):
+        list(quakes)
+
+
+def test_error_of_shard_is_raised(sharded_source, db_file):
+    with closing(sqlite3.connect(db_file)) as conn:
+        conn.execute('DROP TABLE arrival')
+    with pytest.raises(ConnectDatabaseError):
+        list(iter_found_quakes(PARAMS, source=sharded_source))
@@ -187,6 +187,18 @@ class Ui_MainWindow(object):
 
         self.horizontalLayout.addWidget(self.search_events_button)
 
+        self.cancel_button = QPushButton(self.groupBox)
+        self.cancel_button.setObjectName(u"cancel_button")
+        self.cancel_button.setEnabled(False)
+
+        self.horizontalLayout.addWidget(self.cancel_button)
+
+        self.follow_button = QPushButton(self.groupBox)
+        self.follow_button.setObjectName(u"follow_button")
+        self.follow_button.setCheckable(True)
+
+        self.horizontalLayout.addWidget(self.follow_button)
+
         self.select_all_button = QPushButton(self.groupBox)
         self.select_all_button.setObjectName(u"select_all_button")
 
@@ -215,46 +227,27 @@ class Ui_MainWindow(object):
 
         self.verticalLayout_5.addWidget(self.groupBox)
 
-        self.tableWidget = QTableWidget(self.centralwidget)
-        if (self.tableWidget.columnCount() < 9):
-            self.tableWidget.setColumnCount(9)
-        __qtablewidgetitem = QTableWidgetItem()
-        self.tableWidget.setHorizontalHeaderItem(0, __qtablewidgetitem)
-        __qtablewidgetitem1 = QTableWidgetItem()
-        self.tableWidget.setHorizontalHeaderItem(1, __qtablewidgetitem1)
-        __qtablewidgetitem2 = QTableWidgetItem()
-        self.tableWidget.setHorizontalHeaderItem(2, __qtablewidgetitem2)
-        __qtablewidgetitem3 = QTableWidgetItem()
-        self.tableWidget.setHorizontalHeaderItem(3, __qtablewidgetitem3)
-        __qtablewidgetitem4 = QTableWidgetItem()
-        self.tableWidget.setHorizontalHeaderItem(4, __qtablewidgetitem4)
-        __qtablewidgetitem5 = QTableWidgetItem()
-        self.tableWidget.setHorizontalHeaderItem(5, __qtablewidgetitem5)
-        __qtablewidgetitem6 = QTableWidgetItem()
-        self.tableWidget.setHorizontalHeaderItem(6, __qtablewidgetitem6)
-        __qtablewidgetitem7 = QTableWidgetItem()
-        self.tableWidget.setHorizontalHeaderItem(7, __qtablewidgetitem7)
-        __qtablewidgetitem8 = QTableWidgetItem()
-        self.tableWidget.setHorizontalHeaderItem(8, __qtablewidgetitem8)
-        self.tableWidget.setObjectName(u"tableWidget")
+        self.tableView = QTableView(self.centralwidget)
+        self.tableView.setObjectName(u"tableView")
         sizePolicy1 = QSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         sizePolicy1.setHorizontalStretch(5)
         sizePolicy1.setVerticalStretch(0)
-        sizePolicy1.setHeightForWidth(self.tableWidget.sizePolicy().hasHeightForWidth())
-        self.tableWidget.setSizePolicy(sizePolicy1)
-        self.tableWidget.setMinimumSize(QSize(150, 0))
-        self.tableWidget.setBaseSize(QSize(0, 0))
-        self.tableWidget.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContentsOnFirstShow)
-        self.tableWidget.setSortingEnabled(True)
-        self.tableWidget.horizontalHeader().setCascadingSectionResizes(True)
-        self.tableWidget.horizontalHeader().setMinimumSectionSize(50)
-        self.tableWidget.horizontalHeader().setDefaultSectionSize(120)
-        self.tableWidget.horizontalHeader().setProperty("showSortIndicator", True)
-        self.tableWidget.horizontalHeader().setStretchLastSection(True)
-        self.tableWidget.verticalHeader().setCascadingSectionResizes(False)
-        self.tableWidget.verticalHeader().setProperty("showSortIndicator", False)
-
-        self.verticalLayout_5.addWidget(self.tableWidget)
+        sizePolicy1.setHeightForWidth(self.tableView.sizePolicy().hasHeightForWidth())
+        self.tableView.setSizePolicy(sizePolicy1)
+        self.tableView.setMinimumSize(QSize(150, 0))
+        self.tableView.setBaseSize(QSize(0, 0))
+        self.tableView.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContentsOnFirstShow)
+        self.tableView.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.tableView.setSortingEnabled(True)
+        self.tableView.horizontalHeader().setCascadingSectionResizes(True)
+        self.tableView.horizontalHeader().setMinimumSectionSize(50)
+        self.tableView.horizontalHeader().setDefaultSectionSize(120)
+        self.tableView.horizontalHeader().setProperty("showSortIndicator", True)
+        self.tableView.horizontalHeader().setStretchLastSection(True)
+        self.tableView.verticalHeader().setCascadingSectionResizes(False)
+        self.tableView.verticalHeader().setProperty("showSortIndicator", False)
+
+        self.verticalLayout_5.addWidget(self.tableView)
 
 
         self.verticalLayout.addLayout(self.verticalLayout_5)
@@ -284,9 +277,11 @@ class Ui_MainWindow(object):
         QWidget.setTabOrder(self.to_Mag, self.comment_line)
         QWidget.setTabOrder(self.comment_line, self.sta_line)
         QWidget.setTabOrder(self.sta_line, self.search_events_button)
-        QWidget.setTabOrder(self.search_events_button, self.select_all_button)
+        QWidget.setTabOrder(self.search_events_button, self.cancel_button)
+        QWidget.setTabOrder(self.cancel_button, self.follow_button)
+        QWidget.setTabOrder(self.follow_button, self.select_all_button)
         QWidget.setTabOrder(self.select_all_button, self.save_as_button)
-        QWidget.setTabOrder(self.save_as_button, self.tableWidget)
+        QWidget.setTabOrder(self.save_as_button, self.tableView)
 
         self.menubar.addAction(self.menuFile.menuAction())
         self.menubar.addAction(self.menuHelp.menuAction())
@@ -306,7 +301,7 @@ class Ui_MainWindow(object):
         self.menuHelp.addAction(self.actionAbout)
 
         self.retranslateUi(MainWindow)
-        self.select_all_button.clicked.connect(self.tableWidget.selectAll)
+        self.select_all_button.clicked.connect(self.tableView.selectAll)
         self.action_Quit.triggered.connect(MainWindow.close)
 
         QMetaObject.connectSlotsByName(MainWindow)
@@ -337,26 +332,13 @@ class Ui_MainWindow(object):
         self.label_8.setText(QCoreApplication.translate("MainWindow", u"STA", None))
         self.sta_line.setText(QCoreApplication.translate("MainWindow", u"ALL", None))
         self.search_events_button.setText(QCoreApplication.translate("MainWindow", u"Search for events", None))
+        self.cancel_button.setText(QCoreApplication.translate("MainWindow", u"Cancel", None))
+#if QT_CONFIG(tooltip)
+        self.follow_button.setToolTip(QCoreApplication.translate("MainWindow", u"Search and then poll new arrivals of the window", None))
+#endif // QT_CONFIG(tooltip)
+        self.follow_button.setText(QCoreApplication.translate("MainWindow", u"Follow", None))
         self.select_all_button.setText(QCoreApplication.translate("MainWindow", u"Select all", None))
         self.save_as_button.setText(QCoreApplication.translate("MainWindow", u"Save as...", None))
-        ___qtablewidgetitem = self.tableWidget.horizontalHeaderItem(0)
-        ___qtablewidgetitem.setText(QCoreApplication.translate("MainWindow", u"ID", None));
-        ___qtablewidgetitem1 = self.tableWidget.horizontalHeaderItem(1)
-        ___qtablewidgetitem1.setText(QCoreApplication.translate("MainWindow", u"Origin Time", None));
-        ___qtablewidgetitem2 = self.tableWidget.horizontalHeaderItem(2)
-        ___qtablewidgetitem2.setText(QCoreApplication.translate("MainWindow", u"Lat", None));
-        ___qtablewidgetitem3 = self.tableWidget.horizontalHeaderItem(3)
-        ___qtablewidgetitem3.setText(QCoreApplication.translate("MainWindow", u"Lon", None));
-        ___qtablewidgetitem4 = self.tableWidget.horizontalHeaderItem(4)
-        ___qtablewidgetitem4.setText(QCoreApplication.translate("MainWindow", u"Depth", None));
-        ___qtablewidgetitem5 = self.tableWidget.horizontalHeaderItem(5)
-        ___qtablewidgetitem5.setText(QCoreApplication.translate("MainWindow", u"ML", None));
-        ___qtablewidgetitem6 = self.tableWidget.horizontalHeaderItem(6)
-        ___qtablewidgetitem6.setText(QCoreApplication.translate("MainWindow", u"MPSP", None));
-        ___qtablewidgetitem7 = self.tableWidget.horizontalHeaderItem(7)
-        ___qtablewidgetitem7.setText(QCoreApplication.translate("MainWindow", u"Region", None));
-        ___qtablewidgetitem8 = self.tableWidget.horizontalHeaderItem(8)
-        ___qtablewidgetitem8.setText(QCoreApplication.translate("MainWindow", u"STA, Ph, time", None));
         self.menuFile.setTitle(QCoreApplication.translate("MainWindow", u"File", None))
         self.menuSettings.setTitle(QCoreApplication.translate("MainWindow", u"Settings", None))
         self.menu_Save_as.setTitle(QCoreApplication.translate("MainWindow", u"&Save as...", None))